@@ -0,0 +1,179 @@
+import io
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .preprocessing import DurationDistribution, preprocess_stops
+from .schema import concat_frames, read_csv_kwargs
+
+# Nombre de lignes lues pour estimer la mémoire occupée par une ligne
+SAMPLE_ROWS = 10_000
+
+# Taille minimale d'un bloc lu par un worker
+MIN_BLOCK_BYTES = 1024 ** 2
+
+# Facteur d'expansion d'un bloc pendant le nettoyage (colonnes intermédiaires,
+# résultat renvoyé au processus principal)
+CLEANING_EXPANSION = 3
+
+
+def iter_csv_chunks(data_path: str, chunksize: int, usecols=None) -> Iterator[pd.DataFrame]:
+    """
+    Streams the stop CSV in blocks of `chunksize` rows.
+
+    Args:
+        data_path: path to the data
+        chunksize: number of rows per block
+        usecols: optional subset of columns to read
+    Returns:
+        Iterator[pd.DataFrame]: the raw blocks
+    """
+    kwargs = read_csv_kwargs()
+    kwargs.pop('low_memory')
+    if usecols is not None:
+        kwargs['usecols'] = usecols
+        kwargs['dtype'] = {column: dtype for column, dtype in kwargs['dtype'].items() if column in usecols}
+    return pd.read_csv(data_path, chunksize=chunksize, **kwargs)
+
+
+def split_byte_ranges(data_path: str, block_bytes: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Splits the file into blocks of about `block_bytes`, cut at line ends, so
+    that each worker can read and parse its own block.
+    Assumes that quoted fields do not contain line breaks.
+
+    Args:
+        data_path: path to the data
+        block_bytes: target size of a block, in bytes
+    Returns:
+        Tuple[bytes, List[Tuple[int, int]]]: the header line and the (start, end) offsets
+    """
+    ranges = []
+    with open(data_path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        while start < size:
+            f.seek(min(start + block_bytes, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def read_byte_range(data_path: str, header: bytes, start: int, end: int, usecols=None) -> pd.DataFrame:
+    """
+    Parses one block of the file with the schema dtypes.
+
+    Args:
+        data_path: path to the data
+        header: header line of the file
+        start: offset of the first line of the block
+        end: offset after the last line of the block
+        usecols: optional subset of columns to read
+    Returns:
+        pd.DataFrame: the raw block
+    """
+    with open(data_path, 'rb') as f:
+        f.seek(start)
+        block = f.read(end - start)
+    kwargs = read_csv_kwargs()
+    if usecols is not None:
+        kwargs['usecols'] = usecols
+        kwargs['dtype'] = {column: dtype for column, dtype in kwargs['dtype'].items() if column in usecols}
+    return pd.read_csv(io.BytesIO(header + block), **kwargs)
+
+
+def _duration_distribution(data_path: str, header: bytes, start: int, end: int) -> DurationDistribution:
+    block = read_byte_range(data_path, header, start, end, usecols=['STOP_DURATION_MINS'])
+    return DurationDistribution.from_values(block['STOP_DURATION_MINS'])
+
+
+def _clean_block(data_path: str, header: bytes, start: int, end: int, median_duration: float) -> pd.DataFrame:
+    return preprocess_stops(read_byte_range(data_path, header, start, end), median_duration=median_duration)
+
+
+def estimate_block_bytes(data_path: str, memory_budget_mb: float, n_jobs: int,
+                         chunksize: Optional[int] = None) -> int:
+    """
+    Size of the file blocks so that the blocks being cleaned at the same time
+    (one per worker) fit in the memory budget, from the in-memory size of a
+    parsed sample. If `chunksize` is given, blocks of about that many rows.
+
+    Args:
+        data_path: path to the data
+        memory_budget_mb: memory budget for the blocks in flight, in MB
+        n_jobs: number of worker processes
+        chunksize: optional number of rows per block
+    Returns:
+        int: the target size of a block, in bytes
+    """
+    with open(data_path, 'rb') as f:
+        f.readline()
+        lines = [f.readline() for _ in range(SAMPLE_ROWS)]
+    lines = [line for line in lines if line]
+    bytes_per_line = max(1.0, sum(len(line) for line in lines) / max(len(lines), 1))
+    if chunksize is not None:
+        return max(1, int(chunksize * bytes_per_line))
+
+    sample = pd.read_csv(data_path, nrows=SAMPLE_ROWS, **read_csv_kwargs())
+    memory_per_line = max(1.0, sample.memory_usage(deep=True).sum() / max(len(sample), 1))
+    budget_per_block = memory_budget_mb * 1024 ** 2 / (n_jobs * CLEANING_EXPANSION)
+    return max(MIN_BLOCK_BYTES, int(budget_per_block / memory_per_line * bytes_per_line))
+
+
+class ChunkedCleaner:
+    """
+    Cleans the stop CSV block by block in a process pool, with bounded memory.
+
+    The file is cut into byte ranges at line ends: each worker reads, parses
+    and cleans its own block, so parsing scales with the number of cores and
+    the parent process only holds the cleaned results.
+
+    The imputation median is global: a first parallel pass merges the exact
+    per-block distributions of the durations, then every block is cleaned
+    with the same value, so the result is identical to cleaning the whole
+    file at once.
+
+    Args:
+        data_path: path to the data
+        chunksize: rows per block, derived from the memory budget if None
+        n_jobs: number of worker processes (defaults to the number of cores)
+        memory_budget_mb: memory budget for the blocks in flight, in MB
+    """
+    def __init__(self, data_path: str, chunksize: Optional[int] = None,
+                 n_jobs: Optional[int] = None, memory_budget_mb: float = 1024):
+        self.data_path = data_path
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb
+        self.block_bytes = estimate_block_bytes(data_path, memory_budget_mb, self.n_jobs, chunksize)
+
+    def _map(self, executor: ProcessPoolExecutor, func, ranges, *args) -> list:
+        """Applies func to every block, with at most n_jobs blocks in flight"""
+        results, pending = {}, {}
+        for position, (start, end) in enumerate(ranges):
+            while len(pending) >= self.n_jobs:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            pending[executor.submit(func, self.data_path, self.header, start, end, *args)] = position
+        for future, position in pending.items():
+            results[position] = future.result()
+        return [results[position] for position in sorted(results)]
+
+    def run(self) -> pd.DataFrame:
+        self.header, ranges = split_byte_ranges(self.data_path, self.block_bytes)
+        logging.info(f"Cleaning {self.data_path} in {len(ranges)} blocks of ~{self.block_bytes} bytes "
+                     f"with {self.n_jobs} workers")
+
+        with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+            distribution = DurationDistribution()
+            for block_distribution in self._map(executor, _duration_distribution, ranges):
+                distribution = distribution.merge(block_distribution)
+            median_duration = distribution.median()
+
+            return concat_frames(self._map(executor, _clean_block, ranges, median_duration))
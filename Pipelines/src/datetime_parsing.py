@@ -0,0 +1,165 @@
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .schema import DAYS_ORDER
+
+# Formats essayés, dans l'ordre, sur un échantillon de la colonne DATETIME
+CANDIDATE_FORMATS = [
+    '%Y/%m/%d %H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %I:%M:%S %p',
+    '%m/%d/%Y %H:%M',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+]
+SAMPLE_SIZE = 1_000
+# Au-delà de cette part de valeurs distinctes, factoriser coûte plus que parser chaque valeur
+UNIQUE_RATIO_THRESHOLD = 0.9
+UNIQUE_SAMPLE_SIZE = 10_000
+
+NS_PER_HOUR = 3_600 * 10 ** 9
+NS_PER_DAY = 24 * NS_PER_HOUR
+# Le 1er janvier 1970 était un jeudi (lundi = 0)
+EPOCH_DAYOFWEEK = 3
+
+
+def detect_datetime_format(values: pd.Series, sample_size: int = SAMPLE_SIZE) -> Optional[str]:
+    """
+    Detects the timestamp format of a column from a sample of its values.
+
+    Args:
+        values: raw DATETIME strings
+        sample_size: number of non-null values tested
+    Returns:
+        Optional[str]: the first candidate format parsing the whole sample, or None
+    """
+    sample = values.dropna()
+    if sample.empty:
+        return None
+    # Début et fin du fichier : un changement de format en cours de fichier est détecté
+    sample = pd.concat([sample.head(sample_size // 2), sample.tail(sample_size // 2)]).astype(str)
+    for fmt in CANDIDATE_FORMATS:
+        try:
+            parsed = pd.to_datetime(sample, format=fmt)
+        except (ValueError, TypeError):
+            continue
+        if pd.api.types.is_datetime64_any_dtype(parsed):
+            return fmt
+    return None
+
+
+def estimate_unique_ratio(values: pd.Series, sample_size: int = UNIQUE_SAMPLE_SIZE, seed: int = 0) -> float:
+    """
+    Estimates the share of distinct values of a column from a random sample,
+    without hashing the whole column.
+
+    The number of repeated values in the sample gives the number of distinct
+    values K of a uniform column (m draws produce about m² / 2K repeats),
+    from which the expected number of distinct values among all rows follows.
+
+    Args:
+        values: column to estimate
+        sample_size: number of values drawn
+        seed: seed of the sample
+    Returns:
+        float: estimated number of distinct values divided by the number of rows
+    """
+    n_rows = len(values)
+    if n_rows <= sample_size:
+        return pd.unique(values).size / n_rows if n_rows else 1.0
+    rng = np.random.default_rng(seed)
+    sample = values.iloc[rng.choice(n_rows, sample_size, replace=False)]
+    repeats = sample_size - pd.unique(sample).size
+    if repeats == 0:
+        return 1.0
+    distinct = sample_size ** 2 / (2 * repeats)
+    return min(distinct * -np.expm1(-n_rows / distinct) / n_rows, 1.0)
+
+
+def _to_datetime(values, fmt: Optional[str]) -> pd.DatetimeIndex:
+    """Parses with `fmt`, falling back to format inference if some values do not match it"""
+    if fmt is not None:
+        try:
+            parsed = pd.to_datetime(values, format=fmt)
+            if isinstance(parsed, pd.Series):
+                parsed = pd.DatetimeIndex(parsed)
+            if isinstance(parsed, pd.DatetimeIndex):
+                return parsed
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Timestamps do not all match {fmt}, falling back to inference: {e}")
+    return pd.DatetimeIndex(pd.to_datetime(values))
+
+
+def parse_datetimes(values: pd.Series, fmt: Optional[str] = None,
+                    unique_ratio_threshold: float = UNIQUE_RATIO_THRESHOLD) -> pd.Series:
+    """
+    Parses timestamps with an explicit format, parsing each distinct string
+    only once when the column repeats its values enough for the
+    factorization to pay off.
+
+    Args:
+        values: raw DATETIME strings
+        fmt: strptime format, detected from the values if None
+        unique_ratio_threshold: estimated share of distinct values above
+            which every value is parsed directly, without factorizing
+    Returns:
+        pd.Series: the parsed timestamps (NaT where missing)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    # Valeurs presque toutes distinctes : la factorisation ne ferait que s'ajouter au parsing
+    if estimate_unique_ratio(values) > unique_ratio_threshold:
+        if fmt is None:
+            fmt = detect_datetime_format(values)
+        parsed = _to_datetime(values.to_numpy(), fmt)
+        return pd.Series(parsed, index=values.index, name=values.name)
+
+    codes, uniques = pd.factorize(values)
+    if fmt is None:
+        fmt = detect_datetime_format(pd.Series(uniques))
+
+    parsed = _to_datetime(uniques, fmt)
+    result = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def datetime_parts(timestamps: pd.Series) -> Dict[str, object]:
+    """
+    Calendar features computed from the integer epoch in vectorized form,
+    instead of one `.dt` accessor pass per feature. Time-zone aware
+    timestamps use their local wall time, like `.dt`.
+
+    Args:
+        timestamps: parsed DATETIME values
+    Returns:
+        dict: `hour`, `dayofweek` (lundi = 0), `month`, `year` arrays (float
+        with NaN if some timestamps are missing) and `day_name` categorical
+    """
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    ns = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+    missing = np.isnat(timestamps.to_numpy(dtype='datetime64[ns]'))
+
+    days = ns // NS_PER_DAY
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    parts = {
+        'hour': ((ns - days * NS_PER_DAY) // NS_PER_HOUR).astype('int8'),
+        'dayofweek': ((days + EPOCH_DAYOFWEEK) % 7).astype('int8'),
+        'month': (months % 12 + 1).astype('int8'),
+        'year': (months // 12 + 1970).astype('int16'),
+    }
+
+    day_codes = np.where(missing, -1, parts['dayofweek']).astype('int8')
+    if missing.any():
+        parts = {name: np.where(missing, np.nan, values) for name, values in parts.items()}
+    parts['day_name'] = pd.Categorical.from_codes(day_codes, categories=DAYS_ORDER, ordered=True)
+    return parts
@@ -0,0 +1,169 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .datetime_parsing import datetime_parts, parse_datetimes
+from .schema import INTERVENTION_TYPES, SEASONS, apply_schema
+
+# 1440 = 24 heures en minutes
+MAX_DURATION_MINS = 1440
+
+# Poids de chaque indicateur dans le score d'intervention
+SCORE_WEIGHTS = {
+    'PERSON_SEARCH_PAT_DOWN': 2,
+    'PROPERTY_SEARCH_PAT_DOWN': 2,
+    'TICKETS_ISSUED': 1,
+    'WARNINGS_ISSUED': 0.5,
+    'ARREST_CHARGES': 3,
+}
+
+# Classification par ordre de priorité décroissante : la première condition vraie l'emporte
+TYPE_PRIORITY = [
+    ('ARREST_CHARGES', 'Arrestation'),
+    ('PROPERTY_SEARCH_PAT_DOWN', 'Fouille matérielle'),
+    ('PERSON_SEARCH_PAT_DOWN', 'Fouille personnelle'),
+    ('TICKETS_ISSUED', 'Contravention'),
+]
+
+
+class DurationDistribution:
+    """
+    Exact, mergeable distribution of the raw stop durations.
+
+    Stores the count of each distinct duration, so that distributions built
+    on separate chunks (or partitions) can be merged and still give the exact
+    median used to impute invalid durations.
+    """
+
+    def __init__(self, counts: Optional[pd.Series] = None):
+        self.counts = counts if counts is not None else pd.Series(dtype='int64')
+
+    @classmethod
+    def from_values(cls, durations: pd.Series) -> 'DurationDistribution':
+        values = pd.to_numeric(durations, errors='coerce')
+        return cls(values.value_counts(dropna=True).astype('int64'))
+
+    @classmethod
+    def from_dict(cls, counts: dict) -> 'DurationDistribution':
+        return cls(pd.Series({float(value): int(count) for value, count in counts.items()}, dtype='int64'))
+
+    def to_dict(self) -> dict:
+        return {repr(float(value)): int(count) for value, count in self.counts.items()}
+
+    def merge(self, other: 'DurationDistribution') -> 'DurationDistribution':
+        return DurationDistribution(self.counts.add(other.counts, fill_value=0).astype('int64'))
+
+    def median(self) -> float:
+        counts = self.counts.sort_index()
+        total = int(counts.sum())
+        if total == 0:
+            return np.nan
+        cumulative = counts.to_numpy().cumsum()
+        values = counts.index.to_numpy(dtype='float64')
+        # Même convention que pandas : moyenne des deux valeurs centrales si effectif pair
+        lower = values[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+        upper = values[np.searchsorted(cumulative, total // 2 + 1)]
+        return (lower + upper) / 2
+
+
+def clamp_duration(durations: pd.Series, median_duration: Optional[float] = None) -> np.ndarray:
+    """
+    Replaces missing, negative and longer than 24h durations by the median,
+    in a single vectorized pass.
+
+    Args:
+        durations: raw STOP_DURATION_MINS values
+        median_duration: imputation value, computed from `durations` if None
+    Returns:
+        np.ndarray: the cleaned durations
+    """
+    values = pd.to_numeric(durations, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    if median_duration is None:
+        median_duration = np.nan if np.isnan(values).all() else np.nanmedian(values)
+    invalid = np.isnan(values) | (values < 0) | (values > MAX_DURATION_MINS)
+    return np.where(invalid, median_duration, values)
+
+
+def intervention_score(data: pd.DataFrame) -> np.ndarray:
+    """
+    Weighted sum of the intervention indicators present on each stop.
+
+    Args:
+        data: stop data with the indicator columns
+    Returns:
+        np.ndarray: the intervention score of each row
+    """
+    score = np.zeros(len(data), dtype='float64')
+    for column, weight in SCORE_WEIGHTS.items():
+        score += data[column].notna().to_numpy() * weight
+    return score
+
+
+def intervention_type(data: pd.DataFrame) -> pd.Categorical:
+    """
+    Most serious intervention of each stop, computed with one np.select.
+
+    Args:
+        data: stop data with the indicator columns
+    Returns:
+        pd.Categorical: the intervention type of each row
+    """
+    conditions = [data[column].notna().to_numpy() for column, _ in TYPE_PRIORITY]
+    codes = np.select(conditions,
+                      [INTERVENTION_TYPES.index(label) for _, label in TYPE_PRIORITY],
+                      default=INTERVENTION_TYPES.index('Contrôle simple'))
+    return pd.Categorical.from_codes(codes.astype('int8'), categories=INTERVENTION_TYPES)
+
+
+def season(month: pd.Series) -> pd.Categorical:
+    """
+    Season of each month (Hiver = janvier à mars, ...).
+
+    Args:
+        month: month numbers from 1 to 12
+    Returns:
+        pd.Categorical: the season of each row
+    """
+    values = month.to_numpy(dtype='float64', na_value=np.nan)
+    codes = np.where(np.isnan(values), -1, (values - 1) // 3).astype('int8')
+    return pd.Categorical.from_codes(codes, categories=SEASONS, ordered=True)
+
+
+def preprocess_stops(data: pd.DataFrame, median_duration: Optional[float] = None) -> pd.DataFrame:
+    """
+    Cleans the raw stop data and creates the dashboard features.
+    Shared by the dashboard (utils.load_and_preprocess_data) and the
+    pipeline (DataPreProcessing).
+
+    Args:
+        data: raw stop data
+        median_duration: imputation value for invalid durations, computed
+            from `data` if None (chunked callers pass the global median)
+    Returns:
+        pd.DataFrame: the preprocessed data, cast to the dataset schema
+    """
+    # Conversion des dates (format détecté une fois, chaque valeur distincte parsée une fois)
+    data['DATETIME'] = parse_datetimes(data['DATETIME'])
+
+    # Nettoyage des durées d'intervention
+    data['STOP_DURATION_MINS'] = clamp_duration(data['STOP_DURATION_MINS'], median_duration)
+
+    # Nettoyage de la colonne STOP_DISTRICT : les lignes sans district sont écartées
+    # lors de la conversion au schéma, pour ne copier chaque colonne qu'une fois
+    data['STOP_DISTRICT'] = pd.to_numeric(data['STOP_DISTRICT'], errors='coerce')
+    has_district = data['STOP_DISTRICT'].notna().to_numpy()
+
+    # Création d'indicateurs temporels, calculés depuis l'epoch entier en une passe
+    parts = datetime_parts(data['DATETIME'])
+    data['hour'] = parts['hour']
+    data['day_of_week'] = parts['day_name']
+    data['month'] = parts['month']
+    data['year'] = parts['year']
+    data['season'] = season(data['month'])
+
+    # Création d'indicateurs d'intervention
+    data['intervention_score'] = intervention_score(data)
+    data['intervention_type'] = intervention_type(data)
+
+    return apply_schema(data, rows=has_district)
@@ -0,0 +1,151 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Ordre des jours utilisé par les figures
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEASONS = ['Hiver', 'Printemps', 'Été', 'Automne']
+INTERVENTION_TYPES = ['Contrôle simple', 'Contravention', 'Fouille personnelle',
+                      'Fouille matérielle', 'Arrestation']
+
+# Colonnes brutes lues depuis le CSV et leur dtype de lecture.
+# Les colonnes absentes de ce dictionnaire ne sont utilisées par aucune figure
+# et ne sont pas chargées.
+RAW_DTYPES: Dict[str, Optional[str]] = {
+    'DATETIME': None,
+    'STOP_DISTRICT': None,
+    'STOP_DURATION_MINS': None,
+    'AGE': None,
+    'ETHNICITY': 'category',
+    'GENDER': 'category',
+    'STOP_REASON_TICKET': 'category',
+    'STOP_REASON_NONTICKET': 'category',
+    'STOP_REASON_HARBOR': 'category',
+    'PERSON_SEARCH_PAT_DOWN': 'category',
+    'PROPERTY_SEARCH_PAT_DOWN': 'category',
+    'TICKETS_ISSUED': 'category',
+    'WARNINGS_ISSUED': 'category',
+    'ARREST_CHARGES': 'category',
+}
+
+# Schéma du dataset prétraité
+STOP_SCHEMA: Dict[str, object] = {
+    'DATETIME': None,
+    'STOP_DISTRICT': 'uint8',
+    'STOP_DURATION_MINS': 'float32',
+    'AGE': 'float32',
+    'ETHNICITY': 'category',
+    'GENDER': 'category',
+    'STOP_REASON_TICKET': 'category',
+    'STOP_REASON_NONTICKET': 'category',
+    'STOP_REASON_HARBOR': 'category',
+    'PERSON_SEARCH_PAT_DOWN': 'category',
+    'PROPERTY_SEARCH_PAT_DOWN': 'category',
+    'TICKETS_ISSUED': 'category',
+    'WARNINGS_ISSUED': 'category',
+    'ARREST_CHARGES': 'category',
+    'hour': 'int8',
+    'day_of_week': pd.CategoricalDtype(DAYS_ORDER, ordered=True),
+    'month': 'int8',
+    'year': 'int16',
+    'season': pd.CategoricalDtype(SEASONS, ordered=True),
+    'intervention_score': 'float32',
+    'intervention_type': pd.CategoricalDtype(INTERVENTION_TYPES),
+}
+
+# Équivalents nullables des entiers, utilisés si une colonne contient des valeurs manquantes
+_NULLABLE_INTS = {'int8': 'Int8', 'int16': 'Int16', 'uint8': 'UInt8'}
+
+
+def read_csv_kwargs() -> dict:
+    """
+    Arguments of pd.read_csv loading only the columns declared in the schema.
+
+    Returns:
+        dict: `usecols` and `dtype` keyword arguments
+    """
+    return {
+        'usecols': lambda column: column in RAW_DTYPES,
+        'dtype': {column: dtype for column, dtype in RAW_DTYPES.items() if dtype is not None},
+        'low_memory': False,
+    }
+
+
+def apply_schema(data: pd.DataFrame, rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Casts the preprocessed columns to the declared schema and drops the
+    columns that are not part of it.
+
+    Args:
+        data: preprocessed stop data
+        rows: optional boolean mask of the rows to keep, applied column by column
+    Returns:
+        pd.DataFrame: the data with compact dtypes
+    """
+    columns = [column for column in STOP_SCHEMA if column in data.columns]
+    dropped = [column for column in data.columns if column not in STOP_SCHEMA]
+    if dropped:
+        logging.info(f"Dropping columns unused by the dashboard: {dropped}")
+
+    index = data.index if rows is None else data.index[rows]
+    casted = {}
+    for column in columns:
+        dtype = STOP_SCHEMA[column]
+        series = data[column] if rows is None else data[column][rows]
+        if dtype is None:
+            casted[column] = series
+            continue
+        if dtype in ('float32', 'int8', 'int16', 'uint8') and not pd.api.types.is_numeric_dtype(series):
+            series = pd.to_numeric(series, errors='coerce')
+        if dtype in _NULLABLE_INTS and series.isna().any():
+            dtype = _NULLABLE_INTS[dtype]
+        casted[column] = series.astype(dtype)
+    return pd.DataFrame(casted, index=index)
+
+
+def memory_report(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Compares the memory footprint (in MB) of several versions of the dataset.
+
+    Args:
+        frames: label -> DataFrame, e.g. {'avant': raw_df, 'après': compact_df}
+    Returns:
+        pd.DataFrame: per-column footprint, with a TOTAL row
+    """
+    report = pd.DataFrame({
+        label: frame.memory_usage(deep=True, index=False) / 1024 ** 2
+        for label, frame in frames.items()
+    })
+    report.loc['TOTAL'] = report.sum()
+    return report.round(2)
+
+
+
+def concat_frames(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates frames sharing the schema. Categorical columns whose
+    categories differ between frames (e.g. chunks read separately) are
+    recoded on the union of the categories instead of falling back to object.
+
+    Args:
+        frames: frames to concatenate, in order
+    Returns:
+        pd.DataFrame: the concatenated data
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=list(STOP_SCHEMA))
+    for column in frames[0].columns:
+        dtypes = [frame[column].dtype for frame in frames]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        categories = pd.Index(dtypes[0].categories).append(
+            [pd.Index(dtype.categories) for dtype in dtypes[1:]]
+        ).unique()
+        unified = pd.CategoricalDtype(categories, ordered=dtypes[0].ordered)
+        frames = [frame.assign(**{column: frame[column].astype(unified)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
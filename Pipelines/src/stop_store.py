@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .datetime_parsing import datetime_parts, parse_datetimes
+from .preprocessing import DurationDistribution, preprocess_stops
+from .schema import concat_frames
+
+MANIFEST_NAME = '_manifest.json'
+
+
+class StopStore:
+    """
+    Append-only store of the cleaned stop data, partitioned by year/month.
+
+    Each partition is a Parquet file written once. The manifest lists the
+    partitions and keeps, for each of them, the distribution of the raw
+    durations it was built from: the global imputation median is the median
+    of the merged distributions, so appending a month never rescans the
+    rows already stored.
+
+    Args:
+        root: directory of the store
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self) -> dict:
+        if not self.exists():
+            return {'generation': 0, 'partitions': {}}
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def version(self) -> str:
+        """Identifier of the store content, changed by every append"""
+        return f"store-{self.read_manifest()['generation']}"
+
+    def partitions(self) -> List[str]:
+        return sorted(self.read_manifest()['partitions'])
+
+    def partition_paths(self) -> List[str]:
+        """Parquet files of the current partitions, in chronological order"""
+        manifest = self.read_manifest()
+        return [os.path.join(self.root, manifest['partitions'][key]['path']) for key in sorted(manifest['partitions'])]
+
+    def duration_distribution(self, manifest: Optional[dict] = None) -> DurationDistribution:
+        """Distribution of the raw durations of every stored partition"""
+        manifest = manifest or self.read_manifest()
+        distribution = DurationDistribution()
+        for partition in manifest['partitions'].values():
+            distribution = distribution.merge(DurationDistribution.from_dict(partition['durations']))
+        return distribution
+
+    def append(self, raw: pd.DataFrame, replace: bool = False) -> List[str]:
+        """
+        Cleans and writes the months of `raw` that are not in the store yet.
+
+        Args:
+            raw: raw stop data (e.g. the latest MPD extract)
+            replace: also rewrite the months already stored (e.g. a month that
+                was published incomplete)
+        Returns:
+            List[str]: the partitions written, as 'YYYY-MM'
+        """
+        manifest = self.read_manifest()
+        raw = raw.copy()
+        raw['DATETIME'] = parse_datetimes(raw['DATETIME'])
+
+        parts = datetime_parts(raw['DATETIME'])
+        year = np.asarray(parts['year'], dtype='float64')
+        month = np.asarray(parts['month'], dtype='float64')
+        dated = ~np.isnan(year)
+        if not dated.all():
+            logging.warning(f"Skipping {(~dated).sum()} rows without a valid DATETIME")
+        # Clé de partition entière AAAAMM, convertie en 'AAAA-MM' pour les seules valeurs distinctes
+        periods = np.where(dated, np.nan_to_num(year) * 100 + np.nan_to_num(month), -1).astype('int64')
+        keys = {f"{period // 100:04d}-{period % 100:02d}": period for period in np.unique(periods[dated])}
+
+        existing = set(manifest['partitions'])
+        new_keys = sorted(key for key in keys if replace or key not in existing)
+        skipped = sorted(set(keys) & existing - set(new_keys))
+        if skipped:
+            logging.info(f"Partitions already stored, left untouched: {skipped}")
+        if not new_keys:
+            return []
+
+        masks = {key: periods == keys[key] for key in new_keys}
+        distributions = {key: DurationDistribution.from_values(raw['STOP_DURATION_MINS'][mask])
+                         for key, mask in masks.items()}
+
+        # Médiane globale mise à jour à partir des distributions stockées, sans relire les lignes
+        kept = {key: partition for key, partition in manifest['partitions'].items() if key not in masks}
+        global_distribution = self.duration_distribution({'partitions': kept})
+        for distribution in distributions.values():
+            global_distribution = global_distribution.merge(distribution)
+        median_duration = global_distribution.median()
+
+        generation = manifest['generation'] + 1
+        replaced_files = []
+        for key, mask in masks.items():
+            group = raw[mask].copy()
+            year_str, month_str = key.split('-')
+            relative_path = os.path.join(f"year={year_str}", f"month={month_str}", f"part-{generation:05d}.parquet")
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            preprocess_stops(group, median_duration=median_duration).to_parquet(path, index=False)
+
+            if key in manifest['partitions']:
+                replaced_files.append(manifest['partitions'][key]['path'])
+            manifest['partitions'][key] = {
+                'path': relative_path,
+                'rows': len(group),
+                'durations': distributions[key].to_dict(),
+                'median_duration': median_duration,
+            }
+            logging.info(f"Wrote partition {key} ({len(group)} rows)")
+
+        manifest['generation'] = generation
+        manifest['median_duration'] = median_duration
+        self._write_manifest(manifest)
+
+        # Les anciens fichiers ne sont supprimés qu'une fois le nouveau manifeste publié
+        for relative_path in replaced_files:
+            try:
+                os.remove(os.path.join(self.root, relative_path))
+            except OSError:
+                pass
+        return new_keys
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Reads the union of all partitions, in chronological order.
+
+        Args:
+            columns: optional subset of columns to read
+        Returns:
+            pd.DataFrame: the cleaned stop data
+        """
+        frames = [pd.read_parquet(path, columns=columns) for path in self.partition_paths()]
+        return concat_frames(frames)
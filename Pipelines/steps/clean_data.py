@@ -2,18 +2,46 @@ import logging
 from zenml import step
 import pandas as pd 
 from src.data_cleaning import DataPreProcessing, DataStrategy
+from src.chunked_cleaning import ChunkedCleaner
 from typing_extensions import Annotated
-from typing import Tuple
+from typing import Optional
 
 
 @step 
-def clean_df(df: pd.DataFrame) -> Tuple:
-    Annotated(pd.DataFrame)
+def clean_df(df: pd.DataFrame) -> Annotated[pd.DataFrame, "cleaned_data"]:
     try:
         process_strategy = DataPreProcessing()
-        processed_data = process_strategy.handle_data()
+        processed_data = process_strategy.handle_data(df)
 
         logging.info("Data cleaning Completed")
+        return processed_data
     except Exception as e:
         logging.error("Error in cleaning data: {}".format(e))
-        raise e
\ No newline at end of file
+        raise e
+
+
+@step
+def clean_df_chunked(data_path: str, chunksize: Optional[int] = None, n_jobs: Optional[int] = None,
+                     memory_budget_mb: float = 1024) -> Annotated[pd.DataFrame, "cleaned_data"]:
+    """
+    Ingests and cleans the data block by block in a process pool, keeping
+    the raw blocks in flight within `memory_budget_mb`.
+
+    Args:
+        data_path: path to the data
+        chunksize: rows per block, derived from the memory budget if None
+        n_jobs: number of worker processes (defaults to the number of cores)
+        memory_budget_mb: memory budget for the raw blocks, in MB
+    Returns:
+        pd.DataFrame: the cleaned data
+    """
+    try:
+        cleaner = ChunkedCleaner(data_path, chunksize=chunksize, n_jobs=n_jobs,
+                                 memory_budget_mb=memory_budget_mb)
+        processed_data = cleaner.run()
+
+        logging.info("Chunked data cleaning Completed")
+        return processed_data
+    except Exception as e:
+        logging.error("Error in chunked data cleaning: {}".format(e))
+        raise e
@@ -1,6 +1,10 @@
 import logging
 import pandas as pd 
 from zenml import step 
+from src.schema import read_csv_kwargs
+from src.chunked_cleaning import iter_csv_chunks
+from src.stop_store import StopStore
+from typing import Optional
 
 
 class IngestData:
@@ -13,21 +17,30 @@ class IngestData:
     
     def get_data(self):
         logging.info(f"Ingesting data from {self.data_path}")
-        return pd.read_csv(self.data_path)
+        return pd.read_csv(self.data_path, **read_csv_kwargs())
+
+    def iter_chunks(self, chunksize: int):
+        logging.info(f"Streaming data from {self.data_path} in blocks of {chunksize} rows")
+        return iter_csv_chunks(self.data_path, chunksize)
 
 @step
-def ingest_df(data_path: str) -> pd.DataFrame:
+def ingest_df(data_path: str, store_dir: Optional[str] = None) -> pd.DataFrame:
     """
     Ingesting the data from the data_path
 
     Args:
         data_path: path to the data
+        store_dir: optional partitioned store (see src.stop_store) to which the
+            months not stored yet are appended, cleaned
     Returns:
         pd.DataFrame: the ingested data
     """
     try:
         Ingest_data = IngestData(data_path)
         df = Ingest_data.get_data()
+        if store_dir is not None:
+            new_partitions = StopStore(store_dir).append(df)
+            logging.info(f"Appended partitions to {store_dir}: {new_partitions}")
         return df 
     except Exception as e:
         logging.error(f"Error while ingesting data: {e}")
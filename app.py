@@ -1,266 +1,630 @@
 # app.py
 import dash
+import diskcache
+import psutil
+from dash import DiskcacheManager, Patch
+from flask import Response, has_request_context, jsonify
+from flask_compress import Compress
 from dash import dcc, html
 from dash.dependencies import Input, Output
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from utils import load_and_preprocess_data, DISTRICT_COORDINATES, analyze_stop_reasons, get_hourly_stats
+from utils import (load_and_preprocess_data, dataset_version, dataset_summary, default_summary,
+                   parquet_sources, DISTRICT_COORDINATES)
+import numpy as np
 import pandas as pd
-from ml_optimizer import PoliceResourceOptimizer, create_deployment_visualization
+from ml_optimizer import (DISTRICT_METRICS, create_deployment_skeletons, deployment_model_version,
+                          deployment_optimizer, deployment_traces, resource_needs)
 from datetime import datetime
+import collections
+import copy
+import importlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from data_manager import PRELOAD_ENV, DatasetManager, DatasetSnapshot
+from filter_index import sort_by_datetime
+from column_store import ColumnStore
+from model_registry import ModelRegistry
+from query_backend import CI_SUFFIX, DuckDBBackend, PandasBackend, selected_backend
+from approximate import approximate_enabled, duckdb_stratified_sample, stratified_sample
+from Pipelines.src.schema import INTERVENTION_TYPES
+from result_cache import ResultCache
+from fork_safety import fork_safe
+from wire_format import compact_figure, compact_output, encode_arrays
+from instrumentation import PROFILE_SLOW_MS, flush as flush_metrics, measured, profiled, render_metrics, stage
 
-# Chargement des données
-df = load_and_preprocess_data()
+# Chargement des données, rechargées à chaud quand une nouvelle version est publiée.
+# Les colonnes sont projetées en mémoire depuis le store : une seule copie physique
+# partagée par le maître gunicorn et tous ses workers
+column_store = ColumnStore()
+
+# Moteur des requêtes (DASHBOARD_BACKEND) : données en mémoire avec pandas, ou laissées
+# sur disque et interrogées par DuckDB
+QUERY_BACKEND = selected_backend()
+# Aperçu approché (DASHBOARD_APPROXIMATE) : les requêtes larges affichent d'abord des
+# estimations sur un échantillon stratifié, remplacées par le résultat exact
+APPROXIMATE = approximate_enabled()
+
+def sorted_data():
+    # Lignes triées par date : une période devient une tranche de l'index de filtrage
+    return sort_by_datetime(load_and_preprocess_data())
+
+def build_snapshot(version):
+    # Chargement exclu des forks des jobs (imports à la demande, voir fork_safety.py)
+    with fork_safe():
+        if QUERY_BACKEND == 'duckdb':
+            return _build_duckdb_snapshot(version)
+        return _build_snapshot(version)
+
+def _build_snapshot(version):
+    # Cube et dictionnaire des raisons construits une seule fois, projetés comme les colonnes
+    with stage('column_store') as current:
+        df, index, cube, reasons = column_store.attach(version, sorted_data, summarize=dataset_summary)
+        current.rows = len(df)
+    column_store.prune(keep=version)
+    summary = column_store.summary(version) or dataset_summary(df)
+    load_deployment_model()
+    preview = None
+    if APPROXIMATE:
+        with stage('sample_build', rows=len(df)):
+            preview = stratified_sample(df)
+    flush_metrics()
+    return DatasetSnapshot(version, df, cube=cube, index=index, summary=summary,
+                           backend=PandasBackend(df, index, cube, reasons), preview=preview)
+
+def _build_duckdb_snapshot(version):
+    # Aucune ligne chargée : filtres et agrégations exécutés par DuckDB sur les fichiers Parquet
+    with stage('duckdb_attach'):
+        backend = DuckDBBackend(parquet_sources())
+        summary = backend.summary()
+    load_deployment_model()
+    preview = None
+    if APPROXIMATE:
+        with stage('sample_build'):
+            preview = duckdb_stratified_sample(backend)
+    flush_metrics()
+    return DatasetSnapshot(version, None, summary=summary, backend=backend, preview=preview)
+
+def load_deployment_model():
+    # Modèle du plan de déploiement chargé avec les données, avant les callbacks et les jobs
+    # forkés qui en héritent ; une version plus récente du registre est prise au rechargement
+    # des données ou à la vérification suivante (poll_deployment_model)
+    with stage('model_load'):
+        deployment_optimizer(refresh=True)
+
+def poll_deployment_model():
+    # Modèle publié par train_model.py entre deux versions des données : pris sans attendre
+    # le prochain rechargement (liste des versions du registre, rien n'est lu s'il n'a pas changé)
+    if ModelRegistry().latest() != deployment_model_version():
+        with fork_safe():
+            load_deployment_model()
+
+data_manager = DatasetManager(build_snapshot, dataset_version)
+data_manager.add_poller(poll_deployment_model)
+# Résultats partagés entre workers, purgés des anciennes versions à chaque rechargement
+result_cache = ResultCache()
+data_manager.add_listener(result_cache.invalidate)
+# Le dataset est chargé en arrière-plan : le serveur répond dès son démarrage.
+# Sous gunicorn (preload_app), le maître lance l'écriture du store et le chargement
+# démarre dans chaque worker après le fork (voir gunicorn.conf.py) : le maître ne
+# doit porter aucun thread quand il forke
+if not os.environ.get(PRELOAD_ENV):
+    data_manager.start()
+
+def build_column_store():
+    """Écriture du store de la version courante dans un processus fils (maître gunicorn)"""
+    if QUERY_BACKEND == 'duckdb':
+        # Aucune colonne projetée : DuckDB lit directement les fichiers Parquet
+        return None
+    try:
+        version = dataset_version()
+    except OSError:
+        # Données sources illisibles : les workers réessaient à leur chargement
+        return None
+    return column_store.build_in_background(version, sorted_data, summarize=dataset_summary)
+
+# Callbacks longs exécutés dans des processus séparés, suivis sur disque (sans Redis) :
+# une nouvelle requête du même callback annule le calcul en cours qu'elle remplace
+CALLBACK_JOBS_DIR = 'callback_jobs'
+BACKGROUND_POLL_MS = 250
+
+class JobCache(diskcache.Cache):
+    """Suivi des callbacks longs ; accès SQLite exclus des forks qui lancent les jobs (fork_safety.py)"""
+
+    def get(self, *args, **kwargs):
+        with fork_safe():
+            return super().get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with fork_safe():
+            return super().set(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with fork_safe():
+            return super().delete(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        with fork_safe():
+            return super().touch(*args, **kwargs)
+
+    @contextmanager
+    def transact(self, retry=False):
+        with fork_safe(), super().transact(retry) as result:
+            yield result
+
+class JobManager(DiskcacheManager):
+    def terminate_job(self, job):
+        # Un job qui se termine entre la vérification de son pid et son arrêt (relevé
+        # concurrent de son résultat par deux requêtes) n'est pas une erreur
+        try:
+            super().terminate_job(job)
+        except psutil.NoSuchProcess:
+            pass
+
+background_callback_manager = JobManager(JobCache(CALLBACK_JOBS_DIR))
+
+# Modules importés à la demande (démarrage rapide), utilisés par les callbacks longs :
+# importés avant le premier fork d'un job pour que les processus des jobs en héritent
+# au lieu de les importer à chaque calcul (le maître gunicorn, sans thread, ne forke
+# que les workers et n'est pas concerné)
+LAZY_MODULES = ('plotly.express', 'plotly.subplots')
+
+def import_lazy_modules():
+    if threading.active_count() > 1:
+        for name in LAZY_MODULES:
+            importlib.import_module(name)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=import_lazy_modules)
 
 # Création de l'application avec thème Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[
     'https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css'
-])
-
-# Layout principal
-app.layout = html.Div([
-    # Navbar avec titre
-    html.Nav(className="navbar navbar-dark bg-dark", children=[
-        html.Span("Analyse des interventions policières à Washington DC", 
-                 className="navbar-brand mb-0 h1")
-    ]),
+], background_callback_manager=background_callback_manager)
+
+# Réponses compressées (brotli, sinon gzip) ; niveaux rapides, le JSON des figures étant très redondant
+COMPRESS_BR_LEVEL = 4
+COMPRESS_GZIP_LEVEL = 6
+app.server.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_BR_LEVEL=COMPRESS_BR_LEVEL,
+    COMPRESS_LEVEL=COMPRESS_GZIP_LEVEL,
+)
+Compress(app.server)
+
+# Application WSGI servie par gunicorn (gunicorn.conf.py)
+server = app.server
+
+# Compteurs du cache de résultats, pour en régler la taille
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# Histogrammes des étapes (durée, lignes, pic d'allocation) au format Prometheus
+@app.server.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Sondes de l'orchestrateur : le processus répond / le dataset est chargé et servi
+@app.server.route('/healthz')
+def healthz():
+    return jsonify(status='ok')
+
+@app.server.route('/readyz')
+def readyz():
+    if not data_manager.ready:
+        return jsonify(ready=False), 503
+    return jsonify(ready=True, version=data_manager.version)
+
+def layout_summary():
+    """
+    Bornes des dates et options des filtres, lues dans les métadonnées du
+    dataset : le layout est servi sans attendre le chargement des données
+    """
+    summary = data_manager.summary
+    if summary is None:
+        try:
+            summary = column_store.summary(dataset_version())
+        except OSError:
+            summary = None
+    return summary or default_summary()
+
+# Layout principal, reconstruit à chaque chargement de page pour refléter le dataset en service
+def serve_layout():
+    summary = layout_summary()
+    # Dash appelle aussi serve_layout hors requête, pour valider le layout à son installation :
+    # figures vides, les squelettes ne sont construits qu'au premier layout servi
+    skeletons = figure_skeletons() if has_request_context() else collections.defaultdict(dict)
+    start_date, end_date = summary['start_date'], summary['end_date']
+    districts = summary['districts']
+    intervention_types = summary['intervention_types']
+
+    return html.Div([
+        # Navbar avec titre
+        html.Nav(className="navbar navbar-dark bg-dark", children=[
+            html.Span("Analyse des interventions policières à Washington DC", 
+                     className="navbar-brand mb-0 h1")
+        ]),
     
-    # Corps principal
-    html.Div(className="container-fluid", children=[
-        # Filtres
-        html.Div(className="row mt-3", children=[
-            html.Div(className="col-md-12", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Filtres", className="card-title"),
-                        html.Div(className="row", children=[
-                            # Sélection de la période
-                            html.Div(className="col-md-4", children=[
-                                html.Label("Période d'analyse"),
-                                dcc.DatePickerRange(
-                                    id='date-range',
-                                    start_date=df['DATETIME'].min(),
-                                    end_date=df['DATETIME'].max(),
-                                    display_format='YYYY-MM-DD'
-                                )
-                            ]),
-                            # Sélection des districts
-                            html.Div(className="col-md-4", children=[
-                                html.Label("Districts"),
-                                dcc.Dropdown(
-                                    id='district-filter',
-                                    options=[
-                                        {'label': f'District {int(d)} - {DISTRICT_COORDINATES[d]["name"]}', 
-                                         'value': d}
-                                        for d in sorted(df['STOP_DISTRICT'].unique()) if not pd.isna(d)
-                                    ],
-                                    multi=True,
-                                    placeholder="Tous les districts"
-                                )
-                            ]),
-                            # Sélection du type d'intervention
-                            html.Div(className="col-md-4", children=[
-                                html.Label("Type d'intervention"),
-                                dcc.Dropdown(
-                                    id='intervention-type-filter',
-                                    options=[
-                                        {'label': t, 'value': t}
-                                        for t in df['intervention_type'].unique()
-                                    ],
-                                    multi=True,
-                                    placeholder="Tous les types"
-                                )
+        # Corps principal
+        html.Div(className="container-fluid", children=[
+            # Filtres
+            html.Div(className="row mt-3", children=[
+                html.Div(className="col-md-12", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Filtres", className="card-title"),
+                            html.Div(className="row", children=[
+                                # Sélection de la période, journée de fin comprise (voir cube.period_days)
+                                html.Div(className="col-md-4", children=[
+                                    html.Label("Période d'analyse"),
+                                    dcc.DatePickerRange(
+                                        id='date-range',
+                                        start_date=start_date,
+                                        end_date=end_date,
+                                        display_format='YYYY-MM-DD'
+                                    )
+                                ]),
+                                # Sélection des districts
+                                html.Div(className="col-md-4", children=[
+                                    html.Label("Districts"),
+                                    dcc.Dropdown(
+                                        id='district-filter',
+                                        options=[
+                                            {'label': f'District {int(d)} - {DISTRICT_COORDINATES[d]["name"]}', 
+                                             'value': d}
+                                            for d in districts
+                                        ],
+                                        multi=True,
+                                        placeholder="Tous les districts"
+                                    )
+                                ]),
+                                # Sélection du type d'intervention
+                                html.Div(className="col-md-4", children=[
+                                    html.Label("Type d'intervention"),
+                                    dcc.Dropdown(
+                                        id='intervention-type-filter',
+                                        options=[
+                                            {'label': t, 'value': t}
+                                            for t in intervention_types
+                                        ],
+                                        multi=True,
+                                        placeholder="Tous les types"
+                                    )
+                                ])
                             ])
                         ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Première rangée - Carte et Stats
-        html.Div(className="row mt-3", children=[
-            # Carte des districts
-            html.Div(className="col-md-8", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Distribution géographique", className="card-title"),
-                        dcc.Graph(id='district-map')
+            # Première rangée - Carte et Stats
+            html.Div(className="row mt-3", children=[
+                # Carte des districts
+                html.Div(className="col-md-8", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Distribution géographique", className="card-title"),
+                            dcc.Graph(id='district-map')
+                        ])
                     ])
-                ])
-            ]),
-            # Statistiques globales
-            html.Div(className="col-md-4", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Statistiques globales", className="card-title"),
-                        html.Div(id='global-stats')
+                ]),
+                # Statistiques globales
+                html.Div(className="col-md-4", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Statistiques globales", className="card-title"),
+                            html.Div(id='global-stats')
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Deuxième rangée - Analyse temporelle
-        html.Div(className="row mt-3", children=[
-            # Distribution horaire
-            html.Div(className="col-md-12", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Analyse horaire détaillée", className="card-title"),
-                        dcc.Graph(id='hourly-analysis')
+            # Deuxième rangée - Analyse temporelle
+            html.Div(className="row mt-3", children=[
+                # Distribution horaire
+                html.Div(className="col-md-12", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Analyse horaire détaillée", className="card-title"),
+                            dcc.Graph(id='hourly-analysis')
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Troisième rangée - Raisons et Types
-        html.Div(className="row mt-3", children=[
-            # Raisons des arrêts
-            html.Div(className="col-md-6", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Top 10 des raisons d'intervention", className="card-title"),
-                        dcc.Graph(id='stop-reasons')
+            # Troisième rangée - Raisons et Types
+            html.Div(className="row mt-3", children=[
+                # Raisons des arrêts
+                html.Div(className="col-md-6", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5(REASONS_TITLE, className="card-title"),
+                            dcc.Graph(id='stop-reasons')
+                        ])
                     ])
-                ])
-            ]),
-            # Types d'interventions
-            html.Div(className="col-md-6", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Types d'interventions", className="card-title"),
-                        dcc.Graph(id='intervention-types')
+                ]),
+                # Types d'interventions
+                html.Div(className="col-md-6", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Types d'interventions", className="card-title"),
+                            dcc.Graph(id='intervention-types')
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Quatrième rangée - Heatmap et Patterns
-        html.Div(className="row mt-3", children=[
-            # Heatmap temporelle
-            html.Div(className="col-md-6", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Distribution temporelle", className="card-title"),
-                        dcc.Graph(id='temporal-heatmap')
+            # Quatrième rangée - Heatmap et Patterns
+            html.Div(className="row mt-3", children=[
+                # Heatmap temporelle
+                html.Div(className="col-md-6", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Distribution temporelle", className="card-title"),
+                            dcc.Graph(id='temporal-heatmap')
+                        ])
                     ])
-                ])
-            ]),
-            # Patterns hebdomadaires
-            html.Div(className="col-md-6", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Patterns hebdomadaires", className="card-title"),
-                        dcc.Graph(id='weekly-patterns')
+                ]),
+                # Patterns hebdomadaires
+                html.Div(className="col-md-6", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Patterns hebdomadaires", className="card-title"),
+                            dcc.Graph(id='weekly-patterns')
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Cinquième rangée - Analyse ethnique
-        html.Div(className="row mt-3", children=[
-            html.Div(className="col-md-12", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Analyse par ethnicité", className="card-title"),
-                        dcc.Graph(id='ethnicity-analysis')
+            # Cinquième rangée - Analyse ethnique
+            html.Div(className="row mt-3", children=[
+                html.Div(className="col-md-12", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Analyse par ethnicité", className="card-title"),
+                            dcc.Graph(id='ethnicity-analysis', figure=skeletons['ethnicity-analysis'])
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Sixième rangée - Analyse par âge
-        html.Div(className="row mt-3", children=[
-            html.Div(className="col-md-12", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Analyse par âge", className="card-title"),
-                        dcc.Graph(id='age-analysis')
+            # Sixième rangée - Analyse par âge
+            html.Div(className="row mt-3", children=[
+                html.Div(className="col-md-12", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Analyse par âge", className="card-title"),
+                            dcc.Graph(id='age-analysis', figure=skeletons['age-analysis'])
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Septième rangée - Tendances mensuelles
-        html.Div(className="row mt-3 mb-3", children=[
-            html.Div(className="col-md-12", children=[
-                html.Div(className="card", children=[
-                    html.Div(className="card-body", children=[
-                        html.H5("Tendances mensuelles", className="card-title"),
-                        dcc.Graph(id='monthly-trends')
+            # Septième rangée - Tendances mensuelles
+            html.Div(className="row mt-3 mb-3", children=[
+                html.Div(className="col-md-12", children=[
+                    html.Div(className="card", children=[
+                        html.Div(className="card-body", children=[
+                            html.H5("Tendances mensuelles", className="card-title"),
+                            dcc.Graph(id='monthly-trends', figure=skeletons['monthly-trends'])
+                        ])
                     ])
                 ])
-            ])
-        ]),
+            ]),
 
-        # Section ML - Plan de Déploiement
-        html.Div([
-            html.H2("Plan de Déploiement Optimal", className="section-title"),
+            # Section ML - Plan de Déploiement
             html.Div([
+                html.H2("Plan de Déploiement Optimal", className="section-title"),
                 html.Div([
-                    dcc.Graph(id='deployment-analytics')
-                ], className="col-12"),
-                html.Div([
-                    dcc.Graph(id='deployment-map')
-                ], className="col-12")
-            ], className="row")
-        ], className="section"),
+                    html.Div([
+                        dcc.Graph(id='deployment-analytics', figure=skeletons['deployment-analytics'])
+                    ], className="col-12"),
+                    html.Div([
+                        dcc.Graph(id='deployment-map', figure=skeletons['deployment-map'])
+                    ], className="col-12")
+                ], className="row")
+            ], className="section"),
+        ])
     ])
-])
-
-# Callbacks
-@app.callback(
-    [Output('district-map', 'figure'),
-     Output('global-stats', 'children'),
-     Output('hourly-analysis', 'figure'),
-     Output('stop-reasons', 'figure'),
-     Output('intervention-types', 'figure'),
-     Output('temporal-heatmap', 'figure'),
-     Output('weekly-patterns', 'figure'),
-     Output('ethnicity-analysis', 'figure'),
-     Output('age-analysis', 'figure'),
-     Output('monthly-trends', 'figure'),
-     Output('deployment-analytics', 'figure'),
-     Output('deployment-map', 'figure')],
-    [Input('date-range', 'start_date'),
-     Input('date-range', 'end_date'),
-     Input('district-filter', 'value'),
-     Input('intervention-type-filter', 'value')]
-)
-def update_all_graphs(start_date, end_date, selected_districts, selected_types):
-    # Filtrage des données
-    filtered_df = df.copy()
-    if start_date and end_date:
-        filtered_df = filtered_df[
-            (filtered_df['DATETIME'] >= start_date) &
-            (filtered_df['DATETIME'] <= end_date)
-        ]
-    if selected_districts:
-        filtered_df = filtered_df[filtered_df['STOP_DISTRICT'].isin(selected_districts)]
-    if selected_types:
-        filtered_df = filtered_df[filtered_df['intervention_type'].isin(selected_types)]
-
-    # Obtenir les figures du plan de déploiement
-    deployment_analytics, deployment_map = create_deployment_plan(filtered_df)
-
-    return (
-        create_map(filtered_df),
-        create_stats_component(filtered_df),
-        create_hourly_analysis(filtered_df),
-        create_stop_reasons_chart(filtered_df),
-        create_intervention_types(filtered_df),
-        create_temporal_heatmap(filtered_df),
-        create_weekly_patterns(filtered_df),
-        create_ethnicity_analysis(filtered_df),
-        create_age_analysis(filtered_df),
-        create_monthly_trends(filtered_df),
-        deployment_analytics,
-        deployment_map
+
+# Callbacks : un callback par groupe de figures, qui déclare les filtres dont il dépend.
+# Le navigateur lance les groupes en parallèle et affiche chacun dès qu'il est prêt ;
+# les figures indépendantes d'un même groupe sont construites dans un pool de threads.
+FILTER_INPUTS = {
+    'start_date': Input('date-range', 'start_date'),
+    'end_date': Input('date-range', 'end_date'),
+    'selected_districts': Input('district-filter', 'value'),
+    'selected_types': Input('intervention-type-filter', 'value'),
+}
+ALL_FILTERS = tuple(FILTER_INPUTS)
+
+FIGURE_WORKERS = 4
+FIGURE_GROUPS = []
+_figure_pool = None
+_figure_pool_pid = None
+
+def figure_pool():
+    """Pool de threads du processus courant (recréé après un fork)"""
+    global _figure_pool, _figure_pool_pid
+    if _figure_pool_pid != os.getpid():
+        _figure_pool = ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix='figures')
+        _figure_pool_pid = os.getpid()
+    return _figure_pool
+
+def build_concurrently(*builders):
+    """Exécute les fonctions de construction en parallèle et retourne leurs résultats dans l'ordre"""
+    if PROFILE_SLOW_MS:
+        # cProfile ne suit que le thread appelant : constructeurs exécutés en séquence pour figurer au profil
+        return [builder() for builder in builders]
+    return [future.result() for future in [figure_pool().submit(builder) for builder in builders]]
+
+def figure_group(outputs, depends_on=ALL_FILTERS, background=True):
+    """
+    Enregistre un groupe de figures comme callback Dash.
+
+    Args:
+        outputs: liste de (id du composant, propriété)
+        depends_on: filtres lus par le groupe ; il n'est recalculé que quand l'un d'eux change
+        background: calcul en callback long, annulé si les filtres changent avant la fin ;
+            les groupes rapides restent synchrones et s'affichent en premier. Avec l'aperçu
+            approché, tous les groupes sont des callbacks longs : l'aperçu est publié comme
+            sortie intermédiaire (progress) avant le résultat exact
+    """
+    def register(compute):
+        # wraps : Dash identifie les callbacks longs par le source de la fonction, celui de compute
+        @app.callback([Output(component_id, prop) for component_id, prop in outputs],
+                      [FILTER_INPUTS[name] for name in depends_on],
+                      background=background or APPROXIMATE,
+                      progress=[Output(component_id, prop) for component_id, prop in outputs] if APPROXIMATE else None,
+                      interval=BACKGROUND_POLL_MS)
+        @wraps(compute)
+        def update(*values):
+            # Dash passe en premier argument la fonction qui publie les sorties intermédiaires
+            set_progress, values = (values[0], values[1:]) if APPROXIMATE else (None, values)
+            filters = dict.fromkeys(ALL_FILTERS)
+            filters.update(zip(depends_on, values))
+            try:
+                # Snapshot cohérent du dataset pendant tout le callback, même si un rechargement a lieu
+                # Calcul exclu des forks : les callbacks synchrones s'exécutent dans le worker
+                with fork_safe(), profiled(compute.__name__), stage(f"callback:{compute.__name__}"), \
+                        data_manager.snapshot() as snapshot:
+                    # Le plan de déploiement dépend aussi du modèle servi, entraîné à part des données
+                    key = ResultCache.make_key(f"{compute.__name__}@{deployment_model_version()}", snapshot.version,
+                                               **filters)
+                    result = result_cache.get(key)
+                    if result is None:
+                        if set_progress is not None:
+                            preview = preview_outputs(outputs, compute, snapshot.preview, filters)
+                            if preview is not None:
+                                set_progress(preview)
+                        result = []
+                        for (component_id, _), value in zip(outputs, compute(snapshot.backend, **filters)):
+                            # Figures envoyées au format compact : données numériques en tableaux typés
+                            with stage(f"serialize:{component_id}"):
+                                if APPROXIMATE:
+                                    value = exact_output(component_id, value)
+                                result.append(compact_output(value))
+                        result_cache.put(key, snapshot.version, result)
+                return result
+            finally:
+                # Mesures écrites par lots ; un callback long s'exécute dans son propre processus,
+                # qui se termine sans passer par atexit : ses mesures sont écrites avant la fin
+                flush_metrics(force=background)
+
+        FIGURE_GROUPS.append((outputs, depends_on, compute))
+        return compute
+    return register
+
+def apply_patch(figure, patch):
+    """Applique les affectations d'un Patch à une figure au format compact (dictionnaire)"""
+    for operation in patch.to_plotly_json()['operations']:
+        *path, key = operation['location']
+        location = figure
+        for step in path:
+            location = location.setdefault(step, {}) if isinstance(location, dict) else location[step]
+        location[key] = operation['params']['value']
+    return figure
+
+def preview_outputs(outputs, compute, sample, filters):
+    """
+    Sorties du groupe estimées sur l'échantillon stratifié, None si la requête est
+    assez étroite pour que le résultat exact arrive vite. Les sorties intermédiaires
+    de Dash n'acceptent pas de Patch : figures complètes, titrées comme approchées
+    """
+    if sample is None or not sample.is_wide(sample.select(**filters)):
+        return None
+    label = f"aperçu sur un échantillon de {sample.fraction:.0%}, valeurs approchées"
+    preview = []
+    with stage(f"preview:{compute.__name__}"):
+        for (component_id, _), value in zip(outputs, compute(sample, **filters)):
+            if isinstance(value, Patch):
+                value = apply_patch(copy.deepcopy(compact_figure(FIGURE_SKELETONS[component_id])), value)
+            elif isinstance(value, go.Figure):
+                value = compact_figure(value)
+            if isinstance(value, dict):
+                title = value['layout'].setdefault('title', {})
+                title['text'] = f"{title['text']} ({label})" if title.get('text') else label.capitalize()
+            # Les statistiques globales affichent elles-mêmes leurs intervalles de confiance
+            preview.append(value)
+    return preview
+
+def exact_output(component_id, value):
+    """Résultat exact remplaçant un aperçu : un Patch rétablit aussi le titre du squelette"""
+    if isinstance(value, Patch) and component_id in FIGURE_SKELETONS:
+        value['layout']['title']['text'] = FIGURE_SKELETONS[component_id].layout.title.text
+    return value
+
+# Les figures ne reçoivent que des agrégats, calculés par le moteur du snapshot
+# (cube et index en mémoire, ou requêtes DuckDB sur les fichiers Parquet)
+@figure_group([('district-map', 'figure'), ('global-stats', 'children')], background=False)
+def overview_figures(backend, start_date, end_date, selected_districts, selected_types):
+    query = backend.select(start_date, end_date, selected_districts, selected_types)
+    return build_concurrently(
+        lambda: create_map(backend.district_counts(query)),
+        lambda: create_stats_component(backend.global_stats(query)),
+    )
+
+@figure_group([('hourly-analysis', 'figure'), ('temporal-heatmap', 'figure'),
+               ('weekly-patterns', 'figure'), ('monthly-trends', 'figure')])
+def temporal_figures(backend, start_date, end_date, selected_districts, selected_types):
+    query = backend.select(start_date, end_date, selected_districts, selected_types)
+    return build_concurrently(
+        lambda: create_hourly_analysis(backend.hourly_stats(query)),
+        lambda: create_temporal_heatmap(backend.hour_weekday_counts(query)),
+        lambda: create_weekly_patterns(backend.weekday_type_counts(query)),
+        lambda: trace_updates_patch(monthly_traces(backend.monthly_stats(query))),
     )
 
-def create_map(df):
+@figure_group([('intervention-types', 'figure'), ('ethnicity-analysis', 'figure')])
+def breakdown_figures(backend, start_date, end_date, selected_districts, selected_types):
+    query = backend.select(start_date, end_date, selected_districts, selected_types)
+    return build_concurrently(
+        lambda: create_intervention_types(backend.type_counts(query)),
+        lambda: trace_updates_patch(ethnicity_traces(*backend.ethnicity_stats(query))),
+    )
+
+# Figures hors du cube : agrégats calculés sur les lignes filtrées
+@figure_group([('stop-reasons', 'figure'), ('age-analysis', 'figure')])
+def row_figures(backend, start_date, end_date, selected_districts, selected_types):
+    query = backend.select(start_date, end_date, selected_districts, selected_types)
+    return build_concurrently(
+        lambda: create_stop_reasons_chart(stop_reason_counts(backend, query)),
+        lambda: trace_updates_patch(age_traces(age_stats(backend, query))),
+    )
+
+@figure_group([('deployment-analytics', 'figure'), ('deployment-map', 'figure')])
+def deployment_figures(backend, start_date, end_date, selected_districts, selected_types):
+    query = backend.select(start_date, end_date, selected_districts, selected_types)
+    traces = deployment_plan_traces(backend.aggregate(query, ['STOP_DISTRICT'], list(DISTRICT_METRICS)),
+                                    deployment_forecast(end_date))
+    return [trace_updates_patch(traces['analytics']), trace_updates_patch(traces['map'])]
+
+ALL_OUTPUTS = [
+    'district-map', 'global-stats', 'hourly-analysis', 'stop-reasons', 'intervention-types',
+    'temporal-heatmap', 'weekly-patterns', 'ethnicity-analysis', 'age-analysis',
+    'monthly-trends', 'deployment-analytics', 'deployment-map',
+]
+
+def update_all_graphs(start_date, end_date, selected_districts, selected_types):
+    """Toutes les sorties du dashboard dans l'ordre de ALL_OUTPUTS (scripts et benchmarks)"""
+    filters = dict(start_date=start_date, end_date=end_date,
+                   selected_districts=selected_districts, selected_types=selected_types)
+    results = {}
+    with data_manager.snapshot() as snapshot:
+        for outputs, _, compute in FIGURE_GROUPS:
+            for (component_id, _), value in zip(outputs, compute(snapshot.backend, **filters)):
+                results[component_id] = value
+    return tuple(results[component_id] for component_id in ALL_OUTPUTS)
+
+@measured()
+def create_map(district_counts):
     """Création de la carte des districts"""
-    district_counts = df['STOP_DISTRICT'].value_counts()
+    import plotly.express as px
+
+    total_stops = district_counts.sum()
     
     lats, lons, sizes, texts = [], [], [], []
     for district in DISTRICT_COORDINATES:
@@ -272,7 +636,7 @@ def create_map(df):
             texts.append(
                 f"District {int(district)} - {DISTRICT_COORDINATES[district]['name']}"
                 f"<br>Arrêts: {count:,}"
-                f"<br>% du total: {(count/len(df)*100):.1f}%"
+                f"<br>% du total: {(count/total_stops*100):.1f}%"
             )
     
     return px.scatter_mapbox(
@@ -286,28 +650,44 @@ def create_map(df):
         zoom=11
     )
 
-def create_stats_component(df):
-    """Création des statistiques globales"""
-    total_stops = len(df)
-    # Ne plus diviser par 60 car c'est déjà en minutes
-    avg_duration = df['STOP_DURATION_MINS'].mean()
-    arrest_rate = (df['ARREST_CHARGES'].notna().sum() / total_stops * 100)
-    ticket_rate = (df['TICKETS_ISSUED'].notna().sum() / total_stops * 100)
+@measured()
+def create_stats_component(stats):
+    """Création des statistiques globales (aperçu : valeurs approchées et intervalles de confiance)"""
+    total_stops = stats['total_stops']
+    approximate = 'sample_fraction' in stats
+    prefix = "≈ " if approximate else ""
+
+    def estimate(name, unit):
+        interval = stats.get(name + CI_SUFFIX)
+        text = f"{prefix}{stats[name]:.1f}{unit}"
+        return text if interval is None else f"{text} (± {interval:.1f})"
     
-    return html.Div([
-        html.H6(f"Nombre total d'arrêts: {total_stops:,}"),
-        html.H6(f"Durée moyenne: {avg_duration:.1f} minutes"),
-        html.H6(f"Taux d'arrestation: {arrest_rate:.1f}%"),
-        html.H6(f"Taux de verbalisation: {ticket_rate:.1f}%")
-    ])
+    # Durée moyenne : ne plus diviser par 60 car c'est déjà en minutes
+    lines = [
+        html.H6(f"Nombre total d'arrêts: {prefix}{total_stops:,}"),
+        html.H6(f"Durée moyenne: {estimate('avg_duration', ' minutes')}"),
+        html.H6(f"Taux d'arrestation: {estimate('arrest_rate', '%')}"),
+        html.H6(f"Taux de verbalisation: {estimate('ticket_rate', '%')}")
+    ]
+    if approximate:
+        lines.append(html.Small(f"Aperçu sur un échantillon de {stats['sample_fraction']:.0%} des interventions "
+                                "(intervalles de confiance à 95 %), calcul exact en cours"))
+    return html.Div(lines)
+
+def error_bars(stats, interval_column):
+    """Barres d'erreur : intervalles de confiance d'un aperçu, masquées pour un résultat exact"""
+    if interval_column in stats:
+        return dict(type='data', array=stats[interval_column].to_numpy(), visible=True)
+    return dict(visible=False)
 
-def create_hourly_analysis(df):
+@measured()
+def create_hourly_analysis(hourly_stats):
     """Création de l'analyse horaire"""
-    hourly_stats = get_hourly_stats(df)
-    
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
-    hourly_counts = df['hour'].value_counts().sort_index()
+    hourly_counts = hourly_stats["Nombre d'interventions"]
     fig.add_trace(
         go.Bar(x=hourly_counts.index, y=hourly_counts.values, 
                name="Nombre d'interventions", opacity=0.7),
@@ -316,13 +696,15 @@ def create_hourly_analysis(df):
     
     fig.add_trace(
         go.Scatter(x=hourly_stats.index, y=hourly_stats['Taux arrestation (%)'],
-                  name="Taux d'arrestation", line=dict(color='red')),
+                  name="Taux d'arrestation", line=dict(color='red'),
+                  error_y=error_bars(hourly_stats, 'IC Taux arrestation (%)')),
         secondary_y=True
     )
     
     fig.add_trace(
         go.Scatter(x=hourly_stats.index, y=hourly_stats['Taux verbalisation (%)'],
-                  name="Taux de verbalisation", line=dict(color='orange')),
+                  name="Taux de verbalisation", line=dict(color='orange'),
+                  error_y=error_bars(hourly_stats, 'IC Taux verbalisation (%)')),
         secondary_y=True
     )
     
@@ -335,22 +717,35 @@ def create_hourly_analysis(df):
     
     return fig
 
-def create_stop_reasons_chart(df):
-    """Création du graphique des raisons d'arrêt"""
-    reasons = analyze_stop_reasons(df)
-    
+TOP_REASONS = 10
+# Avec DASHBOARD_REASON_COMBINATIONS=1, le graphique des raisons compte les combinaisons
+# complètes de raisons d'un arrêt plutôt que chaque raison individuelle
+REASON_COMBINATIONS = os.environ.get('DASHBOARD_REASON_COMBINATIONS', '') not in ('', '0')
+REASONS_TITLE = (f"Top {TOP_REASONS} des combinaisons de raisons d'intervention" if REASON_COMBINATIONS
+                 else f"Top {TOP_REASONS} des raisons d'intervention")
+
+def stop_reason_counts(backend, query):
+    """Raisons d'arrêt (ou combinaisons de raisons) les plus fréquentes, toutes colonnes confondues"""
+    return backend.reason_counts(query, combinations=REASON_COMBINATIONS, top=TOP_REASONS)
+
+@measured()
+def create_stop_reasons_chart(reasons):
+    """Création du graphique des raisons d'arrêt (comptages par raison)"""
+    import plotly.express as px
+
     return px.bar(
         x=reasons.values,
         y=reasons.index,
         orientation='h',
-        title="Top 10 des raisons d'intervention",
-        labels={'x': "Nombre d'interventions", 'y': "Raison"}
+        title=REASONS_TITLE,
+        labels={'x': "Nombre d'interventions", 'y': "Combinaison" if REASON_COMBINATIONS else "Raison"}
     )
 
-def create_intervention_types(df):
+@measured()
+def create_intervention_types(type_counts):
     """Création du graphique des types d'intervention"""
-    type_counts = df['intervention_type'].value_counts()
-    
+    import plotly.express as px
+
     return px.pie(
         values=type_counts.values,
         names=type_counts.index,
@@ -358,28 +753,22 @@ def create_intervention_types(df):
         hole=0.4
     )
 
-def create_temporal_heatmap(df):
-    """Création de la heatmap temporelle"""
-    heatmap_data = pd.crosstab(
-        df['hour'],
-        df['day_of_week']
-    )
-    
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    heatmap_data = heatmap_data[days_order]
-    
+@measured()
+def create_temporal_heatmap(heatmap_data):
+    """Création de la heatmap temporelle (tableau croisé heure x jour)"""
+    import plotly.express as px
+
     return px.imshow(
         heatmap_data,
         title="Distribution des arrêts par heure et jour",
         labels=dict(x="Jour", y="Heure", color="Nombre d'arrêts")
     )
 
-def create_weekly_patterns(df):
-    """Création des patterns hebdomadaires"""
-    weekly = pd.crosstab(df['day_of_week'], df['intervention_type'])
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    weekly = weekly.reindex(days_order)
-    
+@measured()
+def create_weekly_patterns(weekly):
+    """Création des patterns hebdomadaires (tableau croisé jour x type)"""
+    import plotly.express as px
+
     return px.bar(
         weekly,
         barmode='stack',
@@ -387,8 +776,33 @@ def create_weekly_patterns(df):
         labels={'day_of_week': 'Jour', 'value': "Nombre d'interventions"}
     )
 
-def create_ethnicity_analysis(df):
-    """Analyse détaillée par ethnicité"""
+def apply_trace_updates(fig, updates):
+    """Applique à une figure squelette les données de ses traces, dans l'ordre"""
+    for trace, values in zip(fig.data, updates):
+        trace.update(values)
+    return fig
+
+def _assign(location, values):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            _assign(location[key], value)
+        else:
+            location[key] = encode_arrays(value)
+
+def trace_updates_patch(updates):
+    """
+    Patch Dash ne contenant que les données des traces : la mise en page reste celle du
+    squelette. Les tableaux numériques sont envoyés en tableaux typés.
+    """
+    patch = Patch()
+    for position, values in enumerate(updates):
+        _assign(patch['data'][position], values)
+    return patch
+
+def create_ethnicity_skeleton():
+    """Squelette de l'analyse par ethnicité : sous-graphiques, titres et traces vides"""
+    from plotly.subplots import make_subplots
+
     # Création de plusieurs sous-graphiques
     fig = make_subplots(rows=2, cols=2,
                        subplot_titles=("Distribution par ethnicité",
@@ -396,89 +810,100 @@ def create_ethnicity_analysis(df):
                                     "Taux d'arrestation par ethnicité",
                                     "Types d'intervention par ethnicité"))
     
-    # Distribution par ethnicité
-    ethnicity_counts = df['ETHNICITY'].value_counts()
-    fig.add_trace(
-        go.Bar(x=ethnicity_counts.index, y=ethnicity_counts.values,
-               name="Nombre d'arrêts"),
-        row=1, col=1
-    )
-    
-    # Durée moyenne par ethnicité
-    duration_by_ethnicity = df.groupby('ETHNICITY')['STOP_DURATION_MINS'].mean()
-    fig.add_trace(
-        go.Bar(x=duration_by_ethnicity.index, y=duration_by_ethnicity.values,
-               name="Durée moyenne"),
-        row=1, col=2
-    )
-    
-    # Taux d'arrestation par ethnicité
-    arrest_by_ethnicity = df.groupby('ETHNICITY').apply(
-        lambda x: (x['ARREST_CHARGES'].notna().sum() / len(x)) * 100
-    )
-    fig.add_trace(
-        go.Bar(x=arrest_by_ethnicity.index, y=arrest_by_ethnicity.values,
-               name="Taux d'arrestation"),
-        row=2, col=1
-    )
-    
-    # Types d'intervention par ethnicité
-    intervention_by_ethnicity = pd.crosstab(df['ETHNICITY'], df['intervention_type'], normalize='index') * 100
-    for intervention_type in df['intervention_type'].unique():
-        fig.add_trace(
-            go.Bar(x=intervention_by_ethnicity.index, 
-                  y=intervention_by_ethnicity[intervention_type],
-                  name=intervention_type),
-            row=2, col=2
-        )
+    fig.add_trace(go.Bar(name="Nombre d'arrêts"), row=1, col=1)
+    fig.add_trace(go.Bar(name="Durée moyenne"), row=1, col=2)
+    fig.add_trace(go.Bar(name="Taux d'arrestation"), row=2, col=1)
+    # Une trace par type d'intervention, masquée si le type est absent de la sélection
+    for intervention_type in INTERVENTION_TYPES:
+        fig.add_trace(go.Bar(name=intervention_type), row=2, col=2)
     
     fig.update_layout(height=800, showlegend=True,
                      title_text="Analyse détaillée par ethnicité")
     return fig
 
-def create_age_analysis(df):
-    """Analyse détaillée par âge"""
-    # Assurons-nous que AGE est numérique
-    df_clean = df.copy()
-    df_clean['AGE'] = pd.to_numeric(df_clean['AGE'], errors='coerce')
+@measured()
+def ethnicity_traces(ethnicity_stats, intervention_by_ethnicity):
+    """Données des traces de l'analyse par ethnicité, dans l'ordre du squelette"""
+    # Distribution par ethnicité
+    ethnicity_counts = ethnicity_stats['count'].sort_values(ascending=False)
+    traces = [
+        dict(x=list(ethnicity_counts.index), y=ethnicity_counts.to_numpy()),
+        # Durée moyenne par ethnicité
+        dict(x=list(ethnicity_stats.index), y=ethnicity_stats['duration_mean'].to_numpy(),
+             error_y=error_bars(ethnicity_stats, 'duration_mean' + CI_SUFFIX)),
+        # Taux d'arrestation par ethnicité
+        dict(x=list(ethnicity_stats.index), y=ethnicity_stats['arrest_rate'].to_numpy(),
+             error_y=error_bars(ethnicity_stats, 'arrest_rate' + CI_SUFFIX)),
+    ]
     
+    # Types d'intervention par ethnicité
+    for intervention_type in INTERVENTION_TYPES:
+        if intervention_type in intervention_by_ethnicity.columns:
+            traces.append(dict(x=list(intervention_by_ethnicity.index),
+                               y=intervention_by_ethnicity[intervention_type].to_numpy(),
+                               visible=True))
+        else:
+            traces.append(dict(x=[], y=[], visible=False))
+    return traces
+
+@measured()
+def create_ethnicity_analysis(ethnicity_stats, intervention_by_ethnicity):
+    """Analyse détaillée par ethnicité"""
+    return apply_trace_updates(create_ethnicity_skeleton(),
+                               ethnicity_traces(ethnicity_stats, intervention_by_ethnicity))
+
+# Binning côté serveur de l'analyse par âge : le navigateur reçoit des comptages par
+# classe, jamais une valeur par ligne
+AGE_BINS = 30
+DURATION_BINS = 30
+# Les durées au-delà de ce centile sont regroupées dans la dernière classe
+DURATION_QUANTILE = 0.99
+
+def age_stats(backend, query):
+    """Agrégats de l'analyse par âge : âges moyens, histogramme des âges et densité âge x durée"""
+    return {
+        'by_type': backend.aggregate(query, ['intervention_type'], ['age_mean'])['age_mean'].sort_values(),
+        'by_district': backend.aggregate(query, ['STOP_DISTRICT'], ['age_mean'])['age_mean'].sort_values(),
+        'histogram': backend.histogram(query, 'AGE', AGE_BINS),
+        # Relation âge/durée, sur les lignes où les deux valeurs sont renseignées
+        'density': backend.histogram2d(query, 'AGE', 'STOP_DURATION_MINS', [AGE_BINS, DURATION_BINS],
+                                       y_quantile=DURATION_QUANTILE),
+    }
+
+def age_histogram(histogram):
+    """Histogramme des âges : centres, comptages et largeur des classes"""
+    if histogram is None:
+        return np.array([]), np.array([], dtype=np.int64), 1.0
+    counts, edges = histogram
+    return (edges[:-1] + edges[1:]) / 2, counts, float(edges[1] - edges[0])
+
+def age_duration_density(density):
+    """Grille de densité âge x durée : centres des classes et comptages (durée x âge)"""
+    if density is None:
+        return np.array([]), np.array([]), np.zeros((0, 0), dtype=np.int64)
+    counts, age_edges, duration_edges = density
+    return ((age_edges[:-1] + age_edges[1:]) / 2, (duration_edges[:-1] + duration_edges[1:]) / 2,
+            counts.T.astype(np.int64))
+
+def create_age_skeleton():
+    """Squelette de l'analyse par âge : sous-graphiques, axes et traces vides"""
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(rows=2, cols=2,
                        subplot_titles=("Distribution des âges",
                                     "Âge moyen par type d'intervention",
                                     "Âge moyen par district",
                                     "Relation âge/durée d'intervention"))
     
-    # Distribution des âges
-    fig.add_trace(
-        go.Histogram(x=df_clean['AGE'].dropna(), nbinsx=30, name="Distribution des âges"),
-        row=1, col=1
-    )
-    
-    # Âge moyen par type d'intervention
-    age_by_type = df_clean.groupby('intervention_type')['AGE'].agg(lambda x: x.mean()).sort_values()
-    fig.add_trace(
-        go.Bar(x=age_by_type.index, y=age_by_type.values,
-               name="Âge moyen"),
-        row=1, col=2
-    )
-    
-    # Âge moyen par district
-    age_by_district = df_clean.groupby('STOP_DISTRICT')['AGE'].agg(lambda x: x.mean()).sort_values()
-    fig.add_trace(
-        go.Bar(x=age_by_district.index.astype(str), y=age_by_district.values,
-               name="Âge moyen"),
-        row=2, col=1
-    )
-    
-    # Relation âge/durée
-    fig.add_trace(
-        go.Scatter(x=df_clean['AGE'].dropna(), 
-                  y=df_clean['STOP_DURATION_MINS'].dropna(), 
-                  mode='markers',
-                  opacity=0.5, 
-                  name="Âge vs Durée"),
-        row=2, col=2
-    )
+    # Histogramme pré-calculé : une barre par classe d'âge
+    fig.add_trace(go.Bar(name="Distribution des âges", marker_line_width=0), row=1, col=1)
+    fig.add_trace(go.Bar(name="Âge moyen"), row=1, col=2)
+    fig.add_trace(go.Bar(name="Âge moyen"), row=2, col=1)
+    # Densité âge/durée sur une grille, au lieu d'un point par intervention
+    fig.add_trace(go.Heatmap(name="Âge vs Durée", colorscale='Blues', showscale=False,
+                             hovertemplate="Âge %{x:.0f}<br>Durée %{y:.0f} min<br>%{z} interventions"
+                                           "<extra></extra>"),
+                  row=2, col=2)
     
     # Mise à jour de la mise en page
     fig.update_layout(
@@ -496,67 +921,67 @@ def create_age_analysis(df):
     fig.update_yaxes(title_text="Nombre d'interventions", row=1, col=1)
     fig.update_yaxes(title_text="Âge moyen", row=1, col=2)
     fig.update_yaxes(title_text="Âge moyen", row=2, col=1)
-    fig.update_yaxes(title_text="Durée (minutes)", row=2, col=2)
+    fig.update_yaxes(title_text=f"Durée (minutes, plafonnée au {DURATION_QUANTILE:.0%} centile)", row=2, col=2)
     
     return fig
 
-def create_monthly_trends(df):
-    """Analyse des tendances mensuelles"""
-    df['month_year'] = df['DATETIME'].dt.to_period('M')
-    monthly_data = df.groupby('month_year').agg({
-        'STOP_DISTRICT': 'count',
-        'ARREST_CHARGES': lambda x: x.notna().mean() * 100,
-        'STOP_DURATION_MINS': 'mean',
-        'intervention_score': 'mean'
-    }).reset_index()
-    monthly_data['month_year'] = monthly_data['month_year'].astype(str)
+@measured()
+def age_traces(stats):
+    """Données des traces de l'analyse par âge (agrégats de age_stats), dans l'ordre du squelette"""
+    age_by_type, age_by_district = stats['by_type'], stats['by_district']
+    centers, counts, width = age_histogram(stats['histogram'])
+    age_centers, duration_centers, density = age_duration_density(stats['density'])
     
+    return [
+        dict(x=centers, y=counts, width=width),
+        dict(x=list(age_by_type.index), y=age_by_type.to_numpy()),
+        dict(x=list(age_by_district.index.astype(str)), y=age_by_district.to_numpy()),
+        dict(x=age_centers, y=duration_centers, z=density),
+    ]
+
+@measured()
+def create_age_analysis(stats):
+    """Analyse détaillée par âge"""
+    return apply_trace_updates(create_age_skeleton(), age_traces(stats))
+
+def create_monthly_skeleton():
+    """Squelette des tendances mensuelles : sous-graphiques et traces vides"""
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(rows=2, cols=1,
                        subplot_titles=("Évolution mensuelle du nombre d'interventions",
                                     "Évolution des indicateurs mensuels"))
     
     # Nombre d'interventions
-    fig.add_trace(
-        go.Scatter(x=monthly_data['month_year'], 
-                  y=monthly_data['STOP_DISTRICT'],
-                  mode='lines+markers',
-                  name="Nombre d'interventions"),
-        row=1, col=1
-    )
+    fig.add_trace(go.Scatter(mode='lines+markers', name="Nombre d'interventions"), row=1, col=1)
     
     # Indicateurs mensuels
-    fig.add_trace(
-        go.Scatter(x=monthly_data['month_year'],
-                  y=monthly_data['ARREST_CHARGES'],
-                  mode='lines+markers',
-                  name="Taux d'arrestation (%)"),
-        row=2, col=1
-    )
-    
-    fig.add_trace(
-        go.Scatter(x=monthly_data['month_year'],
-                  y=monthly_data['intervention_score'],
-                  mode='lines+markers',
-                  name="Score d'intervention"),
-        row=2, col=1
-    )
+    fig.add_trace(go.Scatter(mode='lines+markers', name="Taux d'arrestation (%)"), row=2, col=1)
+    fig.add_trace(go.Scatter(mode='lines+markers', name="Score d'intervention"), row=2, col=1)
     
     fig.update_layout(height=800, showlegend=True,
                      title_text="Tendances mensuelles")
     return fig
 
-def create_deployment_plan(df):
-    """Création du plan de déploiement"""
-    # Obtenir les recommandations de déploiement
-    optimizer = PoliceResourceOptimizer()
-    resources_needed = optimizer.predict_resource_needs(df)
-    
-    # Calculer le pourcentage d'officiers par district
+@measured()
+def monthly_traces(monthly_data):
+    """Données des traces des tendances mensuelles (une ligne par mois)"""
+    months = list(monthly_data['month_year'])
+    return [
+        dict(x=months, y=monthly_data['STOP_DISTRICT'].to_numpy()),
+        dict(x=months, y=monthly_data['ARREST_CHARGES'].to_numpy()),
+        dict(x=months, y=monthly_data['intervention_score'].to_numpy()),
+    ]
+
+@measured()
+def create_monthly_trends(monthly_data):
+    """Analyse des tendances mensuelles (une ligne par mois)"""
+    return apply_trace_updates(create_monthly_skeleton(), monthly_traces(monthly_data))
+
+def create_deployment_plan_skeletons():
+    """Squelettes des figures du plan de déploiement"""
     total_officers = 4000
-    district_percentages = (resources_needed / total_officers * 100).round(1)
-    
-    # Créer les visualisations avec les informations de pourcentage
-    figures = create_deployment_visualization(resources_needed, DISTRICT_COORDINATES)
+    figures = create_deployment_skeletons()
     
     # Ajouter une annotation pour le total
     figures['analytics'].add_annotation(
@@ -567,7 +992,52 @@ def create_deployment_plan(df):
         font=dict(size=14)
     )
     
-    return figures['analytics'], figures['map']
+    return figures
+
+@measured()
+def deployment_forecast(end_date):
+    """
+    Répartition des officiers prédite par le modèle du registre pour le lendemain
+    de la période (de l'historique d'entraînement sans période) ; None sans modèle
+    """
+    optimizer = deployment_optimizer()
+    if optimizer is None:
+        return None
+    last_day = pd.Timestamp(end_date or optimizer.metadata['end_date'])
+    if last_day.tz is not None:
+        last_day = last_day.tz_localize(None)
+    return optimizer.predict_today(last_day.normalize() + pd.Timedelta(days=1))
+
+@measured()
+def deployment_plan_traces(district_stats, forecast=None):
+    """Données des traces du plan de déploiement (indicateurs DISTRICT_METRICS par district)"""
+    # Obtenir les recommandations de déploiement
+    resources_needed = resource_needs(district_stats)
+    return deployment_traces(resources_needed, DISTRICT_COORDINATES, forecast)
+
+@measured()
+def create_deployment_plan(district_stats, forecast=None):
+    """Création du plan de déploiement"""
+    figures = create_deployment_plan_skeletons()
+    traces = deployment_plan_traces(district_stats, forecast)
+    return (apply_trace_updates(figures['analytics'], traces['analytics']),
+            apply_trace_updates(figures['map'], traces['map']))
+
+# Squelettes des figures mises à jour par Patch : mise en page, sous-graphiques et traces
+# vides construits une seule fois, au premier layout servi, et envoyés avec le layout ; les
+# callbacks n'envoient ensuite que les données des traces
+@lru_cache(maxsize=None)
+def figure_skeletons():
+    deployment_skeletons = create_deployment_plan_skeletons()
+    return {
+        'ethnicity-analysis': create_ethnicity_skeleton(),
+        'age-analysis': create_age_skeleton(),
+        'monthly-trends': create_monthly_skeleton(),
+        'deployment-analytics': deployment_skeletons['analytics'],
+        'deployment-map': deployment_skeletons['map'],
+    }
+
+app.layout = serve_layout
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
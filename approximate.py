@@ -0,0 +1,214 @@
+# approximate.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex, sort_by_datetime
+from group_metrics import METRICS, TYPE_DISTRIBUTION, group_codes, measure_names, metric_frame, row_measures
+from query_backend import CI_SUFFIX, KEY_ORDERS, QueryBackend, measure_columns, weighted_quantile
+from Pipelines.src.schema import INTERVENTION_TYPES
+
+# Aperçu approché (opt-in) : les figures des requêtes larges sont d'abord calculées sur un
+# échantillon stratifié construit au chargement, puis remplacées par le résultat exact
+APPROXIMATE_ENV = 'DASHBOARD_APPROXIMATE'
+# Part des lignes de chaque strate (district x mois) conservée dans l'échantillon
+SAMPLE_FRACTION = float(os.environ.get('DASHBOARD_SAMPLE_FRACTION', 0.05))
+# Nombre estimé de lignes filtrées à partir duquel un aperçu est envoyé avant le résultat exact
+APPROXIMATE_MIN_ROWS = int(os.environ.get('DASHBOARD_APPROXIMATE_MIN_ROWS', 1_000_000))
+# Strates de l'échantillon
+STRATA = ['STOP_DISTRICT', 'year', 'month']
+# Quantile de la loi normale des intervalles de confiance à 95 %
+CONFIDENCE_Z = 1.96
+SAMPLE_SEED = 0
+
+
+def approximate_enabled():
+    """Vrai si DASHBOARD_APPROXIMATE active l'aperçu approché"""
+    return os.environ.get(APPROXIMATE_ENV, '') not in ('', '0')
+
+
+def stratum_codes(df):
+    """Strate de chaque ligne ; les lignes sans district ou sans date forment une strate à part"""
+    codes, levels = group_codes(df, STRATA)
+    size = int(np.prod([len(level) for level in levels]))
+    return np.where(codes < 0, size, codes)
+
+
+def stratified_sample(df, fraction=SAMPLE_FRACTION, seed=SAMPLE_SEED):
+    """
+    Échantillon stratifié de df : ceil(fraction x effectif) lignes tirées au
+    hasard (reproductible) dans chaque strate, dans l'ordre de df.
+
+    Returns:
+        SampleBackend de l'échantillon
+    """
+    strata = stratum_codes(df)
+    population = np.bincount(strata)
+    sizes = np.minimum(population, np.ceil(population * fraction).astype('int64'))
+    # Rang aléatoire de chaque ligne dans sa strate
+    order = np.lexsort((np.random.default_rng(seed).random(len(df)), strata))
+    starts = np.cumsum(population) - population
+    ranks = np.arange(len(df)) - starts[strata[order]]
+    rows = np.sort(order[ranks < sizes[strata[order]]])
+    return SampleBackend(df.take(rows).reset_index(drop=True), strata[rows], population, fraction)
+
+
+def duckdb_stratified_sample(backend, fraction=SAMPLE_FRACTION):
+    """Même échantillon tiré par DuckDB, sans charger les données (voir DuckDBBackend.stratified_sample)"""
+    sample = backend.stratified_sample(STRATA, fraction)
+    for column, order in KEY_ORDERS.items():
+        if column in sample.columns:
+            sample[column] = pd.Categorical(sample[column], categories=order)
+    sample = sort_by_datetime(sample).reset_index(drop=True)
+    strata = stratum_codes(sample)
+    population = np.zeros(strata.max() + 1 if len(strata) else 0, dtype='int64')
+    population[strata] = sample.pop('stratum_rows').to_numpy()
+    return SampleBackend(sample, strata, population, fraction)
+
+
+class SampleBackend(QueryBackend):
+    """
+    Estimations calculées sur un échantillon stratifié : chaque ligne pèse
+    effectif / taille de sa strate dans l'échantillon. Les comptages sont des
+    totaux estimés ; les moyennes et les taux sont des ratios estimés,
+    accompagnés de la demi-largeur de leur intervalle de confiance à 95 %
+    (colonne <indicateur>_ci, variance par linéarisation en sondage stratifié).
+
+    Args:
+        sample: lignes de l'échantillon, triées par date
+        strata: strate de chaque ligne de l'échantillon
+        population: effectif de chaque strate dans les données complètes
+        fraction: part de chaque strate tirée dans l'échantillon
+    """
+
+    def __init__(self, sample, strata, population, fraction):
+        self.sample = sample
+        self.strata = np.asarray(strata, dtype='int64')
+        self.population = np.asarray(population, dtype='float64')
+        self.sizes = np.bincount(self.strata, minlength=len(self.population)).astype('float64')
+        self.fraction = fraction
+        self.index = FilterIndex(sample)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.weights = (self.population / self.sizes)[self.strata]
+
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        return self.index.select(start_date, end_date, selected_districts, selected_types)
+
+    def estimated_rows(self, query):
+        """Nombre estimé de lignes des données complètes correspondant à la requête"""
+        return float(self.weights[query].sum())
+
+    def is_wide(self, query, min_rows=APPROXIMATE_MIN_ROWS):
+        """Vrai si la requête porte sur assez de lignes pour qu'un aperçu précède le résultat exact"""
+        return self.estimated_rows(query) >= min_rows
+
+    def _rows(self, query, columns):
+        return FilterIndex.rows(self.sample, query, columns), self.weights[query], self.strata[query]
+
+    def _ratio_half_width(self, codes, strata, size, numerator, denominator, ratio, total):
+        """
+        Demi-largeur de l'intervalle de confiance de ratio = Σ numerator / Σ denominator
+        par groupe : variance de Σ w d, d = numerator - ratio x denominator, sommée sur les
+        strates. denominator vaut 0 ou 1 et numerator est nul quand il est nul.
+        """
+        n_strata = len(self.population)
+        cells = strata * size + codes
+
+        def by_cell(values):
+            return np.bincount(cells, weights=values, minlength=n_strata * size).reshape(n_strata, size)
+
+        y, x, yy = by_cell(numerator), by_cell(denominator), by_cell(numerator * numerator)
+        n, N = self.sizes[:, None], self.population[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sum_d = y - ratio * x
+            sum_d2 = yy - 2 * ratio * y + ratio * ratio * x
+            # Variance de d dans la strate (nulle si la strate n'a qu'une ligne échantillonnée)
+            within = np.where(n > 1, np.maximum(sum_d2 - sum_d ** 2 / n, 0) / (n - 1), 0)
+            variance = np.nansum(N * N * (1 - n / N) * within / n, axis=0)
+            return CONFIDENCE_Z * np.sqrt(variance) / total
+
+    def aggregate(self, query, keys, metrics):
+        columns = list(keys) + [column for column in measure_columns(metrics) if column not in keys]
+        rows, weights, strata = self._rows(query, columns)
+        codes, levels = group_codes(rows, keys)
+        size = int(np.prod([len(level) for level in levels]))
+        known = codes >= 0
+        if not known.all():
+            rows, weights, strata, codes = rows[known], weights[known], strata[known], codes[known]
+
+        names = measure_names(metrics)
+        measures = row_measures(rows, names)
+        values = {name: np.ones(len(rows)) if measures[name] is None else measures[name].astype('float64')
+                  for name in names}
+        sums = {name: np.bincount(codes, weights=weights * values[name], minlength=size) for name in names}
+
+        by_type = None
+        if TYPE_DISTRIBUTION in metrics:
+            n_types = len(INTERVENTION_TYPES)
+            type_codes = rows['intervention_type'].cat.codes.to_numpy().astype('int64')
+            typed = type_codes >= 0
+            by_type = np.bincount(codes[typed] * n_types + type_codes[typed], weights=weights[typed],
+                                  minlength=size * n_types).reshape(size, n_types)
+            by_type = np.rint(by_type).astype('int64')
+
+        present = sums['count'] > 0
+        if not levels:
+            index = pd.RangeIndex(1)[present]
+        elif len(levels) == 1:
+            index = levels[0][present]
+        else:
+            index = pd.MultiIndex.from_product(levels)[present]
+        result = metric_frame({name: total[present] for name, total in sums.items()}, metrics, index,
+                              None if by_type is None else by_type[present])
+
+        for metric in metrics:
+            numerator, denominator, factor = METRICS.get(metric, (None, None, None))
+            if denominator is None:
+                continue
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ratio = sums[numerator] / sums[denominator]
+            half_width = self._ratio_half_width(codes, strata, size, values[numerator], values[denominator],
+                                                ratio, sums[denominator])
+            result[metric + CI_SUFFIX] = half_width[present] * factor
+        if 'count' in result:
+            result['count'] = np.rint(result['count']).astype('int64')
+        return result
+
+    def value_counts(self, query, columns, top=None):
+        rows, weights, _ = self._rows(query, columns)
+        parts = []
+        for column in columns:
+            present = rows[column].notna().to_numpy()
+            parts.append(pd.Series(weights[present], index=rows[column].to_numpy()[present].astype(object)))
+        counts = pd.concat(parts).groupby(level=0, sort=False).sum()
+        counts = np.rint(counts).astype('int64').sort_values(ascending=False, kind='stable')
+        counts.index.name, counts.name = None, 'count'
+        return counts if top is None else counts.head(top)
+
+    def histogram(self, query, column, bins):
+        rows, weights, _ = self._rows(query, [column])
+        values = pd.to_numeric(rows[column], errors='coerce').to_numpy()
+        present = ~np.isnan(values)
+        if not present.any():
+            return None
+        counts, edges = np.histogram(values[present], bins=bins, weights=weights[present])
+        return np.rint(counts).astype(np.int64), edges
+
+    def histogram2d(self, query, x, y, bins, y_quantile=None):
+        rows, weights, _ = self._rows(query, [x, y])
+        x_values = pd.to_numeric(rows[x], errors='coerce').to_numpy()
+        y_values = pd.to_numeric(rows[y], errors='coerce').to_numpy()
+        both = ~(np.isnan(x_values) | np.isnan(y_values))
+        if not both.any():
+            return None
+        x_values, y_values, weights = x_values[both], y_values[both], weights[both]
+        if y_quantile is not None:
+            y_values = np.minimum(y_values, weighted_quantile(y_values, weights, y_quantile))
+        counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=bins, weights=weights)
+        return np.rint(counts).astype(np.int64), x_edges, y_edges
+
+    def global_stats(self, query):
+        stats = super().global_stats(query)
+        stats['sample_fraction'] = self.fraction
+        return stats
@@ -0,0 +1,51 @@
+# benchmarks/bench_chunked_cleaning.py
+"""
+Débit et mémoire du nettoyage par blocs (ChunkedCleaner) selon le nombre de workers.
+
+Usage : python benchmarks/bench_chunked_cleaning.py [nombre_de_lignes] [budget_mb]
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Pipelines'))
+
+from benchmarks.synthetic import make_raw_stops
+from src.chunked_cleaning import ChunkedCleaner
+from src.preprocessing import preprocess_stops
+from src.schema import read_csv_kwargs
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses workers (Linux : ko)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    budget_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'stops.csv')
+        make_raw_stops(n_rows).to_csv(path, index=False)
+        expected = preprocess_stops(pd.read_csv(path, **read_csv_kwargs()))
+
+        print(f"{'workers':>8} {'bloc (MB)':>10} {'temps (s)':>10} {'lignes/s':>12}")
+        for n_jobs in sorted({1, 2, 4, os.cpu_count() or 1}):
+            cleaner = ChunkedCleaner(path, n_jobs=n_jobs, memory_budget_mb=budget_mb)
+            start = time.perf_counter()
+            cleaned = cleaner.run()
+            elapsed = time.perf_counter() - start
+            pd.testing.assert_frame_equal(cleaned.reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_categorical=False)
+            print(f"{n_jobs:>8} {cleaner.block_bytes / 1024 ** 2:>10.1f} {elapsed:>10.2f} {len(cleaned) / elapsed:>12,.0f}")
+
+        own, children = peak_rss_mb()
+        print(f"\nPic RSS : processus principal {own:.0f} MB, plus gros worker {children:.0f} MB")
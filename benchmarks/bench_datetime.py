@@ -0,0 +1,70 @@
+# benchmarks/bench_datetime.py
+"""
+Compare le parsing de DATETIME d'origine (to_datetime sans format puis un
+accesseur .dt par indicateur) avec datetime_parsing (format détecté, valeurs
+distinctes parsées une fois lorsque la colonne en répète assez, indicateurs
+calculés depuis l'epoch), sur le format du fichier source et le format ISO.
+« actuel » et « nouveau » comprennent le calcul des indicateurs ; « factorisé »
+et « direct » mesurent le seul parsing, en forçant chacun des deux chemins de
+parse_datetimes ; « distinctes » est la part de valeurs distinctes estimée.
+
+Usage : python benchmarks/bench_datetime.py [nombre_de_lignes ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ISO_TIMESTAMP_FORMAT, SOURCE_TIMESTAMP_FORMAT, make_raw_stops
+from Pipelines.src.datetime_parsing import (datetime_parts, detect_datetime_format, estimate_unique_ratio,
+                                           parse_datetimes)
+
+
+def current_path(values):
+    timestamps = pd.to_datetime(values)
+    return timestamps, {
+        'hour': timestamps.dt.hour,
+        'day_name': timestamps.dt.day_name(),
+        'month': timestamps.dt.month,
+        'year': timestamps.dt.year,
+    }
+
+
+def new_path(values):
+    timestamps = parse_datetimes(values)
+    return timestamps, datetime_parts(timestamps)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 5_000_000]
+    # Format du fichier source (avec fuseau, lent à parser) et format ISO (chemin rapide de pandas)
+    for timestamp_format in (SOURCE_TIMESTAMP_FORMAT, ISO_TIMESTAMP_FORMAT):
+        print(f"\nFormat {timestamp_format}")
+        print(f"{'lignes':>10} {'distinctes':>11} {'actuel (s)':>11} {'factorisé (s)':>14} {'direct (s)':>11} "
+              f"{'nouveau (s)':>12} {'gain':>7}")
+        for n_rows in sizes:
+            values = make_raw_stops(n_rows, timestamp_format=timestamp_format)['DATETIME']
+            (old_ts, old_parts), old_time = timed(current_path, values)
+            (new_ts, new_parts), new_time = timed(new_path, values)
+            # Les deux chemins de parse_datetimes, forcés
+            factorized, factorized_time = timed(parse_datetimes, values, None, float('inf'))
+            direct, direct_time = timed(parse_datetimes, values, None, -1.0)
+
+            # Mêmes résultats que le chemin d'origine
+            assert old_ts.equals(new_ts) and old_ts.equals(factorized) and old_ts.equals(direct)
+            for name in ('hour', 'month', 'year'):
+                assert np.array_equal(old_parts[name].to_numpy(), new_parts[name])
+            assert np.array_equal(old_parts['day_name'].to_numpy(), np.asarray(new_parts['day_name']))
+            print(f"{n_rows:>10,} {estimate_unique_ratio(values):>10.0%} {old_time:>11.2f} {factorized_time:>14.2f} "
+                  f"{direct_time:>11.2f} {new_time:>12.2f} {old_time / new_time:>6.1f}x")
+        print(f"Format détecté : {detect_datetime_format(values)}")
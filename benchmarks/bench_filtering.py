@@ -0,0 +1,75 @@
+# benchmarks/bench_filtering.py
+"""
+Latence du filtrage du dashboard selon la taille du dataset : copie puis
+masques booléens (version d'origine de update_all_graphs) contre l'index de
+filtrage (tranche de dates + listes de lignes par district et par type).
+
+Usage : python benchmarks/bench_filtering.py [nombre_de_lignes ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from benchmarks.synthetic import make_raw_stops
+from filter_index import FilterIndex, sort_by_datetime
+from Pipelines.src.preprocessing import preprocess_stops
+
+# (libellé, début, fin, districts, types)
+FILTERS = [
+    ('période', '2020-01-01', '2021-06-30', None, None),
+    ('période + 2 districts', '2020-01-01', '2021-06-30', [1.0, 5.0], None),
+    ('période + districts + type', '2020-01-01', '2021-06-30', [1.0, 5.0], ['Arrestation', 'Contravention']),
+]
+REPEATS = 5
+
+
+def copy_and_mask(df, start_date, end_date, selected_districts, selected_types):
+    filtered_df = df.copy()
+    if start_date and end_date:
+        # Journée de fin comprise, convention du dashboard (cube.period_days)
+        next_day = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).date().isoformat()
+        filtered_df = filtered_df[
+            (filtered_df['DATETIME'] >= start_date) &
+            (filtered_df['DATETIME'] < next_day)
+        ]
+    if selected_districts:
+        filtered_df = filtered_df[filtered_df['STOP_DISTRICT'].isin(selected_districts)]
+    if selected_types:
+        filtered_df = filtered_df[filtered_df['intervention_type'].isin(selected_types)]
+    return filtered_df
+
+
+def indexed(df, index, *filters):
+    return FilterIndex.rows(df, index.select(*filters))
+
+
+def best_time(func, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 5_000_000]
+    print(f"{'lignes':>10} {'filtre':<28} {'copie+masques (ms)':>19} {'index (ms)':>11} {'gain':>7}")
+    for n_rows in sizes:
+        df = sort_by_datetime(preprocess_stops(make_raw_stops(n_rows)))
+        start = time.perf_counter()
+        index = FilterIndex(df)
+        build_time = time.perf_counter() - start
+
+        for label, *filters in FILTERS:
+            expected, old_time = best_time(copy_and_mask, df, *filters)
+            result, new_time = best_time(indexed, df, index, *filters)
+            # Mêmes lignes, dans le même ordre
+            pd.testing.assert_frame_equal(result, expected)
+            print(f"{n_rows:>10,} {label:<28} {old_time * 1000:>19.1f} {new_time * 1000:>11.1f} "
+                  f"{old_time / new_time:>6.1f}x")
+        print(f"{'':>10} construction de l'index : {build_time * 1000:.0f} ms")
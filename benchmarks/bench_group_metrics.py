@@ -0,0 +1,114 @@
+# benchmarks/bench_group_metrics.py
+"""
+Compare les group-by pandas d'origine des figures (value_counts, groupby
+mean, apply à lambda, crosstab, agg à lambdas) avec le moteur d'agrégation
+en une passe de group_metrics, sur les mêmes lignes.
+
+Usage : python benchmarks/bench_group_metrics.py [nombre_de_lignes ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_raw_stops
+from group_metrics import TYPE_DISTRIBUTION, group_metrics
+from Pipelines.src.preprocessing import preprocess_stops
+
+
+def legacy_ethnicity(df):
+    counts = df['ETHNICITY'].value_counts()
+    duration = df.groupby('ETHNICITY', observed=True)['STOP_DURATION_MINS'].mean()
+    arrests = df.groupby('ETHNICITY', observed=True).apply(
+        lambda x: (x['ARREST_CHARGES'].notna().sum() / len(x)) * 100
+    )
+    by_type = pd.crosstab(df['ETHNICITY'], df['intervention_type'], normalize='index') * 100
+    return counts, duration, arrests, by_type
+
+
+def engine_ethnicity(df):
+    stats = group_metrics(df, ['ETHNICITY'], ['count', 'duration_mean', 'arrest_rate', TYPE_DISTRIBUTION])
+    shares = stats[list(df['intervention_type'].cat.categories)].div(stats['count'], axis=0) * 100
+    return stats['count'], stats['duration_mean'], stats['arrest_rate'], shares
+
+
+def legacy_hourly(df):
+    return df.groupby('hour').agg({
+        'STOP_DURATION_MINS': 'mean',
+        'intervention_score': 'mean',
+        'ARREST_CHARGES': lambda x: x.notna().mean() * 100,
+        'TICKETS_ISSUED': lambda x: x.notna().mean() * 100
+    })
+
+
+def engine_hourly(df):
+    return group_metrics(df, ['hour'], ['duration_mean', 'score_mean', 'arrest_rate', 'ticket_rate'])
+
+
+def legacy_monthly(df):
+    return df.groupby(['year', 'month']).agg({
+        'STOP_DISTRICT': 'count',
+        'ARREST_CHARGES': lambda x: x.notna().mean() * 100,
+        'STOP_DURATION_MINS': 'mean',
+        'intervention_score': 'mean'
+    })
+
+
+def engine_monthly(df):
+    return group_metrics(df, ['year', 'month'], ['count', 'arrest_rate', 'duration_mean', 'score_mean'])
+
+
+def legacy_districts(df):
+    return df.groupby('STOP_DISTRICT').agg(
+        CCN_ANONYMIZED=('STOP_DISTRICT', 'size'),
+        STOP_DURATION_MINS=('STOP_DURATION_MINS', 'mean'),
+        intervention_score=('intervention_score', 'mean')
+    )
+
+
+def engine_districts(df):
+    return group_metrics(df, ['STOP_DISTRICT'], ['count', 'duration_mean', 'score_mean'])
+
+
+CASES = [
+    ('ethnicité', legacy_ethnicity, engine_ethnicity),
+    ('horaire', legacy_hourly, engine_hourly),
+    ('mensuel', legacy_monthly, engine_monthly),
+    ('districts', legacy_districts, engine_districts),
+]
+
+
+def assert_same(expected, result):
+    """Mêmes valeurs par groupe (ordre des groupes compris)"""
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    result = result if isinstance(result, tuple) else (result,)
+    for old, new in zip(expected, result):
+        old, new = pd.DataFrame(old), pd.DataFrame(new)
+        if isinstance(old.index, pd.CategoricalIndex) or old.index.dtype == object:
+            new = new.loc[old.index]
+        assert np.array_equal(np.asarray(old.index), np.asarray(new.index))
+        assert np.allclose(old.to_numpy(dtype='float64'), new.to_numpy(dtype='float64'),
+                           rtol=1e-5, equal_nan=True)
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 5_000_000]
+    print(f"{'lignes':>10} {'agrégation':<12} {'pandas (ms)':>12} {'moteur (ms)':>12} {'gain':>7}")
+    for n_rows in sizes:
+        df = preprocess_stops(make_raw_stops(n_rows))
+        for label, legacy, engine in CASES:
+            expected, old_time = timed(legacy, df)
+            result, new_time = timed(engine, df)
+            assert_same(expected, result)
+            print(f"{n_rows:>10,} {label:<12} {old_time * 1000:>12.1f} {new_time * 1000:>12.1f} "
+                  f"{old_time / new_time:>6.1f}x")
@@ -0,0 +1,112 @@
+# benchmarks/bench_patch_payload.py
+"""
+Octets et temps de sérialisation par callback : figures complètes (version
+d'origine) contre mises à jour Patch des seules données des traces, pour les
+figures dont le squelette est envoyé avec le layout.
+
+L'application est chargée sur un jeu synthétique écrit dans un répertoire
+temporaire.
+
+Usage : python benchmarks/bench_patch_payload.py [nombre_de_lignes]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+from benchmarks.synthetic import make_raw_stops
+from utils import DATA_PATH
+from wire_format import decode_arrays
+
+# (début, fin, districts, types)
+FILTERS = ('2020-01-01', '2021-06-30', [1.0, 5.0], None)
+REPEATS = 5
+
+
+def serialize(value):
+    """Sérialisation identique à celle des réponses Dash ; retourne (octets, secondes)"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        payload = to_json_plotly(value)
+        timings.append(time.perf_counter() - start)
+    return len(payload.encode('utf-8')), min(timings)
+
+
+def apply_patch(figure_json, patch):
+    """Rejoue les opérations Assign d'un Patch sur le JSON d'une figure, comme le navigateur
+    (tableaux typés décodés en listes)"""
+    for operation in json.loads(to_json_plotly(patch))['operations']:
+        assert operation['operation'] == 'Assign'
+        *path, leaf = operation['location']
+        target = figure_json
+        for key in path:
+            # Comme le navigateur, un Assign crée les objets intermédiaires absents (error_y…)
+            target = target[key] if isinstance(key, int) else target.setdefault(key, {})
+        value = decode_arrays(operation['params']['value'])
+        target[leaf] = value.tolist() if hasattr(value, 'tolist') else value
+    return figure_json
+
+
+def same(a, b):
+    """Égalité de deux JSON de figures, à la précision float32 près pour les tableaux numériques"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return False
+        if all(isinstance(item, (int, float)) or item is None for item in a + b):
+            return np.allclose(np.array(a, dtype=float), np.array(b, dtype=float), rtol=1e-6, equal_nan=True)
+        return all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_raw_stops(n_rows).to_csv(os.path.join(tmp_dir, DATA_PATH), index=False)
+        os.chdir(tmp_dir)
+        import app
+
+        with app.data_manager.snapshot() as snapshot:
+            backend = snapshot.backend
+            query = backend.select(*FILTERS)
+            ethnicity = backend.ethnicity_stats(query)
+            monthly = backend.monthly_stats(query)
+            ages = app.age_stats(backend, query)
+            district_stats = backend.aggregate(query, ['STOP_DISTRICT'], list(app.DISTRICT_METRICS))
+            deployment = app.deployment_plan_traces(district_stats)
+            full_analytics, full_map = app.create_deployment_plan(district_stats)
+            cases = {
+                'ethnicity-analysis': (app.create_ethnicity_analysis(*ethnicity),
+                                       app.trace_updates_patch(app.ethnicity_traces(*ethnicity))),
+                'age-analysis': (app.create_age_analysis(ages),
+                                 app.trace_updates_patch(app.age_traces(ages))),
+                'monthly-trends': (app.create_monthly_trends(monthly),
+                                   app.trace_updates_patch(app.monthly_traces(monthly))),
+                'deployment-analytics': (full_analytics, app.trace_updates_patch(deployment['analytics'])),
+                'deployment-map': (full_map, app.trace_updates_patch(deployment['map'])),
+            }
+
+        print(f"{'figure':<22} {'complète (o)':>13} {'patch (o)':>11} {'complète (ms)':>14} {'patch (ms)':>11}")
+        totals = [0, 0, 0.0, 0.0]
+        for figure_id, (figure, patch) in cases.items():
+            # Le squelette du layout plus le patch redonne exactement la figure complète
+            skeleton = json.loads(to_json_plotly(app.figure_skeletons()[figure_id]))
+            assert same(apply_patch(skeleton, patch), json.loads(to_json_plotly(figure))), figure_id
+
+            full_bytes, full_time = serialize(figure)
+            patch_bytes, patch_time = serialize(patch)
+            for position, value in enumerate((full_bytes, patch_bytes, full_time, patch_time)):
+                totals[position] += value
+            print(f"{figure_id:<22} {full_bytes:>13,} {patch_bytes:>11,} "
+                  f"{full_time * 1000:>14.1f} {patch_time * 1000:>11.1f}")
+        print(f"{'total':<22} {totals[0]:>13,} {totals[1]:>11,} {totals[2] * 1000:>14.1f} {totals[3] * 1000:>11.1f}")
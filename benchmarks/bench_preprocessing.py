@@ -0,0 +1,104 @@
+# benchmarks/bench_preprocessing.py
+"""
+Vérifie la parité du moteur de prétraitement vectorisé avec l'ancienne
+implémentation (apply + masques .loc) et compare leurs temps d'exécution.
+
+Usage : python benchmarks/bench_preprocessing.py [nombre_de_lignes ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from benchmarks.synthetic import make_raw_stops
+from Pipelines.src.preprocessing import clamp_duration, intervention_type, preprocess_stops
+from Pipelines.src.schema import RAW_DTYPES, apply_schema
+
+
+def legacy_preprocess(df):
+    """Prétraitement d'origine de utils.load_and_preprocess_data"""
+    df['DATETIME'] = pd.to_datetime(df['DATETIME'])
+    df['STOP_DURATION_MINS'] = pd.to_numeric(df['STOP_DURATION_MINS'], errors='coerce')
+    median_duration = df['STOP_DURATION_MINS'].median()
+    df['STOP_DURATION_MINS'] = df['STOP_DURATION_MINS'].apply(
+        lambda x: median_duration if pd.isna(x) or x < 0 or x > 1440 else x
+    )
+    df['STOP_DISTRICT'] = pd.to_numeric(df['STOP_DISTRICT'], errors='coerce')
+    df = df.dropna(subset=['STOP_DISTRICT'])
+    df['hour'] = df['DATETIME'].dt.hour
+    df['day_of_week'] = df['DATETIME'].dt.day_name()
+    df['month'] = df['DATETIME'].dt.month
+    df['year'] = df['DATETIME'].dt.year
+    df['season'] = pd.cut(df['month'],
+                          bins=[0, 3, 6, 9, 12],
+                          labels=['Hiver', 'Printemps', 'Été', 'Automne'])
+    df['intervention_score'] = (
+        (df['PERSON_SEARCH_PAT_DOWN'].notna().astype(int) * 2) +
+        (df['PROPERTY_SEARCH_PAT_DOWN'].notna().astype(int) * 2) +
+        (df['TICKETS_ISSUED'].notna().astype(int)) +
+        (df['WARNINGS_ISSUED'].notna().astype(int) * 0.5) +
+        (df['ARREST_CHARGES'].notna().astype(int) * 3)
+    )
+    df['intervention_type'] = 'Contrôle simple'
+    df.loc[df['TICKETS_ISSUED'].notna(), 'intervention_type'] = 'Contravention'
+    df.loc[df['PERSON_SEARCH_PAT_DOWN'].notna(), 'intervention_type'] = 'Fouille personnelle'
+    df.loc[df['PROPERTY_SEARCH_PAT_DOWN'].notna(), 'intervention_type'] = 'Fouille matérielle'
+    df.loc[df['ARREST_CHARGES'].notna(), 'intervention_type'] = 'Arrestation'
+    return df
+
+
+def legacy_clamp(durations):
+    median_duration = durations.median()
+    return durations.apply(lambda x: median_duration if pd.isna(x) or x < 0 or x > 1440 else x)
+
+
+def legacy_type(df):
+    intervention = pd.Series('Contrôle simple', index=df.index)
+    intervention.loc[df['TICKETS_ISSUED'].notna()] = 'Contravention'
+    intervention.loc[df['PERSON_SEARCH_PAT_DOWN'].notna()] = 'Fouille personnelle'
+    intervention.loc[df['PROPERTY_SEARCH_PAT_DOWN'].notna()] = 'Fouille matérielle'
+    intervention.loc[df['ARREST_CHARGES'].notna()] = 'Arrestation'
+    return intervention
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def check_parity(legacy, engine):
+    """Échoue si les deux implémentations ne produisent pas le même résultat"""
+    pd.testing.assert_frame_equal(legacy, engine, check_categorical=False)
+
+
+def report(label, legacy_time, engine_time):
+    print(f"{label:>28} {legacy_time:>12.3f} {engine_time:>12.3f} {legacy_time / engine_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    pd.options.mode.chained_assignment = None
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 3_000_000]
+    for n_rows in sizes:
+        # Mêmes types que la lecture du CSV par read_csv_kwargs()
+        raw = make_raw_stops(n_rows).astype({column: dtype for column, dtype in RAW_DTYPES.items() if dtype})
+        print(f"\n{n_rows:,} lignes {'ancien (s)':>12} {'moteur (s)':>12} {'gain':>8}")
+
+        durations = pd.to_numeric(raw['STOP_DURATION_MINS'], errors='coerce')
+        legacy_durations, legacy_time = timed(legacy_clamp, durations)
+        engine_durations, engine_time = timed(clamp_duration, durations)
+        assert (legacy_durations.to_numpy() == engine_durations).all()
+        report('bornage des durées', legacy_time, engine_time)
+
+        legacy_types, legacy_time = timed(legacy_type, raw)
+        engine_types, engine_time = timed(intervention_type, raw)
+        assert (legacy_types.to_numpy() == engine_types.astype(str)).all()
+        report("type d'intervention", legacy_time, engine_time)
+
+        legacy, legacy_time = timed(lambda frame: apply_schema(legacy_preprocess(frame)), raw.copy())
+        engine, engine_time = timed(preprocess_stops, raw.copy())
+        check_parity(legacy, engine)
+        report('prétraitement complet', legacy_time, engine_time)
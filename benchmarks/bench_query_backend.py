@@ -0,0 +1,117 @@
+# benchmarks/bench_query_backend.py
+"""
+Moteurs de requêtes du dashboard : vérifie que DuckDB (fichiers Parquet
+interrogés sur disque) donne les mêmes agrégats que pandas (lignes filtrées
+par l'index, et cube) sur chaque filtre, puis compare leurs latences.
+
+Usage : python benchmarks/bench_query_backend.py [nombre_de_lignes ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_raw_stops
+from cube import StopCube
+from filter_index import FilterIndex, sort_by_datetime
+from query_backend import DuckDBBackend, PandasBackend, QueryBackend
+from reason_index import STOP_REASON_COLUMNS, ReasonIndex
+from utils import DATA_PATH, load_and_preprocess_data, parquet_sources
+
+# (libellé, début, fin, districts, types)
+FILTERS = [
+    ('tout', None, None, None, None),
+    ('période', '2020-01-01', '2021-06-30', None, None),
+    ('période + 2 districts', '2020-01-01', '2021-06-30', [1.0, 5.0], None),
+    ('période + districts + type', '2020-01-01', '2021-06-30', [1.0, 5.0], ['Arrestation', 'Contravention']),
+    # Dates avec heure (valeurs initiales du calendrier) : journées entières, comme les dates seules
+    ('période horodatée', '2020-01-01T13:05:00', '2021-06-30T08:00:00+00:00', None, None),
+]
+# Agrégats des figures (cube pour pandas)
+FIGURE_AGGREGATES = ['district_counts', 'global_stats', 'hourly_stats', 'type_counts', 'hour_weekday_counts',
+                     'weekday_type_counts', 'ethnicity_stats', 'monthly_stats']
+REPEATS = 5
+
+
+def row_queries(backend, query):
+    """Requêtes des figures calculées sur les lignes (raisons, âges, déploiement) ; raisons par l'index pour pandas"""
+    return {
+        'valeurs des raisons': backend.value_counts(query, STOP_REASON_COLUMNS, top=10),
+        'raisons': backend.reason_counts(query, top=10),
+        'combinaisons de raisons': backend.reason_counts(query, combinations=True, top=10),
+        'âge par type': backend.aggregate(query, ['intervention_type'], ['age_mean']),
+        'âge par district': backend.aggregate(query, ['STOP_DISTRICT'], ['age_mean']),
+        'histogramme des âges': backend.histogram(query, 'AGE', 30),
+        'densité âge x durée': backend.histogram2d(query, 'AGE', 'STOP_DURATION_MINS', [30, 30], y_quantile=0.99),
+        'districts': backend.aggregate(query, ['STOP_DISTRICT'], ['count', 'duration_mean', 'score_mean']),
+    }
+
+
+def figure_queries(backend, query, generic=False):
+    """Agrégats des figures ; generic : implémentation commune, sur les lignes, plutôt que le cube"""
+    owner = QueryBackend if generic else type(backend)
+    return {name: getattr(owner, name)(backend, query) for name in FIGURE_AGGREGATES}
+
+
+def assert_same(expected, actual, label):
+    if isinstance(expected, tuple):
+        assert len(expected) == len(actual), label
+        for position, (left, right) in enumerate(zip(expected, actual)):
+            assert_same(left, right, f"{label}[{position}]")
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), label
+        for key in expected:
+            assert_same(expected[key], actual[key], f"{label}.{key}")
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                      check_column_type=False, rtol=1e-9, obj=label)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                       check_names=False, rtol=1e-9, obj=label)
+    elif isinstance(expected, np.ndarray):
+        np.testing.assert_allclose(expected, actual, rtol=1e-12, err_msg=label)
+    else:
+        np.testing.assert_allclose(expected, actual, rtol=1e-9, err_msg=label)
+
+
+def best_time(func):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'lignes':>10} {'filtre':<28} {'requêtes':<9} {'pandas (ms)':>12} {'duckdb (ms)':>12}")
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_raw_stops(os.path.join(tmp_dir, DATA_PATH), n_rows)
+            os.chdir(tmp_dir)
+            df = sort_by_datetime(load_and_preprocess_data())
+            pandas_backend = PandasBackend(df, FilterIndex(df), StopCube(df), ReasonIndex(df))
+            duckdb_backend = DuckDBBackend(parquet_sources())
+
+            for label, *filters in FILTERS:
+                pandas_query, duckdb_query = pandas_backend.select(*filters), duckdb_backend.select(*filters)
+                # Mêmes résultats que les lignes filtrées par pandas et que le cube, sur chaque filtre :
+                # les trois moteurs retiennent la même période (journée de fin comprise)
+                assert_same(row_queries(pandas_backend, pandas_query), row_queries(duckdb_backend, duckdb_query),
+                            label)
+                expected = figure_queries(pandas_backend, pandas_query)
+                assert_same(expected, figure_queries(pandas_backend, pandas_query, generic=True), label)
+                assert_same(expected, figure_queries(duckdb_backend, duckdb_query), label)
+
+                for kind, queries in (('figures', figure_queries), ('lignes', row_queries)):
+                    timings = [best_time(lambda: queries(backend, backend.select(*filters)))
+                               for backend in (pandas_backend, duckdb_backend)]
+                    print(f"{n_rows:>10,} {label:<28} {kind:<9} {timings[0] * 1000:>12.1f} {timings[1] * 1000:>12.1f}")
+            os.chdir('/')
+    print("Résultats identiques entre les moteurs")
@@ -0,0 +1,98 @@
+# benchmarks/bench_serialization.py
+"""
+Temps CPU de sérialisation et taille des réponses, par sortie du dashboard :
+figures complètes encodées par le JSON standard de Python (format d'origine)
+contre les sorties des callbacks (figures compactes ou Patch) encodées par
+orjson avec tableaux typés, puis compressées en brotli et gzip.
+
+Usage : python benchmarks/bench_serialization.py [nombre_de_lignes]
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import brotli
+import numpy as np
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+from benchmarks.synthetic import make_raw_stops
+from utils import DATA_PATH
+
+# (début, fin, districts, types)
+FILTERS = ('2020-01-01', '2021-06-30', [1.0, 5.0], None)
+REPEATS = 5
+
+
+def timed(func, *args):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def original_payload(value):
+    return to_json_plotly(value, engine='json').encode('utf-8')
+
+
+def compact_payload(value):
+    return to_json_plotly(compact_output(value), engine='orjson').encode('utf-8')
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_raw_stops(n_rows).to_csv(os.path.join(tmp_dir, DATA_PATH), index=False)
+        os.chdir(tmp_dir)
+        import app
+        from wire_format import compact_output, decode_arrays
+
+        filters = dict(zip(('start_date', 'end_date', 'selected_districts', 'selected_types'), FILTERS))
+        full_figures = dict(zip(app.ALL_OUTPUTS, app.update_all_graphs(*FILTERS)))
+        with app.data_manager.snapshot() as snapshot:
+            backend = snapshot.backend
+            query = backend.select(*FILTERS)
+            full_figures['ethnicity-analysis'] = app.create_ethnicity_analysis(*backend.ethnicity_stats(query))
+            full_figures['monthly-trends'] = app.create_monthly_trends(backend.monthly_stats(query))
+            full_figures['age-analysis'] = app.create_age_analysis(app.age_stats(backend, query))
+            full_figures['deployment-analytics'], full_figures['deployment-map'] = app.create_deployment_plan(
+                backend.aggregate(query, ['STOP_DISTRICT'], list(app.DISTRICT_METRICS)))
+
+            outputs = {}
+            for group_outputs, _, compute in app.FIGURE_GROUPS:
+                for (component_id, _), value in zip(group_outputs, compute(snapshot.backend, **filters)):
+                    outputs[component_id] = value
+
+        print(f"{'sortie':<22} {'origine (o)':>12} {'compact (o)':>12} {'brotli (o)':>11} {'gzip (o)':>10} "
+              f"{'origine (ms)':>13} {'compact (ms)':>13}")
+        totals = [0] * 6
+        for component_id in app.ALL_OUTPUTS:
+            original, original_time = timed(original_payload, full_figures[component_id])
+            compact, compact_time = timed(compact_payload, outputs[component_id])
+
+            # Les tableaux typés décodés redonnent les données d'origine
+            if isinstance(outputs[component_id], go.Figure):
+                for trace, encoded in zip(json.loads(original)['data'], json.loads(compact)['data']):
+                    for key, value in encoded.items():
+                        if isinstance(value, dict) and 'bdata' in value:
+                            expected = np.array(trace[key], dtype=float)
+                            assert np.allclose(decode_arrays(value), expected, rtol=1e-6, equal_nan=True), \
+                                (component_id, key)
+
+            row = (len(original), len(compact), len(brotli.compress(compact, quality=app.COMPRESS_BR_LEVEL)),
+                   len(gzip.compress(compact, compresslevel=app.COMPRESS_GZIP_LEVEL)),
+                   original_time * 1000, compact_time * 1000)
+            totals = [total + value for total, value in zip(totals, row)]
+            print(f"{component_id:<22} {row[0]:>12,} {row[1]:>12,} {row[2]:>11,} {row[3]:>10,} "
+                  f"{row[4]:>13.1f} {row[5]:>13.1f}")
+        print(f"{'total':<22} {totals[0]:>12,} {totals[1]:>12,} {totals[2]:>11,} {totals[3]:>10,} "
+              f"{totals[4]:>13.1f} {totals[5]:>13.1f}")
@@ -0,0 +1,68 @@
+# benchmarks/bench_startup.py
+"""
+Temps de démarrage du serveur, mesurés depuis le lancement du processus :
+premier octet de la page (GET /) et dataset servi (/readyz, ou la page
+elle-même si le serveur charge les données avant de répondre). À froid
+(aucun cache) puis à chaud (cache Parquet et store en colonnes présents).
+
+Usage : python benchmarks/bench_startup.py [nombre_de_lignes]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import make_raw_stops
+from utils import DATA_PATH
+
+PORT = 8071
+SERVER = f"import app; app.app.server.run(host='127.0.0.1', port={PORT}, threaded=True)"
+TIMEOUT_SECONDS = 600
+
+
+def wait_for(path, started):
+    """Secondes écoulées depuis `started` jusqu'au premier octet d'une réponse 200 (None si 404)"""
+    deadline = started + TIMEOUT_SECONDS
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=TIMEOUT_SECONDS) as response:
+                response.read(1)
+                return time.perf_counter() - started
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(path)
+
+
+def measure(data_dir):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-c', SERVER], cwd=data_dir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first_byte = wait_for('/', started)
+        ready = wait_for('/readyz', started)
+        return first_byte, first_byte if ready is None else ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_raw_stops(n_rows).to_csv(os.path.join(tmp_dir, DATA_PATH), index=False)
+        print(f"{'démarrage':<10} {'premier octet (s)':>18} {'données servies (s)':>20}")
+        for label in ('froid', 'chaud'):
+            first_byte, ready = measure(tmp_dir)
+            print(f"{label:<10} {first_byte:>18.2f} {ready:>20.2f}")
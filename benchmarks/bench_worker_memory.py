@@ -0,0 +1,83 @@
+# benchmarks/bench_worker_memory.py
+"""
+Mémoire par worker avec l'application préchargée dans un processus maître,
+comme sous gunicorn (preload_app) : workers forkés qui ouvrent les colonnes
+projetées du store, contre workers qui chargent chacun leur propre copie du
+dataset prétraité (comportement d'origine).
+
+USS : mémoire propre au processus ; PSS : mémoire partagée répartie entre
+les processus qui la partagent.
+
+Usage : python benchmarks/bench_worker_memory.py [nombre_de_lignes] [nombre_de_workers]
+"""
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import psutil
+
+from benchmarks.synthetic import make_raw_stops
+from data_manager import PRELOAD_ENV
+from utils import DATA_PATH
+
+FILTERS = [
+    (None, None, None, None),
+    ('2020-01-01', '2021-06-30', [1.0, 5.0], None),
+    ('2019-06-01', '2022-06-30', None, ['Arrestation']),
+]
+
+
+def memory_mb():
+    info = psutil.Process().memory_full_info()
+    return info.uss / 2**20, info.pss / 2**20
+
+
+def run_worker(app, private_copy):
+    """
+    Démarre puis sert quelques requêtes ; retourne (USS au démarrage, USS
+    après les requêtes, PSS après les requêtes) en MB
+    """
+    if private_copy:
+        from filter_index import sort_by_datetime
+        from utils import load_and_preprocess_data
+        df = sort_by_datetime(load_and_preprocess_data())
+    start_uss, _ = memory_mb()
+    for filters in FILTERS:
+        app.update_all_graphs(*filters)
+    return (start_uss, *memory_mb())
+
+
+def fork_workers(app, n_workers, private_copy):
+    results = []
+    for _ in range(n_workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, json.dumps(run_worker(app, private_copy)).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+    return results
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_raw_stops(n_rows).to_csv(os.path.join(tmp_dir, DATA_PATH), index=False)
+        os.chdir(tmp_dir)
+        os.environ[PRELOAD_ENV] = '1'
+        import app
+
+        print(f"{'mode':<18} {'worker':>6} {'USS départ (MB)':>16} {'USS requêtes (MB)':>18} {'PSS (MB)':>9}")
+        for label, private_copy in (('copie par worker', True), ('store partagé', False)):
+            for position, (start_uss, uss, pss) in enumerate(fork_workers(app, n_workers, private_copy)):
+                print(f"{label:<18} {position:>6} {start_uss:>16.1f} {uss:>18.1f} {pss:>9.1f}")
@@ -0,0 +1,427 @@
+# benchmarks/load_test.py
+"""
+Test de charge du dashboard servi par gunicorn (gunicorn.conf.py), pour
+dimensionner le nombre de workers et de threads à partir de mesures.
+
+Chaque utilisateur simulé rejoue des séquences de filtres réalistes :
+ouverture de la page, resserrement de la période, choix de districts puis
+de types d'intervention, retour à tous les districts. À chaque étape, les
+callbacks des groupes de figures sont envoyés en parallèle à
+`/_dash-update-component`, comme le fait le navigateur ; les callbacks
+longs sont suivis (cacheKey, job) jusqu'à leur résultat.
+
+Le rapport donne, pour chaque configuration (workers x threads) : débit,
+latences p50/p95/p99 par callback et par interaction (toutes les figures
+affichées), taux d'erreur et mémoire maximale de chaque worker (RSS,
+USS) et des processus des callbacks longs qu'il a lancés.
+
+Usage :
+  python benchmarks/load_test.py [--rows 200000] [--workers 1 2 4] [--threads 1 4]
+                                 [--users 8] [--duration 30] [--output charge.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import psutil
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_raw_stops
+from result_cache import RESULT_CACHE_PATH
+from utils import DATA_PATH
+
+PORT = 8072
+READY_TIMEOUT_SECONDS = 600
+REQUEST_TIMEOUT_SECONDS = 300
+MEMORY_SAMPLE_SECONDS = 0.5
+# Période proposée si le layout n'a pas encore les bornes du dataset
+DEFAULT_PERIOD = ('2019-01-01', '2022-12-31')
+# Entrées des callbacks -> clé de l'état des filtres
+FILTERS = {
+    'date-range.start_date': 'start_date',
+    'date-range.end_date': 'end_date',
+    'district-filter.value': 'districts',
+    'intervention-type-filter.value': 'types',
+}
+
+
+def request_json(url, payload=None):
+    """GET (ou POST JSON si `payload`) ; retourne (statut, corps décodé ou None)"""
+    headers = {'Accept-Encoding': 'gzip'}
+    data = None
+    if payload is not None:
+        headers['Content-Type'] = 'application/json'
+        data = json.dumps(payload).encode()
+    request = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response.status, json.loads(body) if body else None
+
+
+def wait_ready(base_url, workers, server):
+    """Attend que /readyz réponde 200 plusieurs fois de suite (chaque worker charge ses données)"""
+    deadline = time.perf_counter() + READY_TIMEOUT_SECONDS
+    consecutive = 0
+    while consecutive < 3 * workers:
+        if server.poll() is not None:
+            raise RuntimeError(f"le serveur s'est arrêté (code {server.returncode})")
+        if time.perf_counter() > deadline:
+            raise TimeoutError('/readyz')
+        try:
+            request_json(f"{base_url}/readyz")
+            consecutive += 1
+        except (urllib.error.URLError, ConnectionError):
+            consecutive = 0
+            time.sleep(0.2)
+
+
+def find_component(layout, component_id):
+    """Propriétés du composant `component_id` dans le layout sérialisé (/_dash-layout)"""
+    if isinstance(layout, list):
+        for child in layout:
+            found = find_component(child, component_id)
+            if found is not None:
+                return found
+    elif isinstance(layout, dict):
+        props = layout.get('props', {})
+        if props.get('id') == component_id:
+            return props
+        return find_component(props.get('children'), component_id)
+    return None
+
+
+def filter_domain(base_url):
+    """Valeurs proposées par les filtres du layout : période, districts, types"""
+    _, layout = request_json(f"{base_url}/_dash-layout")
+    dates = find_component(layout, 'date-range')
+    return {
+        'period': (dates.get('start_date') or DEFAULT_PERIOD[0], dates.get('end_date') or DEFAULT_PERIOD[1]),
+        'districts': [option['value'] for option in find_component(layout, 'district-filter')['options']],
+        'types': [option['value'] for option in find_component(layout, 'intervention-type-filter')['options']],
+    }
+
+
+def callback_specs(base_url):
+    """Callbacks du dashboard (/_dash-dependencies) : sorties, entrées, intervalle de polling des callbacks longs"""
+    specs = []
+    for dependency in request_json(f"{base_url}/_dash-dependencies")[1]:
+        output = dependency['output']
+        outputs = [dict(zip(('id', 'property'), item.rsplit('.', 1)))
+                   for item in output.strip('.').split('...')]
+        specs.append({
+            'output': output,
+            'outputs': outputs if output.startswith('..') else outputs[0],
+            'inputs': dependency['inputs'],
+            'interval': (dependency.get('long') or {}).get('interval'),
+        })
+    return specs
+
+
+def random_period(rng, period):
+    """Sous-période d'au moins un mois de `period`, bornes au jour près"""
+    start, end = (np.datetime64(day, 'D') for day in period)
+    span = int((end - start).astype(int))
+    length = rng.randint(min(30, span), span)
+    first = start + np.timedelta64(rng.randint(0, span - length), 'D')
+    return str(first), str(first + np.timedelta64(length, 'D'))
+
+
+def initial_state(domain):
+    """Filtres à l'ouverture de la page : toute la période, tous les districts et types"""
+    return {'start_date': domain['period'][0], 'end_date': domain['period'][1],
+            'districts': None, 'types': None}
+
+
+def filter_session(rng, domain):
+    """
+    Séquence de filtres d'un utilisateur : liste de (état des filtres,
+    entrées modifiées). La première étape est l'ouverture de la page.
+    """
+    state = initial_state(domain)
+    steps = [(dict(state), [])]
+
+    def change(changed, **values):
+        state.update(values)
+        steps.append((dict(state), changed))
+
+    start_date, end_date = random_period(rng, domain['period'])
+    change(['date-range.start_date'], start_date=start_date)
+    change(['date-range.end_date'], end_date=end_date)
+    districts = rng.sample(domain['districts'], rng.randint(1, min(3, len(domain['districts']))))
+    for count in range(1, len(districts) + 1):
+        change(['district-filter.value'], districts=districts[:count])
+    change(['intervention-type-filter.value'], types=rng.sample(domain['types'], 1))
+    change(['district-filter.value'], districts=None)
+    return steps
+
+
+def callback_payload(spec, state, changed):
+    inputs = [dict(item, value=state[FILTERS[f"{item['id']}.{item['property']}"]]) for item in spec['inputs']]
+    return {'output': spec['output'], 'outputs': spec['outputs'], 'inputs': inputs,
+            'changedPropIds': changed, 'state': []}
+
+
+def run_callback(base_url, spec, payload):
+    """Un callback jusqu'à son résultat (polling des callbacks longs) ; retourne la latence (s)"""
+    url = f"{base_url}/_dash-update-component"
+    started = time.perf_counter()
+    _, body = request_json(url, payload)
+    if spec['interval'] is not None and body is not None and 'response' not in body:
+        job = body
+        if 'cacheKey' not in job:
+            raise ValueError(f"réponse inattendue : {job}")
+        # Réponse vide tant que le job tourne ; 204 s'il a été annulé
+        while body is not None and 'response' not in body:
+            if time.perf_counter() - started > REQUEST_TIMEOUT_SECONDS:
+                raise TimeoutError(spec['output'])
+            time.sleep(spec['interval'] / 1000)
+            _, body = request_json(f"{url}?cacheKey={job['cacheKey']}&job={job['job']}", payload)
+    return time.perf_counter() - started
+
+
+class Recorder:
+    """Latences et erreurs relevées par les utilisateurs simulés"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.interactions = []
+        self.errors = {}
+
+    def callback(self, latency):
+        with self.lock:
+            self.callbacks.append(latency)
+
+    def interaction(self, latency):
+        with self.lock:
+            self.interactions.append(latency)
+
+    def error(self, error):
+        with self.lock:
+            name = type(error).__name__
+            if isinstance(error, urllib.error.HTTPError):
+                name = f"HTTP {error.code}"
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def simulate_user(base_url, specs, domain, seed, stop_at, recorder):
+    """Sessions de filtres rejouées jusqu'à `stop_at` ; les callbacks d'une étape partent en parallèle"""
+    rng = random.Random(seed)
+
+    def timed_callback(spec, payload):
+        try:
+            latency = run_callback(base_url, spec, payload)
+        except (OSError, ValueError) as e:
+            # URLError, HTTPError, délais dépassés, réponses illisibles
+            recorder.error(e)
+            return False
+        recorder.callback(latency)
+        return True
+
+    with ThreadPoolExecutor(max_workers=len(specs)) as pool:
+        while time.perf_counter() < stop_at:
+            for state, changed in filter_session(rng, domain):
+                if time.perf_counter() >= stop_at:
+                    return
+                started = time.perf_counter()
+                futures = [pool.submit(timed_callback, spec, callback_payload(spec, state, changed))
+                           for spec in specs]
+                if all(future.result() for future in futures):
+                    recorder.interaction(time.perf_counter() - started)
+
+
+class MemorySampler(threading.Thread):
+    """
+    Mémoire maximale de chaque worker gunicorn : RSS et USS (pages propres
+    au processus), et USS cumulée des processus enfants (callbacks longs),
+    dont la RSS compterait plusieurs fois les pages partagées avec le worker.
+    """
+
+    def __init__(self, master_pid):
+        super().__init__(daemon=True)
+        self.master = psutil.Process(master_pid)
+        self.peaks = {}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        try:
+            workers = self.master.children()
+        except psutil.NoSuchProcess:
+            return
+        for worker in workers:
+            try:
+                memory = worker.memory_full_info()
+                jobs = worker.children(recursive=True)
+            except psutil.NoSuchProcess:
+                continue
+            jobs_uss = 0
+            for job in jobs:
+                try:
+                    jobs_uss += job.memory_full_info().uss
+                except psutil.NoSuchProcess:
+                    pass
+            peak = self.peaks.setdefault(worker.pid, {'rss': 0, 'uss': 0, 'jobs': 0, 'jobs_uss': 0})
+            peak['rss'] = max(peak['rss'], memory.rss)
+            peak['uss'] = max(peak['uss'], memory.uss)
+            peak['jobs'] = max(peak['jobs'], len(jobs))
+            peak['jobs_uss'] = max(peak['jobs_uss'], jobs_uss)
+
+    def run(self):
+        while not self.stopped.wait(MEMORY_SAMPLE_SECONDS):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        return self.peaks
+
+
+def percentiles(values):
+    if not values:
+        return {'p50_s': None, 'p95_s': None, 'p99_s': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_s': float(p50), 'p95_s': float(p95), 'p99_s': float(p99)}
+
+
+def start_server(data_dir, workers, threads, log):
+    env = dict(os.environ, PYTHONPATH=ROOT, DASHBOARD_WORKERS=str(workers),
+               DASHBOARD_THREADS=str(threads), DASHBOARD_BIND=f"127.0.0.1:{PORT}")
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')],
+                            cwd=data_dir, env=env, stdout=subprocess.DEVNULL, stderr=log)
+
+
+def stop_server(server):
+    """Arrête gunicorn, puis les processus de callbacks longs qui lui auraient survécu"""
+    try:
+        processes = psutil.Process(server.pid).children(recursive=True)
+    except psutil.NoSuchProcess:
+        processes = []
+    server.terminate()
+    server.wait()
+    _, alive = psutil.wait_procs(processes, timeout=10)
+    for process in alive:
+        process.kill()
+
+
+def clear_result_cache(data_dir):
+    """Résultats mis en cache par une exécution précédente : sinon les mêmes séquences ne calculent plus rien"""
+    for suffix in ('', '-wal', '-shm'):
+        path = os.path.join(data_dir, RESULT_CACHE_PATH + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_load(data_dir, workers, threads, users, duration, seed, log, keep_cache=False):
+    """Mesures d'une configuration workers x threads, serveur lancé puis arrêté"""
+    if not keep_cache:
+        clear_result_cache(data_dir)
+    base_url = f"http://127.0.0.1:{PORT}"
+    server = start_server(data_dir, workers, threads, log)
+    try:
+        wait_ready(base_url, workers, server)
+        specs = callback_specs(base_url)
+        domain = filter_domain(base_url)
+
+        # Chauffe : ouvertures de page (imports paresseux, premiers accès au store) hors mesures
+        for _ in range(workers):
+            for spec in specs:
+                run_callback(base_url, spec, callback_payload(spec, initial_state(domain), []))
+
+        recorder = Recorder()
+        sampler = MemorySampler(server.pid)
+        sampler.start()
+        started = time.perf_counter()
+        stop_at = started + duration
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            for future in [pool.submit(simulate_user, base_url, specs, domain, seed + user, stop_at, recorder)
+                           for user in range(users)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        peaks = sampler.stop()
+    finally:
+        stop_server(server)
+
+    requests = len(recorder.callbacks) + sum(recorder.errors.values())
+    return {
+        'workers': workers,
+        'threads': threads,
+        'users': users,
+        'elapsed_s': elapsed,
+        'requests': requests,
+        'throughput_rps': len(recorder.callbacks) / elapsed,
+        'interactions_per_s': len(recorder.interactions) / elapsed,
+        'callback_latency': percentiles(recorder.callbacks),
+        'interaction_latency': percentiles(recorder.interactions),
+        'error_rate': sum(recorder.errors.values()) / requests if requests else 0.0,
+        'errors': recorder.errors,
+        'worker_rss_bytes': {str(pid): peak for pid, peak in sorted(peaks.items())},
+    }
+
+
+def print_result(result):
+    def ms(value):
+        return f"{value * 1000:.0f}" if value is not None else '-'
+
+    callback, interaction = result['callback_latency'], result['interaction_latency']
+    print(f"{result['workers']:>7} {result['threads']:>7} {result['users']:>12} "
+          f"{result['throughput_rps']:>9.1f} {ms(callback['p50_s']):>8} {ms(callback['p95_s']):>8} "
+          f"{ms(callback['p99_s']):>8} {ms(interaction['p50_s']):>10} {ms(interaction['p95_s']):>10} "
+          f"{result['error_rate'] * 100:>9.1f}")
+    for pid, peak in result['worker_rss_bytes'].items():
+        print(f"{'':>16} worker {pid} : RSS max {peak['rss'] / 2**20:.0f} MB, USS max {peak['uss'] / 2**20:.0f} MB, "
+              f"callbacks longs : {peak['jobs']} processus, USS max {peak['jobs_uss'] / 2**20:.0f} MB")
+    if result['errors']:
+        print(f"{'':>16} erreurs : {result['errors']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Test de charge du dashboard servi par gunicorn")
+    parser.add_argument('--rows', type=int, default=200_000, help="taille du dataset synthétique")
+    parser.add_argument('--data-dir', help=f"répertoire contenant déjà {DATA_PATH} (et ses caches)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1])
+    parser.add_argument('--users', type=int, default=4, help="utilisateurs simultanés")
+    parser.add_argument('--duration', type=float, default=30, help="durée de mesure par configuration (s)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep-result-cache', action='store_true',
+                        help="conserver le cache de résultats entre les configurations")
+    parser.add_argument('--output', help="fichier JSON des résultats")
+    parser.add_argument('--server-log', help="fichier où ajouter les journaux de gunicorn (erreurs des callbacks)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        if not args.data_dir:
+            write_raw_stops(os.path.join(data_dir, DATA_PATH), args.rows)
+
+        print(f"{'workers':>7} {'threads':>7} {'utilisateurs':>12} {'req/s':>9} {'p50 (ms)':>8} "
+              f"{'p95 (ms)':>8} {'p99 (ms)':>8} {'inter. p50':>10} {'inter. p95':>10} {'erreurs %':>9}")
+        results = []
+        for workers in args.workers:
+            for threads in args.threads:
+                with open(args.server_log or os.devnull, 'a', encoding='utf-8') as log:
+                    result = run_load(data_dir, workers, threads, args.users, args.duration, args.seed, log,
+                                      keep_cache=args.keep_result_cache)
+                print_result(result)
+                results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': None if args.data_dir else args.rows, 'duration_s': args.duration,
+                       'results': results}, f, indent=2)
@@ -0,0 +1,43 @@
+# benchmarks/memory_report.py
+"""
+Compare l'empreinte mémoire du dataset prétraité avant et après le schéma.
+
+Usage : python benchmarks/memory_report.py [chemin_du_csv]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+
+from Pipelines.src.schema import memory_report
+from utils import DATA_PATH, read_and_preprocess_data
+
+
+def load_without_schema(path):
+    """Reproduit le chargement d'origine : toutes les colonnes, chaînes en object, int64/float64"""
+    df = pd.read_csv(path, low_memory=False)
+    df['DATETIME'] = pd.to_datetime(df['DATETIME'])
+    df['STOP_DURATION_MINS'] = pd.to_numeric(df['STOP_DURATION_MINS'], errors='coerce')
+    df['STOP_DISTRICT'] = pd.to_numeric(df['STOP_DISTRICT'], errors='coerce')
+    df = df.dropna(subset=['STOP_DISTRICT'])
+    df['hour'] = df['DATETIME'].dt.hour
+    df['day_of_week'] = df['DATETIME'].dt.day_name()
+    df['month'] = df['DATETIME'].dt.month
+    df['year'] = df['DATETIME'].dt.year
+    df['intervention_type'] = 'Contrôle simple'
+    df['intervention_score'] = 0.0
+    return df
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    report = memory_report({
+        'avant (MB)': load_without_schema(path),
+        'après (MB)': read_and_preprocess_data(path),
+    })
+    with pd.option_context('display.max_rows', None):
+        print(report)
+    before, after = report.loc['TOTAL']
+    print(f"\nRéduction : {before:.1f} MB -> {after:.1f} MB ({(1 - after / before) * 100:.1f}%)")
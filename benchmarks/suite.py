@@ -0,0 +1,186 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks sur données synthétiques (voir synthetic.py) :
+load_and_preprocess_data (CSV, construction du cache, cache), chaque
+fonction create_*, update_all_graphs de bout en bout et
+PoliceResourceOptimizer.
+
+Chaque taille est mesurée dans un processus séparé, sur un CSV écrit dans
+un répertoire temporaire. Les résultats (temps minimal et médian par
+mesure, environnement, commit) sont enregistrés en JSON ; deux fichiers
+se comparent pour repérer les régressions.
+
+Usage :
+  python benchmarks/suite.py [--rows 100000 1000000] [--repeat 3] [--output resultats.json]
+  python benchmarks/suite.py --compare reference.json resultats.json [--threshold 1.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# (début, fin, districts, types)
+ALL_FILTERS = (None, None, None, None)
+NARROW_FILTERS = ('2020-01-01', '2021-06-30', [1.0, 5.0], ['Contravention', 'Arrestation'])
+
+
+def timed(func, repeat):
+    """Temps d'exécution (s) de `repeat` appels, après un appel de chauffe"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'min_s': min(timings), 'median_s': statistics.median(timings), 'runs': timings}
+
+
+def once(func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {'min_s': elapsed, 'median_s': elapsed, 'runs': [elapsed]}
+
+
+def run_size(n_rows, repeat):
+    """Mesures pour une taille de dataset, dans le processus courant"""
+    from benchmarks.synthetic import write_raw_stops
+    from utils import DATA_PATH
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_raw_stops(os.path.join(tmp_dir, DATA_PATH), n_rows)
+        os.chdir(tmp_dir)
+        from utils import load_and_preprocess_data
+
+        results['load_and_preprocess_data (csv)'] = once(lambda: load_and_preprocess_data(use_cache=False))
+        results['load_and_preprocess_data (construction du cache)'] = once(load_and_preprocess_data)
+        results['load_and_preprocess_data (cache)'] = timed(load_and_preprocess_data, repeat)
+
+        import app
+        from ml_optimizer import DISTRICT_METRICS, PoliceResourceOptimizer
+
+        with app.data_manager.snapshot() as snapshot:
+            backend, df = snapshot.backend, snapshot.df
+            query = backend.select(*ALL_FILTERS)
+            district_stats = lambda: backend.aggregate(query, ['STOP_DISTRICT'], list(DISTRICT_METRICS))
+            cases = {
+                'create_map': lambda: app.create_map(backend.district_counts(query)),
+                'create_stats_component': lambda: app.create_stats_component(backend.global_stats(query)),
+                'create_hourly_analysis': lambda: app.create_hourly_analysis(backend.hourly_stats(query)),
+                'create_stop_reasons_chart':
+                    lambda: app.create_stop_reasons_chart(app.stop_reason_counts(backend, query)),
+                'create_intervention_types': lambda: app.create_intervention_types(backend.type_counts(query)),
+                'create_temporal_heatmap': lambda: app.create_temporal_heatmap(backend.hour_weekday_counts(query)),
+                'create_weekly_patterns': lambda: app.create_weekly_patterns(backend.weekday_type_counts(query)),
+                'create_ethnicity_analysis': lambda: app.create_ethnicity_analysis(*backend.ethnicity_stats(query)),
+                'create_age_analysis': lambda: app.create_age_analysis(app.age_stats(backend, query)),
+                'create_monthly_trends': lambda: app.create_monthly_trends(backend.monthly_stats(query)),
+                'create_deployment_plan': lambda: app.create_deployment_plan(district_stats()),
+                'PoliceResourceOptimizer.predict_resource_needs':
+                    lambda: PoliceResourceOptimizer().predict_resource_needs(df),
+            }
+            for name, func in cases.items():
+                results[name] = timed(func, repeat)
+
+        results['update_all_graphs (tout)'] = timed(lambda: app.update_all_graphs(*ALL_FILTERS), repeat)
+        results['update_all_graphs (filtré)'] = timed(lambda: app.update_all_graphs(*NARROW_FILTERS), repeat)
+    return results
+
+
+def environment():
+    """Contexte de l'exécution, enregistré avec les résultats"""
+    import numpy as np
+    import pandas as pd
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_suite(sizes, repeat):
+    results = {}
+    for n_rows in sizes:
+        print(f"Mesures sur {n_rows:,} lignes...", file=sys.stderr)
+        # Un processus par taille : imports, caches et mémoire indépendants
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(n_rows),
+                                 '--repeat', str(repeat)], check=True, capture_output=True, text=True).stdout
+        results[str(n_rows)] = json.loads(output.splitlines()[-1])
+    return {'environment': environment(), 'repeat': repeat, 'results': results}
+
+
+def print_results(report):
+    print(f"{'lignes':>10} {'mesure':<52} {'min (ms)':>10} {'médiane (ms)':>13}")
+    for n_rows, results in report['results'].items():
+        for name, timing in results.items():
+            print(f"{int(n_rows):>10,} {name:<52} {timing['min_s'] * 1000:>10.1f} {timing['median_s'] * 1000:>13.1f}")
+
+
+def compare(reference, current, threshold):
+    """Affiche le rapport des temps minimaux ; retourne le nombre de régressions au-delà du seuil"""
+    print(f"référence : {reference['environment']['commit']} ({reference['environment']['date']}), "
+          f"mesure : {current['environment']['commit']} ({current['environment']['date']})")
+    print(f"{'lignes':>10} {'mesure':<52} {'réf. (ms)':>10} {'mesure (ms)':>12} {'rapport':>8}")
+    regressions = 0
+    for n_rows, results in current['results'].items():
+        for name, timing in results.items():
+            before = reference['results'].get(n_rows, {}).get(name)
+            if before is None:
+                continue
+            ratio = timing['min_s'] / before['min_s']
+            flag = ''
+            if ratio > threshold:
+                regressions += 1
+                flag = '  RÉGRESSION'
+            print(f"{int(n_rows):>10,} {name:<52} {before['min_s'] * 1000:>10.1f} "
+                  f"{timing['min_s'] * 1000:>12.1f} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Suite de benchmarks du dashboard")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="fichier JSON des résultats")
+    parser.add_argument('--compare', nargs=2, metavar=('REFERENCE', 'MESURE'))
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="rapport de temps au-delà duquel une mesure est une régression")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.repeat)))
+    elif args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding='utf-8') as f:
+                reports.append(json.load(f))
+        sys.exit(1 if compare(*reports, args.threshold) else 0)
+    else:
+        report = run_suite(args.rows, args.repeat)
+        print_results(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,184 @@
+# benchmarks/synthetic.py
+"""
+Génération de données synthétiques au format de Stop_Data_2019_to_2022.csv,
+pour reproduire les problèmes de performance sans le fichier réel.
+
+Les distributions imitent celles du fichier source : saisonnalité horaire
+et hebdomadaire, districts inégalement chargés, arrêts avec ou sans
+contravention (motifs parfois multiples), fouilles et arrestations
+corrélées au motif, durées asymétriques (plus longues en cas
+d'arrestation), âges concentrés autour de 30 ans, et valeurs sales (durées négatives ou aberrantes, manquants).
+
+Usage : python benchmarks/synthetic.py nombre_de_lignes fichier.csv [graine] [format_des_horodatages]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ETHNICITIES = ['Black', 'White', 'Hispanic', 'Asian', 'Unknown', 'Multiple', 'Other']
+ETHNICITY_WEIGHTS = [0.55, 0.2, 0.1, 0.05, 0.05, 0.03, 0.02]
+TICKET_REASONS = ['Speeding', 'Red light', 'No seatbelt', 'Expired tags', 'Cell phone use',
+                  'Failure to yield', 'Improper lane change', 'No insurance']
+NONTICKET_REASONS = ['Call for service', 'Suspicious person', 'Traffic violation',
+                     'Warrant', 'Observed violation', 'Domestic dispute', 'Disorderly conduct']
+HARBOR_REASONS = ['Boating violation', 'Safety inspection']
+# Part des arrêts avec contravention ou sur intervention qui citent deux motifs
+MULTIPLE_REASONS_SHARE = 0.15
+ARREST_CHARGES = ['Assault', 'Theft', 'DUI', 'Warrant', 'Possession', 'Disorderly conduct']
+
+# Part des arrêts par heure (creux en fin de nuit, pic en fin d'après-midi)
+HOUR_WEIGHTS = np.array([4.0, 3.5, 3.0, 2.0, 1.2, 1.0, 1.5, 3.0, 4.5, 5.0, 5.0, 5.0,
+                         5.2, 5.4, 5.8, 6.2, 6.5, 6.5, 6.0, 5.5, 5.0, 4.8, 4.6, 4.4])
+# Lundi -> dimanche
+WEEKDAY_WEIGHTS = np.array([1.0, 1.05, 1.05, 1.05, 1.15, 0.95, 0.75])
+DISTRICT_WEIGHTS = np.array([0.12, 0.13, 0.16, 0.13, 0.15, 0.16, 0.15])
+PERIOD = ('2019-01-01', '2023-01-01')
+# Format des horodatages du fichier source (UTC, décalage explicite) et variante ISO sans fuseau
+SOURCE_TIMESTAMP_FORMAT = '%Y/%m/%d %H:%M:%S%z'
+ISO_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+UTC_OFFSET = '+00:00'
+# Lignes générées et écrites par bloc (mémoire bornée quelle que soit la taille)
+CHUNK_ROWS = 1_000_000
+
+
+def _weights(values):
+    return values / values.sum()
+
+
+def _zipf_choice(rng, values, size, exponent=1.1):
+    """Valeurs tirées avec une fréquence décroissante selon leur rang"""
+    weights = 1 / np.arange(1, len(values) + 1) ** exponent
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size, p=_weights(weights))]
+
+
+def _timestamps(rng, n_rows):
+    """Horodatages à la minute : jour uniforme pondéré par le jour de la semaine, heure selon HOUR_WEIGHTS"""
+    days = pd.date_range(*PERIOD, freq='D', inclusive='left')
+    day_weights = _weights(WEEKDAY_WEIGHTS[days.dayofweek])
+    day_values = days.values.astype('int64')[rng.choice(len(days), n_rows, p=day_weights)]
+    hours = rng.choice(24, n_rows, p=_weights(HOUR_WEIGHTS))
+    minutes = rng.integers(0, 60, n_rows)
+    return day_values + (hours * 60 + minutes) * 60_000_000_000
+
+
+def _format_timestamps(timestamps, timestamp_format=SOURCE_TIMESTAMP_FORMAT):
+    """
+    Horodatages (ns) au format texte `timestamp_format`. Les formats
+    SOURCE_TIMESTAMP_FORMAT et ISO_TIMESTAMP_FORMAT sont écrits sans strftime,
+    par substitution de caractères dans la représentation ISO ; les autres
+    passent par strftime.
+    """
+    if timestamp_format not in (SOURCE_TIMESTAMP_FORMAT, ISO_TIMESTAMP_FORMAT):
+        return pd.DatetimeIndex(timestamps.view('datetime64[ns]'), tz='UTC').strftime(timestamp_format).to_numpy(object)
+    text = np.datetime_as_string(timestamps.view('datetime64[ns]'), unit='s').astype('U19')
+    chars = text.view('U1').reshape(len(text), 19)
+    chars[:, 10] = ' '
+    if timestamp_format == SOURCE_TIMESTAMP_FORMAT:
+        chars[:, [4, 7]] = '/'
+        return np.char.add(text, UTC_OFFSET).astype(object)
+    return text.astype(object)
+
+
+def make_raw_stops(n_rows, seed=0, first_id=0, timestamp_format=SOURCE_TIMESTAMP_FORMAT):
+    """
+    DataFrame brut de `n_rows` arrêts, avant prétraitement.
+
+    Args:
+        n_rows: nombre de lignes
+        seed: graine du générateur (mêmes lignes pour une même graine)
+        first_id: premier numéro de CCN_ANONYMIZED (génération par blocs)
+        timestamp_format: format texte de DATETIME (celui du fichier source par défaut)
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = _timestamps(rng, n_rows)
+
+    # Arrêts routiers (motif de contravention) ou sur intervention (autre motif)
+    ticket_stop = rng.random(n_rows) < 0.6
+    ticket_reasons = np.full(n_rows, np.nan, dtype=object)
+    ticket_reasons[ticket_stop] = _zipf_choice(rng, TICKET_REASONS, ticket_stop.sum())
+    nonticket_reasons = np.full(n_rows, np.nan, dtype=object)
+    nonticket_reasons[~ticket_stop] = _zipf_choice(rng, NONTICKET_REASONS, (~ticket_stop).sum())
+    harbor_reasons = np.full(n_rows, np.nan, dtype=object)
+    harbor = rng.random(n_rows) < 0.005
+    harbor_reasons[harbor] = rng.choice(HARBOR_REASONS, harbor.sum())
+
+    # Fouilles et arrestations plus fréquentes hors contrôle routier
+    person_search = rng.random(n_rows) < np.where(ticket_stop, 0.03, 0.18)
+    property_search = rng.random(n_rows) < np.where(person_search, 0.5, 0.02)
+    arrested = rng.random(n_rows) < np.where(person_search, 0.3, np.where(ticket_stop, 0.005, 0.04))
+    tickets = rng.random(n_rows) < np.where(ticket_stop, 0.75, 0.1)
+    warnings = rng.random(n_rows) < np.where(tickets, 0.1, 0.35)
+
+    # Durées asymétriques, allongées par une fouille ou une arrestation ; 1 % de valeurs sales
+    durations = rng.gamma(2.0, np.where(ticket_stop, 7.0, 12.0))
+    durations += person_search * rng.gamma(2.0, 8.0, n_rows) + arrested * rng.gamma(3.0, 20.0, n_rows)
+    durations = durations.round()
+    dirty = rng.random(n_rows)
+    durations[dirty < 0.005] = -5
+    durations[(dirty >= 0.005) & (dirty < 0.01)] = 5000
+
+    ages = np.clip(np.round(rng.lognormal(np.log(32), 0.35, n_rows)), 16, 90)
+
+    def sparse(mask, values, p=None):
+        column = np.full(n_rows, np.nan, dtype=object)
+        column[mask] = rng.choice(values, mask.sum(), p=p)
+        return column
+
+    stops = pd.DataFrame({
+        'CCN_ANONYMIZED': np.arange(first_id, first_id + n_rows),
+        'DATETIME': _format_timestamps(timestamps, timestamp_format),
+        'STOP_DISTRICT': np.where(rng.random(n_rows) < 0.005, np.nan,
+                                  rng.choice(7, n_rows, p=_weights(DISTRICT_WEIGHTS)) + 1.0),
+        'STOP_DURATION_MINS': np.where(rng.random(n_rows) < 0.02, np.nan, durations),
+        'AGE': np.where(rng.random(n_rows) < 0.05, np.nan, ages),
+        'ETHNICITY': rng.choice(ETHNICITIES, n_rows, p=ETHNICITY_WEIGHTS),
+        'GENDER': rng.choice(['Male', 'Female', 'Unknown'], n_rows, p=[0.7, 0.28, 0.02]),
+        'STOP_REASON_TICKET': ticket_reasons,
+        'STOP_REASON_NONTICKET': nonticket_reasons,
+        'STOP_REASON_HARBOR': harbor_reasons,
+        'PERSON_SEARCH_PAT_DOWN': sparse(person_search, ['Yes']),
+        'PROPERTY_SEARCH_PAT_DOWN': sparse(property_search, ['Yes']),
+        'TICKETS_ISSUED': sparse(tickets, ['1', '2', '3'], p=[0.75, 0.2, 0.05]),
+        'WARNINGS_ISSUED': sparse(warnings, ['1', '2'], p=[0.85, 0.15]),
+        'ARREST_CHARGES': sparse(arrested, ARREST_CHARGES),
+    })
+
+    # Motifs multiples, séparés par ';' (séparateur par défaut de reason_index.py). Tirés en dernier :
+    # les autres colonnes restent celles des versions précédentes pour une même graine
+    for column, choices in (('STOP_REASON_TICKET', TICKET_REASONS), ('STOP_REASON_NONTICKET', NONTICKET_REASONS)):
+        reasons = stops[column].to_numpy()
+        multiple = np.flatnonzero(pd.notna(reasons) & (rng.random(n_rows) < MULTIPLE_REASONS_SHARE))
+        second = rng.choice(choices, len(multiple)).astype(object)
+        reasons[multiple] = np.where(second == reasons[multiple], reasons[multiple], reasons[multiple] + '; ' + second)
+        stops[column] = reasons
+    return stops
+
+
+def write_raw_stops(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS, timestamp_format=SOURCE_TIMESTAMP_FORMAT):
+    """
+    Écrit `n_rows` arrêts synthétiques dans un CSV, bloc par bloc : la
+    mémoire utilisée ne dépend que de `chunk_rows` (100k à 50M lignes).
+    Chaque bloc a sa propre graine dérivée de `seed`.
+    """
+    seeds = np.random.SeedSequence(seed).spawn((n_rows + chunk_rows - 1) // chunk_rows)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for position, chunk_seed in enumerate(seeds):
+            first_id = position * chunk_rows
+            chunk = make_raw_stops(min(chunk_rows, n_rows - first_id), seed=chunk_seed, first_id=first_id,
+                                   timestamp_format=timestamp_format)
+            chunk.to_csv(f, index=False, header=position == 0)
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    n_rows, path = int(sys.argv[1]), sys.argv[2]
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    timestamp_format = sys.argv[4] if len(sys.argv) > 4 else SOURCE_TIMESTAMP_FORMAT
+    start = time.perf_counter()
+    write_raw_stops(path, n_rows, seed=seed, timestamp_format=timestamp_format)
+    print(f"{n_rows:,} lignes écrites dans {path} ({os.path.getsize(path) / 2**20:.0f} MB) "
+          f"en {time.perf_counter() - start:.1f} s")
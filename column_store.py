@@ -0,0 +1,295 @@
+# column_store.py
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from cube import StopCube
+from filter_index import FilterIndex
+from instrumentation import flush as flush_metrics, stage
+from reason_index import REASON_DELIMITER, ReasonDictionary, ReasonIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou, l'écriture reste atomique
+    fcntl = None
+
+# Dataset prétraité en colonnes .npy projetées en mémoire, partagées par les workers
+COLUMN_STORE_DIR = 'column_store'
+# Version du format (à incrémenter si la structure des fichiers change)
+COLUMN_STORE_FORMAT = 2
+META_NAME = '_columns.json'
+LOCK_NAME = '.lock'
+
+
+def _encode_column(series):
+    """(métadonnées, {suffixe: tableau}) d'une colonne ; les catégories sont stockées en codes"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories
+        return ({'kind': 'category', 'categories': categories.tolist(),
+                 'categories_dtype': str(categories.dtype), 'ordered': bool(dtype.ordered)},
+                {'codes': series.cat.codes.to_numpy()})
+    if isinstance(dtype, pd.DatetimeTZDtype) or dtype.kind == 'M':
+        values = series.to_numpy(dtype='datetime64[ns]').view('int64')
+        return {'kind': 'datetime', 'tz': str(dtype.tz) if getattr(dtype, 'tz', None) else None}, {'values': values}
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        array = series.array
+        if not hasattr(array, '_mask'):
+            raise TypeError(f"Colonne {series.name} : type {dtype} non pris en charge par le store")
+        return {'kind': 'masked', 'dtype': str(dtype)}, {'values': array._data, 'mask': array._mask}
+    if dtype.kind == 'O':
+        raise TypeError(f"Colonne {series.name} : type objet non pris en charge par le store")
+    return {'kind': 'numpy'}, {'values': series.to_numpy()}
+
+
+def _decode_column(meta, arrays):
+    """Colonne pandas construite sur les tableaux projetés, sans copie"""
+    kind = meta['kind']
+    if kind == 'category':
+        categories = pd.Index(meta['categories'], dtype=meta['categories_dtype'])
+        dtype = pd.CategoricalDtype(categories, ordered=meta['ordered'])
+        return pd.Categorical.from_codes(arrays['codes'], dtype=dtype, validate=False)
+    if kind == 'datetime':
+        values = arrays['values'].view('datetime64[ns]')
+        if meta['tz'] is None:
+            return values
+        return pd.arrays.DatetimeArray(values, dtype=pd.DatetimeTZDtype(tz=meta['tz']))
+    if kind == 'masked':
+        array_type = pd.api.types.pandas_dtype(meta['dtype']).construct_array_type()
+        return array_type(arrays['values'], arrays['mask'])
+    return arrays['values']
+
+
+class ColumnStore:
+    """
+    Dataset prétraité stocké colonne par colonne en fichiers .npy, ouverts en
+    projection mémoire (mmap) et en lecture seule.
+
+    Les pages des fichiers sont celles du cache du système : tous les
+    processus qui ouvrent la même version (maître gunicorn et workers) en
+    partagent une seule copie physique, et un worker de plus n'ajoute presque
+    aucune mémoire résidente. Les lignes sont stockées triées par DATETIME et
+    les colonnes catégorielles sous forme de codes ; les listes de lignes de
+    l'index de filtrage, les sommes cumulées du StopCube et le dictionnaire
+    du ReasonIndex sont stockés à côté des colonnes, construits une seule
+    fois et partagés de la même façon.
+
+    Chaque version du dataset a son répertoire, écrit dans un répertoire
+    temporaire puis renommé : un lecteur ne voit jamais une version
+    incomplète. Un verrou de fichier fait construire une version nouvelle par
+    un seul processus, les autres l'ouvrent ensuite.
+
+    Args:
+        root: répertoire du store
+    """
+
+    def __init__(self, root=COLUMN_STORE_DIR):
+        self.root = root
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def exists(self, version):
+        """Version écrite, au format actuel du store"""
+        try:
+            with open(os.path.join(self.path(version), META_NAME), encoding='utf-8') as f:
+                return json.load(f).get('format') == COLUMN_STORE_FORMAT
+        except (OSError, ValueError):
+            return False
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write(self, version, df, index, cube, reasons, summary=None):
+        """
+        Écrit les colonnes de df (triées par DATETIME), les listes de lignes
+        de son FilterIndex, les tableaux de son StopCube et du dictionnaire de
+        son ReasonIndex sous la version donnée, avec d'éventuelles
+        métadonnées JSON (`summary`) lisibles sans ouvrir les colonnes.
+        """
+        target = self.path(version)
+        tmp_dir = os.path.join(self.root, f".{version}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        def save(name, values):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(values))
+            return f"{name}.npy"
+
+        columns = []
+        for position, name in enumerate(df.columns):
+            meta, arrays = _encode_column(df[name])
+            meta['name'] = name
+            meta['files'] = {suffix: save(f"c{position}.{suffix}", values) for suffix, values in arrays.items()}
+            columns.append(meta)
+
+        postings = {}
+        for label, rows_by_value in (('district', index.district_rows), ('type', index.type_rows)):
+            postings[label] = [[value.item() if hasattr(value, 'item') else value,
+                                save(f"{label}{position}", rows)]
+                               for position, (value, rows) in enumerate(rows_by_value.items())]
+
+        cube_meta, cube_arrays = cube.to_arrays()
+        cube_meta['files'] = {name: save(f"cube.{name}", values) for name, values in cube_arrays.items()}
+        reasons_meta, reasons_arrays = reasons.dictionary.to_arrays()
+        reasons_meta['files'] = {name: save(f"reasons.{name}", values) for name, values in reasons_arrays.items()}
+        reasons_meta['delimiter'] = REASON_DELIMITER
+
+        with open(os.path.join(tmp_dir, META_NAME), 'w', encoding='utf-8') as f:
+            json.dump({'format': COLUMN_STORE_FORMAT, 'version': version, 'rows': len(df),
+                       'summary': summary, 'columns': columns, 'postings': postings,
+                       'cube': cube_meta, 'reasons': reasons_meta}, f, indent=2)
+        try:
+            os.replace(tmp_dir, target)
+        except OSError:
+            # Version déjà écrite par un autre processus (sans verrou de fichier)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not self.exists(version):
+                raise
+
+    def summary(self, version):
+        """Métadonnées enregistrées avec la version, None si elle n'est pas (encore) écrite"""
+        try:
+            with open(os.path.join(self.path(version), META_NAME), encoding='utf-8') as f:
+                return json.load(f).get('summary')
+        except (OSError, ValueError):
+            return None
+
+    def open(self, version):
+        """
+        Ouvre une version en lecture seule.
+
+        Returns:
+            (df, FilterIndex, StopCube, ReasonIndex) : colonnes, listes de
+            lignes, sommes cumulées du cube et dictionnaire des raisons
+            projetés en mémoire
+        """
+        directory = self.path(version)
+        with open(os.path.join(directory, META_NAME), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != COLUMN_STORE_FORMAT:
+            raise ValueError(f"Format du store {directory} non pris en charge")
+
+        def load(file_name):
+            # Vue ndarray simple sur la projection : les résultats des calculs ne sont pas des memmap
+            return np.asarray(np.load(os.path.join(directory, file_name), mmap_mode='r'))
+
+        data = {}
+        for column in meta['columns']:
+            arrays = {suffix: load(file_name) for suffix, file_name in column['files'].items()}
+            data[column['name']] = _decode_column(column, arrays)
+        # copy=False : un bloc par colonne, aucune consolidation en copie privée
+        df = pd.DataFrame(data, copy=False)
+        postings = [{value: load(file_name) for value, file_name in meta['postings'][label]}
+                    for label in ('district', 'type')]
+        cube = StopCube.from_arrays(meta['cube'], {name: load(file_name)
+                                                   for name, file_name in meta['cube']['files'].items()})
+        reasons_meta = meta['reasons']
+        if reasons_meta['delimiter'] == REASON_DELIMITER:
+            dictionary = ReasonDictionary.from_arrays(reasons_meta, {name: load(file_name)
+                                                                     for name, file_name in reasons_meta['files'].items()})
+            reasons = ReasonIndex.from_dictionary(df, dictionary)
+        else:
+            # Séparateur des raisons changé depuis l'écriture : dictionnaire redécoupé dans ce processus
+            reasons = ReasonIndex(df)
+        return df, FilterIndex.from_postings(df, *postings), cube, reasons
+
+    def _build(self, version, build, summarize):
+        """Écrit la version demandée si elle manque ; verrou du store déjà pris"""
+        if self.exists(version):
+            return
+        logging.info(f"Écriture du store en colonnes {self.path(version)}")
+        # Version écrite dans un format précédent : remplacée
+        shutil.rmtree(self.path(version), ignore_errors=True)
+        df = build()
+        with stage('cube_build', rows=len(df)):
+            cube = StopCube(df)
+        # Raisons multiples découpées une fois par catégorie
+        with stage('reason_index', rows=len(df)):
+            reasons = ReasonIndex(df)
+        self.write(version, df, FilterIndex(df), cube, reasons, summarize(df) if summarize else None)
+
+    def attach(self, version, build, summarize=None):
+        """
+        Ouvre la version demandée, construite d'abord si besoin ; voir `open`.
+
+        Args:
+            version: identifiant de la version du dataset
+            build: fonction () -> df trié par DATETIME, appelée par un seul
+                processus à la fois
+            summarize: fonction df -> métadonnées enregistrées avec la version
+        """
+        if not self.exists(version):
+            with self._locked():
+                self._build(version, build, summarize)
+        return self.open(version)
+
+    def build_in_background(self, version, build, summarize=None):
+        """
+        Écrit la version demandée dans un processus fils, sans attendre la fin
+        de l'écriture. Le fils prend le verrou du store avant que l'appelant
+        reprenne la main : les processus qui appellent ensuite `attach`
+        attendent l'écriture puis ouvrent la version, sans la reconstruire.
+
+        Returns:
+            pid du fils, None si la version existe déjà ou sans verrou de fichier
+        """
+        if fcntl is None or self.exists(version):
+            return None
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 1
+            try:
+                with self._locked():
+                    os.close(write_fd)
+                    self._build(version, build, summarize)
+                status = 0
+            except BaseException:
+                logging.exception(f"Échec de l'écriture du store en colonnes {self.path(version)}")
+            finally:
+                try:
+                    # os._exit ne passe pas par atexit : mesures du chargement écrites avant
+                    flush_metrics()
+                finally:
+                    os._exit(status)
+        os.close(write_fd)
+        # Fin de fichier dès que le fils tient le verrou (ou s'est arrêté avant)
+        os.read(read_fd, 1)
+        os.close(read_fd)
+        return pid
+
+    def prune(self, keep):
+        """
+        Supprime les versions autres que `keep`. Les processus qui servent
+        encore une ancienne version gardent leurs projections valides
+        jusqu'à leur fermeture.
+        """
+        if not os.path.isdir(self.root):
+            return
+        with self._locked():
+            for name in os.listdir(self.root):
+                if name in (keep, LOCK_NAME):
+                    continue
+                # Répertoires temporaires : sous verrou, seuls ceux d'écritures interrompues
+                if name.startswith('.') and fcntl is None:
+                    continue
+                path = os.path.join(self.root, name)
+                if os.path.isdir(path):
+                    logging.info(f"Suppression de l'ancienne version {path}")
+                    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,307 @@
+# cube.py
+import numpy as np
+import pandas as pd
+
+from group_metrics import reduce_by_code, row_measures
+from instrumentation import measured
+from Pipelines.src.schema import DAYS_ORDER, INTERVENTION_TYPES
+
+NS_PER_DAY = 86_400 * 10 ** 9
+# Le 1er janvier 1970 était un jeudi (lundi = 0)
+EPOCH_WEEKDAY = 3
+# Cubes cumulés d'un StopCube (dernière dimension : heure, ethnicité)
+CUBE_TABLES = ('by_hour', 'by_ethnicity')
+
+
+def period_days(start_date, end_date, tz=None):
+    """
+    Période du dashboard en journées entières : premier jour à 00:00 et
+    lendemain du dernier jour à 00:00, en heure locale sans fuseau. La
+    journée de fin est comprise : les lignes retenues vérifient
+    début <= DATETIME < fin, quelle que soit l'heure des dates reçues.
+
+    Args:
+        tz: fuseau des données, dans lequel sont lues les dates avec fuseau
+    """
+    def day(value):
+        stamp = pd.Timestamp(value)
+        if stamp.tz is not None:
+            stamp = (stamp.tz_convert(tz) if tz is not None else stamp).tz_localize(None)
+        return stamp.normalize()
+
+    return day(start_date), day(end_date) + pd.Timedelta(days=1)
+
+
+class CubeQuery:
+    """Filtres du dashboard traduits en indices du cube"""
+
+    def __init__(self, start_day, end_day, district_mask, type_mask):
+        self.start_day = start_day
+        self.end_day = end_day
+        self.district_mask = district_mask
+        self.type_mask = type_mask
+
+
+class PhasedCumulative:
+    """
+    Sommes cumulées dans le temps d'un cube journalier, séparées par jour de la
+    semaine : la somme sur n'importe quelle plage de jours coûte O(1) par
+    cellule, et peut être ventilée par jour de la semaine sans coût supplémentaire.
+
+    Args:
+        daily: mesure -> tableau (jours, ...) des valeurs journalières
+    """
+
+    def __init__(self, daily):
+        self.phases = {}
+        for measure, values in daily.items():
+            self.phases[measure] = []
+            for phase in range(7):
+                days = values[phase::7]
+                cumulative = np.zeros((len(days) + 1,) + days.shape[1:], dtype=days.dtype)
+                np.cumsum(days, axis=0, out=cumulative[1:])
+                self.phases[measure].append(cumulative)
+
+    @classmethod
+    def from_phases(cls, phases):
+        """Sommes cumulées déjà calculées (par exemple lues depuis le ColumnStore)"""
+        cumulative = cls.__new__(cls)
+        cumulative.phases = phases
+        return cumulative
+
+    @staticmethod
+    def _days_before(day, phase):
+        """Nombre de jours d'indice < day dont l'indice vaut phase modulo 7"""
+        return np.maximum(0, (np.asarray(day) - phase + 6) // 7)
+
+    def range_sum(self, measure, start_day, end_day, by_phase=False):
+        """Somme sur les jours [start_day, end_day), éventuellement par phase"""
+        parts = [cumulative[self._days_before(end_day, phase)] - cumulative[self._days_before(start_day, phase)]
+                 for phase, cumulative in enumerate(self.phases[measure])]
+        return np.stack(parts) if by_phase else sum(parts)
+
+    def cumulative_at(self, measure, days):
+        """Somme sur les jours [0, day) pour chaque jour de `days`"""
+        return sum(cumulative[self._days_before(days, phase)]
+                   for phase, cumulative in enumerate(self.phases[measure]))
+
+
+class StopCube:
+    """
+    Cube pré-agrégé à la journée, construit au chargement du dataset.
+
+    Dimensions : jour x district x type d'intervention x (heure | ethnicité).
+    Mesures : nombre d'arrêts, somme et nombre de durées renseignées, somme des
+    scores, nombre d'arrestations et de contraventions. Les figures agrégées du
+    dashboard sont calculées depuis le cube, sans parcourir les lignes brutes.
+    La période est filtrée en journées entières, journée de fin comprise.
+    """
+
+    def __init__(self, df):
+        timestamps = df['DATETIME']
+        self.tz = getattr(timestamps.dt, 'tz', None)
+        if self.tz is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        timestamps = timestamps.to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(timestamps) & df['hour'].notna().to_numpy()
+
+        epoch_days = timestamps.view('int64') // NS_PER_DAY
+        first_day = int(epoch_days[valid].min()) if valid.any() else 0
+        self._set_days(first_day, int(epoch_days[valid].max()) - first_day + 1 if valid.any() else 1)
+
+        self.districts = np.sort(df['STOP_DISTRICT'].dropna().unique().astype('float64'))
+        self.types = list(INTERVENTION_TYPES)
+        ethnicity = df['ETHNICITY'].astype('category')
+        self.ethnicities = list(ethnicity.cat.categories)
+
+        day = (epoch_days - first_day)[valid]
+        district = np.searchsorted(self.districts, df['STOP_DISTRICT'].to_numpy(dtype='float64'))[valid]
+        intervention = df['intervention_type'].cat.codes.to_numpy()[valid]
+        hour = df['hour'].to_numpy(dtype='float64')[valid].astype('int64')
+        ethnicity_code = ethnicity.cat.codes.to_numpy()[valid]
+
+        measures = {name: (None if values is None else values[valid]) for name, values in row_measures(
+            df, ('count', 'duration_sum', 'duration_n', 'score_sum', 'arrests', 'tickets')).items()}
+
+        self.by_hour = self._build(day, district, intervention, hour, 24, measures)
+        known = ethnicity_code >= 0
+        self.by_ethnicity = self._build(
+            day[known], district[known], intervention[known], ethnicity_code[known], len(self.ethnicities),
+            {name: (None if values is None else values[known])
+             for name, values in measures.items() if name in ('count', 'duration_sum', 'duration_n', 'arrests')}
+        )
+
+    def _set_days(self, first_day, n_days):
+        """Axe des jours : premier jour (jours depuis l'epoch) et nombre de jours"""
+        self.first_day = pd.Timestamp(first_day, unit='D')
+        self.first_weekday = (first_day + EPOCH_WEEKDAY) % 7
+        self.n_days = n_days
+        self.day_months = (np.datetime64(self.first_day.date(), 'D') + np.arange(n_days)).astype('datetime64[M]')
+
+    def to_arrays(self):
+        """
+        Cube sous forme enregistrable (voir ColumnStore.write).
+
+        Returns:
+            (métadonnées JSON, {nom: tableau des sommes cumulées})
+        """
+        meta = {
+            'first_day': int(self.first_day.value // NS_PER_DAY),
+            'n_days': self.n_days,
+            'tz': str(self.tz) if self.tz is not None else None,
+            'districts': self.districts.tolist(),
+            'types': self.types,
+            'ethnicities': self.ethnicities,
+        }
+        arrays = {f"{table}.{measure}.{phase}": cumulative
+                  for table in CUBE_TABLES
+                  for measure, phases in getattr(self, table).phases.items()
+                  for phase, cumulative in enumerate(phases)}
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Cube sur des sommes cumulées déjà calculées (par exemple projetées depuis le ColumnStore)"""
+        cube = cls.__new__(cls)
+        cube.tz = pd.DatetimeTZDtype(tz=meta['tz']).tz if meta['tz'] is not None else None
+        cube._set_days(meta['first_day'], meta['n_days'])
+        cube.districts = np.asarray(meta['districts'], dtype='float64')
+        cube.types = list(meta['types'])
+        cube.ethnicities = list(meta['ethnicities'])
+        for table in CUBE_TABLES:
+            phases = {}
+            for name, cumulative in arrays.items():
+                prefix, measure, phase = name.split('.')
+                if prefix == table:
+                    phases.setdefault(measure, [None] * 7)[int(phase)] = cumulative
+            setattr(cube, table, PhasedCumulative.from_phases(phases))
+        return cube
+
+    def _build(self, day, district, intervention, extra, n_extra, measures):
+        """Agrège les lignes en cube dense (jours, districts, types, extra) puis cumule dans le temps"""
+        shape = (self.n_days, len(self.districts), len(self.types), n_extra)
+        cell = ((day * shape[1] + district) * shape[2] + intervention) * shape[3] + extra
+        sums = reduce_by_code(cell, int(np.prod(shape)), measures)
+        daily = {name: (values.astype('int32') if values.dtype.kind == 'i' else values).reshape(shape)
+                 for name, values in sums.items()}
+        return PhasedCumulative(daily)
+
+    @measured('filter_cube')
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        """Traduit les filtres du dashboard en requête sur le cube"""
+        start_day, end_day = 0, self.n_days
+        if start_date and end_date:
+            start, end = period_days(start_date, end_date, self.tz)
+            start_day, end_day = (start - self.first_day).days, (end - self.first_day).days
+            start_day = int(np.clip(start_day, 0, self.n_days))
+            end_day = int(np.clip(end_day, start_day, self.n_days))
+        district_mask = (np.isin(self.districts, np.asarray(selected_districts, dtype='float64'))
+                         if selected_districts else np.ones(len(self.districts), dtype=bool))
+        type_mask = (np.isin(self.types, selected_types)
+                     if selected_types else np.ones(len(self.types), dtype=bool))
+        return CubeQuery(start_day, end_day, district_mask, type_mask)
+
+    def _sum(self, cumulative, measure, query, by_weekday=False):
+        """Somme (districts, types, extra) sur la période, filtres district/type appliqués"""
+        values = cumulative.range_sum(measure, query.start_day, query.end_day, by_phase=by_weekday)
+        values = values * query.district_mask[:, None, None] * query.type_mask[None, :, None]
+        if by_weekday:
+            # Phases (décalage depuis le premier jour) -> jours de la semaine, lundi en premier
+            weekdays = (self.first_weekday + np.arange(7)) % 7
+            values = values[np.argsort(weekdays)]
+        return values
+
+    def district_counts(self, query):
+        """Nombre d'arrêts par district, comme value_counts()"""
+        counts = pd.Series(self._sum(self.by_hour, 'count', query).sum(axis=(1, 2)), index=self.districts)
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def global_stats(self, query):
+        """Nombre d'arrêts, durée moyenne, taux d'arrestation et de verbalisation"""
+        total = {name: self._sum(self.by_hour, name, query).sum()
+                 for name in ('count', 'duration_sum', 'duration_n', 'arrests', 'tickets')}
+        count = total['count']
+        return {
+            'total_stops': int(count),
+            'avg_duration': total['duration_sum'] / total['duration_n'] if total['duration_n'] else np.nan,
+            'arrest_rate': total['arrests'] / count * 100 if count else np.nan,
+            'ticket_rate': total['tickets'] / count * 100 if count else np.nan,
+        }
+
+    def hourly_stats(self, query):
+        """Statistiques par heure, au format de utils.get_hourly_stats plus le nombre d'arrêts"""
+        sums = {name: self._sum(self.by_hour, name, query).sum(axis=(0, 1))
+                for name in ('count', 'duration_sum', 'duration_n', 'score_sum', 'arrests', 'tickets')}
+        present = sums['count'] > 0
+        count = sums['count'][present]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats = pd.DataFrame({
+                "Nombre d'interventions": count,
+                'Durée moyenne (min)': sums['duration_sum'][present] / sums['duration_n'][present],
+                'Score intervention': sums['score_sum'][present] / count,
+                'Taux arrestation (%)': sums['arrests'][present] / count * 100,
+                'Taux verbalisation (%)': sums['tickets'][present] / count * 100,
+            }, index=pd.Index(np.arange(24)[present], name='hour'))
+        return stats.round(2)
+
+    def type_counts(self, query):
+        """Nombre d'arrêts par type d'intervention, comme value_counts()"""
+        counts = pd.Series(self._sum(self.by_hour, 'count', query).sum(axis=(0, 2)), index=self.types)
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def hour_weekday_counts(self, query):
+        """Tableau croisé heure x jour de la semaine"""
+        counts = self._sum(self.by_hour, 'count', query, by_weekday=True).sum(axis=(1, 2)).T
+        table = pd.DataFrame(counts, index=pd.Index(np.arange(24), name='hour'), columns=DAYS_ORDER)
+        return table[table.sum(axis=1) > 0]
+
+    def weekday_type_counts(self, query):
+        """Tableau croisé jour de la semaine x type d'intervention"""
+        counts = self._sum(self.by_hour, 'count', query, by_weekday=True).sum(axis=(1, 3))
+        table = pd.DataFrame(counts, index=pd.Index(DAYS_ORDER, name='day_of_week'),
+                             columns=pd.Index(self.types, name='intervention_type'))
+        return table.loc[:, table.sum() > 0]
+
+    def ethnicity_stats(self, query):
+        """Par ethnicité : nombre d'arrêts, durée moyenne, taux d'arrestation et répartition des types (%)"""
+        sums = {name: self._sum(self.by_ethnicity, name, query).sum(axis=0)
+                for name in ('count', 'duration_sum', 'duration_n', 'arrests')}
+        by_type = sums['count'].T
+        count = by_type.sum(axis=1)
+        present = count > 0
+        index = pd.Index(np.asarray(self.ethnicities, dtype=object)[present], name='ETHNICITY')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats = pd.DataFrame({
+                'count': count[present],
+                'duration_mean': sums['duration_sum'].sum(axis=0)[present] / sums['duration_n'].sum(axis=0)[present],
+                'arrest_rate': sums['arrests'].sum(axis=0)[present] / count[present] * 100,
+            }, index=index)
+            shares = pd.DataFrame(by_type[present] / count[present, None] * 100, index=index,
+                                  columns=pd.Index(self.types, name='intervention_type'))
+        return stats, shares.loc[:, by_type[present].sum(axis=0) > 0]
+
+    def monthly_stats(self, query):
+        """Par mois : nombre d'arrêts, taux d'arrestation, durée et score moyens"""
+        start, end = query.start_day, query.end_day
+        if end <= start:
+            return pd.DataFrame(columns=['month_year', 'STOP_DISTRICT', 'ARREST_CHARGES',
+                                         'STOP_DURATION_MINS', 'intervention_score'])
+        # Bornes des mois dans la période : la somme d'un mois est une différence de cumuls
+        month_starts = np.flatnonzero(self.day_months[start + 1:end] != self.day_months[start:end - 1]) + start + 1
+        bounds = np.concatenate([[start], month_starts, [end]])
+        sums = {}
+        for name in ('count', 'duration_sum', 'duration_n', 'score_sum', 'arrests'):
+            cumulative = self.by_hour.cumulative_at(name, bounds)
+            values = np.diff(cumulative, axis=0)
+            values = values * query.district_mask[None, :, None, None] * query.type_mask[None, None, :, None]
+            sums[name] = values.sum(axis=(1, 2, 3))
+        present = sums['count'] > 0
+        count = sums['count'][present]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'month_year': self.day_months[bounds[:-1]][present].astype(str),
+                'STOP_DISTRICT': count,
+                'ARREST_CHARGES': sums['arrests'][present] / count * 100,
+                'STOP_DURATION_MINS': sums['duration_sum'][present] / sums['duration_n'][present],
+                'intervention_score': sums['score_sum'][present] / count,
+            })
@@ -0,0 +1,106 @@
+# data_cache.py
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+# Version du format du cache (à incrémenter si la structure des fichiers change)
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_paths(source_path):
+    """Chemins du cache Parquet et de ses métadonnées, à côté du fichier source"""
+    base, _ = os.path.splitext(source_path)
+    return base + '.preprocessed.parquet', base + '.preprocessed.json'
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Empreinte SHA-256 du fichier source (lecture par blocs)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _is_cache_valid(meta, stat, source_path, code_version):
+    """Vérifie que le cache correspond au fichier source et au code actuel"""
+    if meta is None:
+        return False
+    if meta.get('format') != CACHE_FORMAT_VERSION or meta.get('code_version') != code_version:
+        return False
+    if meta.get('size') != stat.st_size:
+        return False
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    # Même taille mais date modifiée (copie, touch...) : on tranche avec le hash
+    return meta.get('sha256') == file_sha256(source_path)
+
+
+def load_cached_frame(source_path, build, code_version):
+    """
+    Retourne le DataFrame prétraité depuis le cache Parquet s'il est à jour,
+    sinon le reconstruit avec `build(source_path)` et réécrit le cache.
+
+    Le cache est invalidé si la taille, la date de modification (puis le hash)
+    du fichier source ou la version du code de prétraitement changent.
+    """
+    parquet_path, meta_path = cache_paths(source_path)
+    stat = os.stat(source_path)
+    meta = _read_meta(meta_path)
+
+    if os.path.exists(parquet_path) and _is_cache_valid(meta, stat, source_path, code_version):
+        if meta['mtime_ns'] != stat.st_mtime_ns:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+        logging.info(f"Chargement du cache {parquet_path}")
+        return pd.read_parquet(parquet_path)
+
+    df = build(source_path)
+
+    try:
+        # Écriture atomique : plusieurs workers peuvent reconstruire en même temps
+        tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+        _write_meta(meta_path, {
+            'format': CACHE_FORMAT_VERSION,
+            'code_version': code_version,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(source_path),
+            'rows': len(df),
+        })
+    except OSError as e:
+        logging.warning(f"Impossible d'écrire le cache {parquet_path}: {e}")
+
+    return df
+
+
+def cached_parquet_path(source_path, build, code_version):
+    """
+    Chemin du cache Parquet à jour, reconstruit si nécessaire : pour les
+    moteurs qui interrogent le fichier sans charger le DataFrame.
+    """
+    parquet_path, meta_path = cache_paths(source_path)
+    if not (os.path.exists(parquet_path)
+            and _is_cache_valid(_read_meta(meta_path), os.stat(source_path), source_path, code_version)):
+        load_cached_frame(source_path, build, code_version)
+    return parquet_path
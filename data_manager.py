@@ -0,0 +1,198 @@
+# data_manager.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Intervalle de vérification d'une nouvelle version du dataset (secondes)
+RELOAD_POLL_SECONDS = 60
+# Positionnée par gunicorn.conf.py : l'application est préchargée dans le maître,
+# la surveillance est démarrée par chaque worker après le fork
+PRELOAD_ENV = 'DASHBOARD_PRELOAD'
+# Attente maximale du premier chargement par un callback (secondes)
+READY_TIMEOUT_SECONDS = 300
+
+
+class DatasetSnapshot:
+    """
+    Version figée du dataset servie aux callbacks.
+
+    Le nombre de callbacks qui l'utilisent est compté : une fois remplacée par
+    une version plus récente, ses données ne sont libérées qu'après la fin du
+    dernier callback qui s'en sert.
+    """
+
+    def __init__(self, version, df, cube=None, index=None, summary=None, backend=None, preview=None):
+        self.version = version
+        self.summary = summary
+        self.df = df
+        self.cube = cube
+        self.index = index
+        # Moteur des requêtes des figures (query_backend.py)
+        self.backend = backend
+        # Estimations sur échantillon de l'aperçu approché (approximate.py), None s'il est désactivé
+        self.preview = preview
+        self._readers = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._readers += 1
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            if self._retired and self._readers == 0:
+                self._free()
+
+    def retire(self):
+        """Marque le snapshot comme remplacé ; libéré dès qu'il n'a plus de lecteur"""
+        with self._lock:
+            self._retired = True
+            if self._readers == 0:
+                self._free()
+
+    def _free(self):
+        logging.info(f"Libération du dataset {self.version}")
+        self.df = None
+        self.cube = None
+        self.index = None
+        self.backend = None
+        self.preview = None
+
+
+class DatasetManager:
+    """
+    Charge le dataset et le recharge à chaud quand sa version change.
+
+    Le premier chargement a lieu en arrière-plan (`start`) : le serveur
+    répond dès son démarrage, les callbacks attendent que les données soient
+    prêtes (`ready`). La nouvelle version est construite en arrière-plan pendant que l'ancienne
+    continue d'être servie (double tampon), puis échangée atomiquement.
+
+    Args:
+        build_snapshot: fonction version -> DatasetSnapshot
+        get_version: fonction retournant la version actuelle des données sources
+        poll_seconds: intervalle de vérification des nouvelles versions
+    """
+
+    def __init__(self, build_snapshot, get_version, poll_seconds=RELOAD_POLL_SECONDS):
+        self.build_snapshot = build_snapshot
+        self.get_version = get_version
+        self.poll_seconds = poll_seconds
+        self._current = None
+        self._swap_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread_pid = None
+        self._listeners = []
+        self._pollers = []
+        self._ready = threading.Event()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Un verrou pris par un thread du parent au moment du fork ne serait jamais relâché
+        self._swap_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._ready = threading.Event()
+        if self._current is not None:
+            self._current._lock = threading.Lock()
+            self._ready.set()
+
+    @property
+    def version(self):
+        current = self._current
+        return current.version if current is not None else None
+
+    @property
+    def ready(self):
+        """Vrai dès qu'une version du dataset est en service"""
+        return self._ready.is_set()
+
+    @property
+    def summary(self):
+        """Métadonnées de la version en service (bornes et options des filtres), None avant le chargement"""
+        current = self._current
+        return current.summary if current is not None else None
+
+    def add_listener(self, listener):
+        """Enregistre une fonction version -> None appelée après chaque changement de version"""
+        self._listeners.append(listener)
+
+    def add_poller(self, poller):
+        """
+        Enregistre une fonction sans argument appelée à chaque vérification,
+        après celle du dataset (sources annexes servies avec les données)
+        """
+        self._pollers.append(poller)
+
+    def refresh(self):
+        """Construit et installe la version courante des données si elle a changé"""
+        with self._refresh_lock:
+            version = self.get_version()
+            if version == self.version:
+                return False
+            logging.info(f"Construction du dataset {version}")
+            snapshot = self.build_snapshot(version)
+            with self._swap_lock:
+                previous, self._current = self._current, snapshot
+            if previous is not None:
+                previous.retire()
+            self._ready.set()
+            logging.info(f"Dataset {version} en service")
+            for listener in self._listeners:
+                try:
+                    listener(version)
+                except Exception as e:
+                    logging.error(f"Échec d'une notification de rechargement : {e}")
+            return True
+
+    def _wait_ready(self):
+        if self.ready:
+            return
+        if self._thread_pid != os.getpid():
+            # Processus sans surveillance (par exemple un job de callback forké pendant le chargement)
+            self.refresh()
+        elif not self._ready.wait(READY_TIMEOUT_SECONDS):
+            raise RuntimeError("Le dataset n'est pas encore chargé")
+
+    @contextmanager
+    def snapshot(self):
+        """
+        Snapshot cohérent du dataset, valable pendant toute la durée du bloc
+        `with` ; attend le premier chargement si nécessaire
+        """
+        self._wait_ready()
+        with self._swap_lock:
+            snapshot = self._current
+            snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def start(self):
+        """
+        Démarre en arrière-plan le chargement puis la surveillance (une fois
+        par processus, y compris après un fork)
+        """
+        if self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        threading.Thread(target=self._watch, name='dataset-reload', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Les données en service restent disponibles si la reconstruction échoue
+                logging.error(f"Échec du rechargement du dataset : {e}")
+            for poller in self._pollers:
+                try:
+                    poller()
+                except Exception as e:
+                    logging.error(f"Échec d'une vérification périodique : {e}")
+            time.sleep(self.poll_seconds)
@@ -0,0 +1,109 @@
+# filter_index.py
+import numpy as np
+import pandas as pd
+
+from cube import period_days
+
+
+def sort_by_datetime(df):
+    """Trie les lignes par DATETIME (valeurs manquantes en tête), une seule fois au chargement"""
+    times = df['DATETIME'].to_numpy(dtype='datetime64[ns]').view('int64')
+    order = np.argsort(times, kind='stable')
+    return df.take(order).reset_index(drop=True)
+
+
+def _row_ids(mask, dtype):
+    return np.flatnonzero(mask).astype(dtype, copy=False)
+
+
+class FilterIndex:
+    """
+    Index de filtrage construit au chargement du dataset.
+
+    Les lignes doivent être triées par DATETIME (voir `sort_by_datetime`) : une
+    période devient une tranche [lo, hi) trouvée par recherche dichotomique.
+    Chaque district et chaque type d'intervention a sa liste triée de numéros
+    de lignes ; les listes des valeurs sélectionnées sont restreintes à la
+    tranche, réunies puis intersectées. Aucune copie ni masque sur toute la
+    longueur du dataset n'est nécessaire.
+    """
+
+    def __init__(self, df):
+        self._set_times(df)
+        row_dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+        districts = df['STOP_DISTRICT'].to_numpy()
+        self.district_rows = {value: _row_ids(districts == value, row_dtype)
+                              for value in pd.unique(districts) if not pd.isna(value)}
+        types = df['intervention_type']
+        self.type_rows = {value: _row_ids((types.cat.codes == code).to_numpy(), row_dtype)
+                          for code, value in enumerate(types.cat.categories)}
+
+    def _set_times(self, df):
+        timestamps = df['DATETIME']
+        self.tz = getattr(timestamps.dt, 'tz', None)
+        self.times = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+        if len(self.times) and (np.diff(self.times) < 0).any():
+            raise ValueError("FilterIndex attend des lignes triées par DATETIME")
+
+    @classmethod
+    def from_postings(cls, df, district_rows, type_rows):
+        """Index sur des listes de lignes déjà construites (par exemple lues depuis le ColumnStore)"""
+        index = cls.__new__(cls)
+        index._set_times(df)
+        index.district_rows = district_rows
+        index.type_rows = type_rows
+        return index
+
+    def _bound(self, value):
+        bound = pd.Timestamp(value)
+        if self.tz is not None and bound.tz is None:
+            bound = bound.tz_localize(self.tz)
+        return bound.value
+
+    def date_slice(self, start_date, end_date):
+        """Tranche des lignes de la période, journée de fin comprise (voir `cube.period_days`)"""
+        if not (start_date and end_date):
+            return 0, len(self.times)
+        start, end = period_days(start_date, end_date, self.tz)
+        lo = np.searchsorted(self.times, self._bound(start), side='left')
+        hi = np.searchsorted(self.times, self._bound(end), side='left')
+        return int(lo), int(max(lo, hi))
+
+    @staticmethod
+    def _union(postings, values, lo, hi):
+        """Numéros de lignes triés de [lo, hi) prenant l'une des valeurs"""
+        parts = []
+        for value in values:
+            rows = postings.get(value)
+            if rows is not None:
+                parts.append(rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        """
+        Lignes correspondant aux filtres du dashboard.
+
+        Returns:
+            slice si seule la période est filtrée, sinon tableau trié des numéros de lignes
+        """
+        lo, hi = self.date_slice(start_date, end_date)
+        rows = None
+        for postings, values in ((self.district_rows, selected_districts), (self.type_rows, selected_types)):
+            if not values:
+                continue
+            selected = self._union(postings, values, lo, hi)
+            rows = selected if rows is None else np.intersect1d(rows, selected, assume_unique=True)
+        return slice(lo, hi) if rows is None else rows
+
+    @staticmethod
+    def rows(df, selection, columns=None):
+        """
+        Lignes sélectionnées de df. Une tranche sans restriction de colonnes
+        est une vue sans copie ; sinon seules les lignes (et colonnes)
+        demandées sont copiées.
+        """
+        if columns is None:
+            return df.iloc[selection]
+        return df.iloc[selection, df.columns.get_indexer(columns)]
@@ -0,0 +1,93 @@
+# fork_safety.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Les callbacks longs sont lancés par fork depuis un worker qui a plusieurs threads
+# (requêtes gthread, pool des figures, chargement). Le processus enfant ne garde que
+# le thread qui a forké : un verrou tenu par un autre thread à ce moment le reste pour
+# toujours. C'est le cas des mutex globaux de SQLite (enfant bloqué à sa première
+# connexion) et des imports en cours (plotly importe ses classes de traces et ses
+# validateurs à la première utilisation : module partiellement initialisé ou bloqué
+# dans l'enfant). Ces sections sont donc exclues des forks : un fork attend la fin de
+# celles en cours, et aucune ne commence avant qu'il soit terminé.
+
+
+class ForkGate:
+    """
+    Verrou partagé par les sections en cours, exclusif pendant un fork.
+
+    Réentrant par thread. Une section ne doit pas attendre une section
+    ouverte ensuite par un autre thread : un fork en attente bloquerait
+    celle-ci et les deux attendraient indéfiniment.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._active = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self):
+        # Un thread qui tient déjà le verrou ne doit pas attendre un fork en cours
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            with self._condition:
+                self._active += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if not depth:
+                with self._condition:
+                    self._active -= 1
+                    if not self._active:
+                        self._condition.notify_all()
+
+    def _own(self):
+        return 1 if getattr(self._local, 'depth', 0) else 0
+
+    def before_fork(self):
+        # Tenu jusqu'à la fin du fork. Seule peut rester ouverte une section du thread
+        # qui forke : il n'y exécute rien pendant le fork
+        self._condition.acquire()
+        own = self._own()
+        self._condition.wait_for(lambda: self._active == own)
+
+    def after_fork_in_parent(self):
+        self._condition.release()
+
+    def after_fork_in_child(self):
+        # Seul le thread qui a forké existe dans l'enfant
+        self._condition = threading.Condition(threading.Lock())
+        self._active = self._own()
+
+
+_gate = ForkGate()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_gate.before_fork, after_in_parent=_gate.after_fork_in_parent,
+                        after_in_child=_gate.after_fork_in_child)
+
+
+def fork_safe():
+    """Section pendant laquelle le processus ne forke pas (SQLite, calcul des figures, chargement)"""
+    return _gate.shared()
+
+
+@contextmanager
+def connect(path, timeout=30):
+    """
+    Connexion SQLite en mode WAL, en autocommit (transactions explicites),
+    fermée à la sortie du bloc. Une connexion par opération : utilisable
+    depuis plusieurs threads et après un fork.
+    """
+    with fork_safe():
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            yield conn
+        finally:
+            conn.close()
@@ -0,0 +1,199 @@
+# group_metrics.py
+import numpy as np
+import pandas as pd
+
+from Pipelines.src.schema import INTERVENTION_TYPES
+
+# Mesures par ligne, sommées par groupe : les indicateurs en sont des ratios.
+# <préfixe>_sum / <préfixe>_n : somme et nombre de valeurs renseignées d'une colonne
+MEAN_COLUMNS = {
+    'duration': 'STOP_DURATION_MINS',
+    'score': 'intervention_score',
+    'age': 'AGE',
+}
+# Lignes où la colonne est renseignée
+FLAG_COLUMNS = {
+    'arrests': 'ARREST_CHARGES',
+    'tickets': 'TICKETS_ISSUED',
+}
+# Plus grand écart entre valeurs d'une clé entière codée sans hachage
+MAX_DIRECT_SPAN = 1 << 16
+
+# Indicateur -> (numérateur, dénominateur, facteur)
+METRICS = {
+    'count': ('count', None, 1),
+    'duration_mean': ('duration_sum', 'duration_n', 1),
+    'arrest_rate': ('arrests', 'count', 100),
+    'ticket_rate': ('tickets', 'count', 100),
+    'score_mean': ('score_sum', 'score_n', 1),
+    'age_mean': ('age_sum', 'age_n', 1),
+}
+# Répartition des types d'intervention : une colonne de comptage par type
+TYPE_DISTRIBUTION = 'type_distribution'
+
+
+def row_measures(df, names):
+    """
+    Mesures par ligne demandées : poids float, indicateurs booléens, ou None
+    pour le simple comptage (aussi utilisé pour <préfixe>_n quand la colonne
+    n'a pas de valeur manquante). Chaque colonne n'est convertie qu'une fois.
+    """
+    measures = {}
+    for name in names:
+        if name == 'count':
+            measures[name] = None
+        elif name in FLAG_COLUMNS:
+            measures[name] = df[FLAG_COLUMNS[name]].notna().to_numpy()
+        else:
+            prefix = name.rsplit('_', 1)[0]
+            if f'{prefix}_sum' in measures or f'{prefix}_n' in measures:
+                continue
+            values = pd.to_numeric(df[MEAN_COLUMNS[prefix]], errors='coerce').to_numpy(dtype='float64', copy=True)
+            missing = np.isnan(values)
+            has_missing = missing.any()
+            if has_missing:
+                values[missing] = 0
+            if f'{prefix}_sum' in names:
+                measures[f'{prefix}_sum'] = values
+            if f'{prefix}_n' in names:
+                measures[f'{prefix}_n'] = ~missing if has_missing else None
+    return measures
+
+
+def reduce_by_code(codes, size, measures):
+    """
+    Somme de chaque mesure par code de groupe, en un np.bincount par mesure
+    (le comptage simple n'est calculé qu'une fois).
+
+    Args:
+        codes: code entier du groupe de chaque ligne, dans [0, size)
+        size: nombre de groupes
+        measures: nom -> poids par ligne (None pour compter les lignes)
+    Returns:
+        dict: nom -> tableau (size,) ; entier pour les comptages, float sinon
+    """
+    sums = {}
+    counts = None
+    for name, weights in measures.items():
+        if weights is None:
+            if counts is None:
+                counts = np.bincount(codes, minlength=size).astype('int64')
+            sums[name] = counts
+        elif weights.dtype == bool:
+            sums[name] = np.bincount(codes[weights], minlength=size).astype('int64')
+        else:
+            sums[name] = np.bincount(codes, weights=weights, minlength=size)
+    return sums
+
+
+def _key_codes(column):
+    """Codes d'une clé (-1 si manquante) et ses valeurs triées"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    values = column.to_numpy()
+    if values.dtype.kind in 'iu' and len(values):
+        # Clé entière de faible amplitude : codes par table de correspondance, sans hachage
+        low = int(values.min())
+        span = int(values.max()) - low + 1
+        if span <= MAX_DIRECT_SPAN:
+            offsets = (values - low).astype('int64')
+            present = np.bincount(offsets, minlength=span) > 0
+            lookup = np.cumsum(present) - 1
+            return lookup[offsets], pd.Index((np.flatnonzero(present) + low).astype(values.dtype))
+    return pd.factorize(column, sort=True)
+
+
+def group_codes(df, keys):
+    """
+    Code entier combiné des colonnes clés (-1 si une clé manque) et valeurs
+    de chaque clé, triées comme groupby.
+
+    Returns:
+        (codes, levels) : codes par ligne, liste des valeurs possibles de chaque clé
+    """
+    codes = np.zeros(len(df), dtype='int64')
+    missing = np.zeros(len(df), dtype=bool)
+    levels = []
+    for key in keys:
+        key_codes, values = _key_codes(df[key])
+        missing |= key_codes < 0
+        codes = codes * len(values) + key_codes
+        levels.append(pd.Index(values, name=key))
+    codes[missing] = -1
+    return codes, levels
+
+
+def group_metrics(df, keys, metrics):
+    """
+    Indicateurs par groupe calculés en une passe vectorisée : les clés sont
+    combinées en un code entier, puis chaque mesure est sommée par np.bincount.
+    Remplace les groupby/agg à lambdas, apply et crosstab sur les mêmes lignes.
+
+    Args:
+        df: lignes à agréger
+        keys: colonnes clés (aucune : un seul groupe)
+        metrics: noms pris dans METRICS, et/ou TYPE_DISTRIBUTION
+    Returns:
+        pd.DataFrame: une ligne par groupe présent (trié comme groupby), une
+        colonne par indicateur ; TYPE_DISTRIBUTION ajoute une colonne de
+        comptage par type d'intervention
+    """
+    codes, levels = group_codes(df, keys)
+    size = int(np.prod([len(level) for level in levels]))
+    present_rows = codes >= 0
+    if not present_rows.all():
+        df, codes = df[present_rows], codes[present_rows]
+
+    sums = reduce_by_code(codes, size, row_measures(df, measure_names(metrics)))
+
+    by_type = None
+    if TYPE_DISTRIBUTION in metrics:
+        n_types = len(INTERVENTION_TYPES)
+        type_codes = df['intervention_type'].cat.codes.to_numpy().astype('int64')
+        known = type_codes >= 0
+        by_type = np.bincount(codes[known] * n_types + type_codes[known], minlength=size * n_types)
+        by_type = by_type.reshape(size, n_types)
+
+    present = sums['count'] > 0
+    if not levels:
+        # Sans clé : un seul groupe, toutes les lignes
+        index = pd.RangeIndex(1)[present]
+    elif len(levels) == 1:
+        index = levels[0][present]
+    else:
+        index = pd.MultiIndex.from_product(levels)[present]
+    return metric_frame({name: values[present] for name, values in sums.items()}, metrics, index,
+                        None if by_type is None else by_type[present])
+
+
+def measure_names(metrics):
+    """Sommes par groupe nécessaires au calcul des indicateurs (le comptage est toujours inclus)"""
+    names = {'count'}
+    for metric in metrics:
+        if metric in METRICS:
+            names.update(name for name in METRICS[metric][:2] if name is not None)
+    return sorted(names)
+
+
+def metric_frame(sums, metrics, index, by_type=None):
+    """
+    Indicateurs calculés depuis les sommes des groupes présents, quel que
+    soit le moteur qui les a produites (bincount, SQL).
+
+    Args:
+        sums: nom de mesure (voir measure_names) -> sommes par groupe
+        metrics: noms pris dans METRICS, et/ou TYPE_DISTRIBUTION
+        index: index des groupes
+        by_type: comptages (groupes, types d'intervention) si TYPE_DISTRIBUTION est demandé
+    """
+    result = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for metric in metrics:
+            if metric == TYPE_DISTRIBUTION:
+                for position, intervention_type in enumerate(INTERVENTION_TYPES):
+                    result[intervention_type] = by_type[:, position]
+                continue
+            numerator, denominator, factor = METRICS[metric]
+            values = sums[numerator]
+            result[metric] = values if denominator is None else values / sums[denominator] * factor
+    return pd.DataFrame(result, index=index)
@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+# Lancement : gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+from data_manager import PRELOAD_ENV
+
+wsgi_app = 'app:server'
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('DASHBOARD_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Plus d'un thread par worker : worker gthread, requêtes servies en parallèle dans un même processus
+threads = int(os.environ.get('DASHBOARD_THREADS', 1))
+
+# L'application est importée une fois dans le maître, avant les forks, sans charger
+# le dataset : le serveur répond dès son démarrage
+preload_app = True
+os.environ[PRELOAD_ENV] = '1'
+
+
+def when_ready(server):
+    # Le maître fait écrire le store en colonnes (column_store.py) par un processus fils,
+    # avant de lancer les workers : ceux-ci attendent la fin de l'écriture sur le verrou
+    # du store puis en ouvrent tous les mêmes pages projetées en mémoire
+    from app import build_column_store
+    build_column_store()
+
+
+def post_fork(server, worker):
+    # Un thread de chargement puis de rechargement par worker
+    from app import data_manager
+    data_manager.start()
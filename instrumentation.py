@@ -0,0 +1,282 @@
+# instrumentation.py
+import atexit
+import bisect
+import cProfile
+import logging
+import os
+import sqlite3
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+from fork_safety import connect
+
+# Mesures des étapes du chemin critique, partagées par les workers et les processus
+# des callbacks longs, exposées au format texte de Prometheus (route /metrics)
+METRICS_PATH = 'metrics.sqlite'
+# Pic d'allocation par étape (tracemalloc, coûteux : activé à la demande)
+TRACE_MEMORY = os.environ.get('DASHBOARD_TRACE_MEMORY') == '1'
+# Profil cProfile des callbacks plus lents que ce seuil (ms), 0 pour désactiver
+PROFILE_SLOW_MS = float(os.environ.get('DASHBOARD_PROFILE_SLOW_MS', 0))
+PROFILE_DIR = 'profiles'
+# Mesures en attente conservées au plus par processus (les plus anciennes sont abandonnées)
+MAX_PENDING = 10_000
+# Mesures écrites par lots : dès FLUSH_EVERY mesures en attente, ou FLUSH_SECONDS
+# après la dernière écriture, vérifié à la fin de chaque callback
+FLUSH_EVERY = 500
+FLUSH_SECONDS = 10
+
+# Histogrammes : nom -> (description, bornes supérieures des classes)
+HISTOGRAMS = {
+    'dashboard_stage_seconds': ("Durée des étapes (secondes)",
+                                (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)),
+    'dashboard_stage_rows': ("Lignes traitées par étape",
+                             (10, 100, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8)),
+    'dashboard_stage_peak_bytes': ("Pic d'allocation par étape (octets, DASHBOARD_TRACE_MEMORY=1)",
+                                   (1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9, 5e9)),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    metric TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (metric, stage, bucket)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    metric TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    PRIMARY KEY (metric, stage)
+);
+"""
+
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_pending = []
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+# Fichiers dont le schéma a été créé par ce processus
+_schema_paths = set()
+_local = threading.local()
+
+
+def _after_fork():
+    # Processus des callbacks longs : verrou éventuellement tenu par un thread du parent,
+    # mesures en attente déjà comptées par le parent
+    global _pending_lock, _last_flush
+    _pending_lock = threading.Lock()
+    del _pending[:]
+    _last_flush = time.monotonic()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class Stage:
+    """Étape en cours de mesure ; `rows` peut être renseigné dans le bloc"""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.peak = 0
+        self.base = 0
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Mesure un bloc : durée, lignes traitées et, si TRACE_MEMORY, pic
+    d'allocation au-dessus de la mémoire tracée à l'entrée (les étapes
+    d'autres threads exécutées en même temps y contribuent aussi).
+    Les mesures sont mises en attente jusqu'au prochain `flush`.
+    """
+    current = Stage(name, rows)
+    stack = _stack()
+    if TRACE_MEMORY:
+        traced, peak = tracemalloc.get_traced_memory()
+        # Le pic des étapes englobantes est relevé avant d'être remis à zéro
+        for outer in stack:
+            outer.peak = max(outer.peak, peak)
+        tracemalloc.reset_peak()
+        current.base = current.peak = traced
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        observations = [('dashboard_stage_seconds', name, elapsed)]
+        if current.rows is not None:
+            observations.append(('dashboard_stage_rows', name, current.rows))
+        if TRACE_MEMORY:
+            current.peak = max(current.peak, tracemalloc.get_traced_memory()[1])
+            for outer in stack:
+                outer.peak = max(outer.peak, current.peak)
+            observations.append(('dashboard_stage_peak_bytes', name, current.peak - current.base))
+        with _pending_lock:
+            _pending.extend(observations)
+            if len(_pending) > MAX_PENDING:
+                del _pending[:len(_pending) - MAX_PENDING]
+
+
+def row_count(value):
+    """Nombre de lignes d'un DataFrame ou d'une Series, None sinon"""
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+def measured(name=None):
+    """
+    Décorateur : chaque appel est une étape ; les lignes traitées sont
+    celles du premier argument s'il s'agit d'un DataFrame ou d'une Series,
+    sinon celles du résultat.
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, rows=row_count(args[0]) if args else None) as current:
+                result = func(*args, **kwargs)
+                if current.rows is None:
+                    current.rows = row_count(result)
+                return result
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profiled(name):
+    """
+    Profil cProfile du bloc, écrit dans PROFILE_DIR s'il a duré plus de
+    PROFILE_SLOW_MS (à lire avec pstats ou snakeviz). Sans effet si le seuil est 0.
+    """
+    if not PROFILE_SLOW_MS:
+        yield
+        return
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            logging.info(f"Callback {name} lent ({elapsed_ms:.0f} ms) : profil écrit dans {path}")
+
+
+@contextmanager
+def _connect(path):
+    with connect(path) as conn:
+        if path not in _schema_paths:
+            # Schéma créé une fois par processus
+            conn.executescript(SCHEMA)
+            _schema_paths.add(path)
+        yield conn
+
+
+def flush(path=METRICS_PATH, force=True):
+    """
+    Ajoute les mesures en attente du processus aux histogrammes partagés.
+    Sans `force`, seulement si FLUSH_EVERY mesures attendent ou si la
+    dernière écriture date de plus de FLUSH_SECONDS.
+    """
+    global _last_flush
+    with _pending_lock:
+        if not force and len(_pending) < FLUSH_EVERY and time.monotonic() - _last_flush < FLUSH_SECONDS:
+            return
+        observations = _pending[:]
+        del _pending[:]
+        _last_flush = time.monotonic()
+    if not observations:
+        return
+    buckets, totals = {}, {}
+    for metric, name, value in observations:
+        bucket = bisect.bisect_left(HISTOGRAMS[metric][1], value)
+        buckets[metric, name, bucket] = buckets.get((metric, name, bucket), 0) + 1
+        count, total = totals.get((metric, name), (0, 0.0))
+        totals[metric, name] = (count + 1, total + value)
+    try:
+        with _connect(path) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany("INSERT INTO buckets (metric, stage, bucket, count) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (metric, stage, bucket) DO UPDATE SET count = count + excluded.count",
+                             [(*key, count) for key, count in buckets.items()])
+            conn.executemany("INSERT INTO totals (metric, stage, count, sum) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (metric, stage) DO UPDATE SET count = count + excluded.count, "
+                             "sum = sum + excluded.sum",
+                             [(*key, count, total) for key, (count, total) in totals.items()])
+            conn.execute('COMMIT')
+    except sqlite3.Error as e:
+        # Les mesures ne doivent jamais faire échouer une requête ; fichier peut-être
+        # supprimé ou remplacé : schéma recréé à la prochaine écriture
+        _schema_paths.discard(path)
+        logging.warning(f"Écriture des mesures impossible : {e}")
+
+
+# Mesures restantes écrites à la sortie du processus (hors sorties par os._exit)
+atexit.register(flush)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) or abs(value) >= 1e15 else str(int(value))
+
+
+def render_metrics(path=METRICS_PATH):
+    """
+    Histogrammes au format texte d'exposition de Prometheus. Les mesures des
+    autres processus y figurent une fois écrites par lot (voir `flush`).
+    """
+    flush(path)
+    try:
+        with _connect(path) as conn:
+            bucket_rows = conn.execute("SELECT metric, stage, bucket, count FROM buckets").fetchall()
+            total_rows = conn.execute("SELECT metric, stage, count, sum FROM totals "
+                                      "ORDER BY metric, stage").fetchall()
+    except sqlite3.Error as e:
+        # Base illisible : histogrammes déclarés sans séries plutôt qu'une erreur 500
+        _schema_paths.discard(path)
+        logging.warning(f"Lecture des mesures impossible : {e}")
+        bucket_rows, total_rows = [], []
+    counts = {}
+    for metric, name, bucket, count in bucket_rows:
+        counts.setdefault((metric, name), {})[bucket] = count
+
+    lines = []
+    for metric, (description, bounds) in HISTOGRAMS.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+        for row_metric, name, count, total in total_rows:
+            if row_metric != metric:
+                continue
+            label = _label(name)
+            cumulative = 0
+            for bucket, bound in enumerate(bounds):
+                cumulative += counts[metric, name].get(bucket, 0)
+                lines.append(f'{metric}_bucket{{stage="{label}",le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{label}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {total!r}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -1,64 +1,211 @@
+import logging
+import threading
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
+from Pipelines.src.datetime_parsing import EPOCH_DAYOFWEEK, NS_PER_DAY, NS_PER_HOUR, datetime_parts
+from group_metrics import group_metrics
+from model_registry import ModelRegistry
+
+# Indicateurs par district utilisés par le plan de déploiement -> noms des colonnes des features
+DISTRICT_METRICS = {
+    'count': 'CCN_ANONYMIZED',  # Nombre d'interventions
+    'duration_mean': 'STOP_DURATION_MINS',  # Durée moyenne
+    'score_mean': 'intervention_score',  # Score moyen d'intervention
+}
+
+def resource_needs(district_stats):
+    """
+    Besoins en personnel par district, depuis les indicateurs DISTRICT_METRICS
+    agrégés par district (group_metrics ou moteur de requêtes)
+    """
+    district_stats = district_stats.rename(columns=DISTRICT_METRICS)
+    # Calcul du nombre d'agents nécessaires
+    base_officers = np.ceil(district_stats['CCN_ANONYMIZED'].to_numpy() *
+                            district_stats['STOP_DURATION_MINS'].to_numpy() / (8 * 60))  # 8h de travail
+    # Ajustement selon la gravité
+    priority = district_stats['intervention_score'].to_numpy()
+    adjusted_officers = base_officers * (1 + priority / 10)
+    return pd.DataFrame({
+        'STOP_DISTRICT': district_stats.index.to_numpy(),
+        'officers_needed': adjusted_officers,
+        'patrol_cars': np.ceil(adjusted_officers / 2),  # 2 officiers par voiture
+        'priority_level': priority,
+    })
+
+# Modèle de demande : nombre d'arrêts par district et par heure, prédit depuis le calendrier
+FEATURES = ['STOP_DISTRICT', 'hour', 'day_of_week', 'month', 'is_weekend', 'is_night']
+TARGET = 'stops'
+# Derniers jours de l'historique réservés à l'évaluation du modèle
+VALIDATION_DAYS = 90
+# Gradient boosting sur histogrammes : ses arbres sont des tableaux numpy, projetés en
+# mémoire tels quels au chargement (les arbres d'une forêt aléatoire sont recopiés)
+MODEL_PARAMS = {
+    'loss': 'poisson',
+    'max_iter': 200,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 31,
+    'categorical_features': [FEATURES.index('STOP_DISTRICT')],
+    'random_state': 42,
+}
+
+def calendar_features(districts, days, hours):
+    """
+    Features du modèle pour des cellules (district, jour, heure)
+
+    Args:
+        districts: district de chaque cellule
+        days: jour de chaque cellule (datetime64[D], ou scalaire commun)
+        hours: heure de chaque cellule
+    """
+    districts = np.asarray(districts)
+    hours = np.asarray(hours, dtype='int64')
+    days = np.broadcast_to(np.asarray(days, dtype='datetime64[D]'), hours.shape)
+    day_of_week = (days.astype('int64') + EPOCH_DAYOFWEEK) % 7
+    return pd.DataFrame({
+        'STOP_DISTRICT': districts.astype('int64'),
+        'hour': hours,
+        'day_of_week': day_of_week,
+        'month': days.astype('datetime64[M]').astype('int64') % 12 + 1,
+        'is_weekend': (day_of_week >= 5).astype('int64'),
+        'is_night': ((hours >= 22) | (hours <= 5)).astype('int64'),
+    })
+
+def hourly_demand(df):
+    """
+    Nombre d'arrêts de chaque district à chaque heure de l'historique, heures
+    sans arrêt comprises (une cellule par district, jour et heure)
+
+    Returns:
+        pd.DataFrame: colonne 'day', FEATURES et TARGET
+    """
+    timestamps = df['DATETIME']
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        # Heure locale, comme datetime_parts
+        timestamps = timestamps.dt.tz_localize(None)
+    ns = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+    known = ~np.isnat(timestamps.to_numpy(dtype='datetime64[ns]')) & df['STOP_DISTRICT'].notna().to_numpy()
+    ns = ns[known]
+    district_codes, districts = pd.factorize(df['STOP_DISTRICT'].to_numpy()[known], sort=True)
+    days = ns // NS_PER_DAY
+    hours = (ns - days * NS_PER_DAY) // NS_PER_HOUR
+    first_day = days.min()
+    n_days, n_districts = int(days.max() - first_day) + 1, len(districts)
+
+    # Code de cellule (jour, heure, district) : un np.bincount compte toutes les cellules
+    codes = ((days - first_day) * 24 + hours) * n_districts + district_codes
+    counts = np.bincount(codes, minlength=n_days * 24 * n_districts)
+    cell_days, cell_hours, cell_districts = np.unravel_index(np.arange(len(counts)), (n_days, 24, n_districts))
+    cell_days = (cell_days + first_day).astype('datetime64[D]')
+    cells = calendar_features(np.asarray(districts)[cell_districts], cell_days, cell_hours)
+    cells.insert(0, 'day', cell_days)
+    cells[TARGET] = counts
+    return cells
 
 class PoliceResourceOptimizer:
-    def __init__(self):
+    """
+    Plan de déploiement prédit par le modèle de demande (arrêts par district et
+    par heure), entraîné hors ligne (train_model.py) et enregistré dans le
+    registre des modèles. Le dashboard charge le modèle une fois par processus
+    (voir deployment_optimizer) : aucune instanciation par requête.
+
+    Args:
+        model: estimateur scikit-learn entraîné (None avant fit)
+        profiles: durée et score moyens de chaque district sur l'historique
+        metadata: métadonnées d'entraînement (données, features, métriques)
+    """
+
+    def __init__(self, model=None, profiles=None, metadata=None):
         self.total_officers = 4000  # Nombre total d'officiers disponibles
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42
-        )
-        self.scaler = StandardScaler()
-        self.le = LabelEncoder()
+        self.model = model
+        self.profiles = profiles
+        self.metadata = metadata or {}
         
     def prepare_features(self, df):
         """Préparation des caractéristiques pour la prédiction"""
         # Création de features temporelles
-        df_features = pd.DataFrame()
-        df_features['hour'] = df['DATETIME'].dt.hour
-        df_features['day_of_week'] = df['DATETIME'].dt.dayofweek
-        df_features['month'] = df['DATETIME'].dt.month
-        df_features['is_weekend'] = df['DATETIME'].dt.dayofweek.isin([5, 6]).astype(int)
-        df_features['is_night'] = ((df['DATETIME'].dt.hour >= 22) | 
-                                 (df['DATETIME'].dt.hour <= 5)).astype(int)
+        # (calculées en une passe depuis l'epoch plutôt qu'un accesseur .dt par feature)
+        parts = datetime_parts(df['DATETIME'])
+        df_features = pd.DataFrame(index=df.index)
+        df_features['hour'] = parts['hour']
+        df_features['day_of_week'] = parts['dayofweek']
+        df_features['month'] = parts['month']
+        df_features['is_weekend'] = (parts['dayofweek'] >= 5).astype(int)
+        df_features['is_night'] = ((parts['hour'] >= 22) | 
+                                 (parts['hour'] <= 5)).astype(int)
         
         # Agrégation par district et période
-        district_stats = df.groupby('STOP_DISTRICT').agg({
-            'CCN_ANONYMIZED': 'count',  # Nombre d'interventions
-            'STOP_DURATION_MINS': 'mean',  # Durée moyenne
-            'intervention_score': 'mean'  # Score moyen d'intervention
-        }).reset_index()
+        district_stats = group_metrics(df, ['STOP_DISTRICT'], list(DISTRICT_METRICS)).rename(
+            columns=DISTRICT_METRICS).reset_index()
         
         return district_stats, df_features
     
     def predict_resource_needs(self, df):
         """Prédiction des besoins en ressources par district et période"""
-        district_stats, time_features = self.prepare_features(df)
-        
-        # Calcul des besoins en personnel
-        resources_needed = pd.DataFrame()
-        for district in district_stats['STOP_DISTRICT'].unique():
-            district_data = district_stats[district_stats['STOP_DISTRICT'] == district]
-            
-            # Calcul du nombre d'agents nécessaires
-            base_officers = np.ceil(district_data['CCN_ANONYMIZED'] * 
-                                  district_data['STOP_DURATION_MINS'] / (8 * 60))  # 8h de travail
-            
-            # Ajustement selon la gravité
-            adjusted_officers = base_officers * (1 + district_data['intervention_score'] / 10)
-            
-            resources_needed = pd.concat([resources_needed, pd.DataFrame({
-                'STOP_DISTRICT': district,
-                'officers_needed': adjusted_officers.values[0],
-                'patrol_cars': np.ceil(adjusted_officers.values[0] / 2),  # 2 officiers par voiture
-                'priority_level': district_data['intervention_score'].values[0]
-            }, index=[0])], ignore_index=True)
-        
-        return resources_needed
+        district_stats = group_metrics(df, ['STOP_DISTRICT'], list(DISTRICT_METRICS))
+        return resource_needs(district_stats)
+
+    def fit(self, df):
+        """
+        Entraîne le modèle de demande sur l'historique des arrêts : évalué sur les
+        VALIDATION_DAYS derniers jours, puis réentraîné sur tout l'historique
+
+        Returns:
+            dict: métriques de validation (erreurs par cellule horaire et par district-jour)
+        """
+        # scikit-learn est long à importer : chargé à l'entraînement, pas au démarrage du serveur
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        from sklearn.metrics import mean_absolute_error, mean_poisson_deviance, mean_squared_error
+
+        cells = hourly_demand(df)
+        validation = (cells['day'] > cells['day'].max() - np.timedelta64(VALIDATION_DAYS, 'D')).to_numpy()
+        metrics = {}
+        if validation.any() and not validation.all():
+            model = HistGradientBoostingRegressor(**MODEL_PARAMS)
+            model.fit(cells.loc[~validation, FEATURES], cells.loc[~validation, TARGET])
+            actual = cells.loc[validation, TARGET].to_numpy()
+            predicted = model.predict(cells.loc[validation, FEATURES])
+            daily = cells.loc[validation, ['day', 'STOP_DISTRICT']].assign(actual=actual, predicted=predicted)
+            daily = daily.groupby(['day', 'STOP_DISTRICT'])[['actual', 'predicted']].sum()
+            metrics = {
+                'validation_days': VALIDATION_DAYS,
+                'hourly_mae': float(mean_absolute_error(actual, predicted)),
+                'hourly_rmse': float(np.sqrt(mean_squared_error(actual, predicted))),
+                'hourly_poisson_deviance': float(mean_poisson_deviance(actual, predicted)),
+                'daily_district_mae': float(mean_absolute_error(daily['actual'], daily['predicted'])),
+                'daily_district_mean': float(daily['actual'].mean()),
+            }
+
+        self.model = HistGradientBoostingRegressor(**MODEL_PARAMS).fit(cells[FEATURES], cells[TARGET])
+        profiles = group_metrics(df, ['STOP_DISTRICT'], ['duration_mean', 'score_mean'])
+        profiles.index = profiles.index.astype('float64')
+        self.profiles = profiles
+        self.metadata = {
+            'features': FEATURES,
+            'target': TARGET,
+            'params': MODEL_PARAMS,
+            'rows': len(df),
+            'cells': len(cells),
+            'start_date': cells['day'].min().date().isoformat(),
+            'end_date': cells['day'].max().date().isoformat(),
+            'metrics': metrics,
+        }
+        return metrics
+
+    def save(self, registry, data_version):
+        """Enregistre le modèle entraîné dans le registre ; retourne la version écrite"""
+        import sklearn
+
+        artifact = {'model': self.model, 'profiles': self.profiles}
+        return registry.save(artifact, dict(self.metadata, data_version=data_version,
+                                            sklearn_version=sklearn.__version__))
+
+    @classmethod
+    def load(cls, registry, version=None):
+        """Optimiseur d'une version du registre (la plus récente par défaut), None si le registre est vide"""
+        artifact, metadata = registry.load(version)
+        if artifact is None:
+            return None
+        return cls(artifact['model'], artifact['profiles'], metadata)
 
     def optimize_distribution(self, predictions):
         """Optimise la répartition des 4000 officiers disponibles"""
@@ -72,17 +219,72 @@ class PoliceResourceOptimizer:
         # Arrondir à l'entier le plus proche
         return np.round(optimized_distribution).astype(int)
 
-    def predict_today(self, data):
-        # ... existing code ...
-        raw_predictions = self.model.predict(donnees_actuelles)
-        
+    def predict_today(self, day=None):
+        """
+        Besoins prédits pour un jour (aujourd'hui par défaut) et répartition des
+        officiers disponibles entre les districts
+
+        Returns:
+            pd.DataFrame: colonnes de resource_needs, plus 'date', 'predicted_stops'
+            (arrêts prédits sur la journée) et 'officers_assigned'
+        """
+        if self.model is None:
+            raise ValueError("Modèle non entraîné : lancer train_model.py")
+        day = pd.Timestamp(day if day is not None else pd.Timestamp.now()).normalize()
+        districts = self.profiles.index.to_numpy()
+        # Données du jour : une cellule par district et par heure
+        donnees_actuelles = calendar_features(np.repeat(districts, 24), np.datetime64(day.date(), 'D'),
+                                              np.tile(np.arange(24), len(districts)))
+        raw_predictions = self.model.predict(donnees_actuelles[FEATURES])
+        daily_stops = raw_predictions.reshape(len(districts), 24).sum(axis=1)
+
+        resources = resource_needs(self.profiles.assign(count=daily_stops))
+        resources.insert(0, 'date', day)
+        resources['predicted_stops'] = daily_stops
         # Optimiser la distribution pour 4000 officiers
-        optimized_predictions = self.optimize_distribution(raw_predictions)
-        
-        return optimized_predictions
+        resources['officers_assigned'] = self.optimize_distribution(resources['officers_needed'].to_numpy())
+        return resources
 
-def create_deployment_visualization(resources_df, DISTRICT_COORDINATES):
-    """Création de la visualisation du plan de déploiement"""
+# Modèle servi par le processus : chargé une fois, partagé par les threads et les jobs forkés
+_optimizer = None
+_optimizer_version = None
+_optimizer_loaded = False
+_optimizer_lock = threading.Lock()
+
+def deployment_optimizer(registry=None, refresh=False):
+    """
+    Optimiseur du modèle le plus récent du registre, chargé une seule fois par
+    processus (tableaux projetés en mémoire, partagés entre workers) ; None si
+    aucun modèle n'a été entraîné.
+
+    Args:
+        registry: registre des modèles (ModelRegistry() par défaut)
+        refresh: recharge si une version plus récente a été enregistrée depuis
+    """
+    global _optimizer, _optimizer_version, _optimizer_loaded
+    with _optimizer_lock:
+        if _optimizer_loaded and not refresh:
+            return _optimizer
+        registry = registry or ModelRegistry()
+        version = registry.latest()
+        if not _optimizer_loaded or version != _optimizer_version:
+            try:
+                _optimizer = PoliceResourceOptimizer.load(registry, version) if version else None
+            except Exception as e:
+                # Modèle illisible (par exemple écrit par une autre version de scikit-learn) :
+                # le plan de déploiement reste servi, sans prévision
+                logging.error(f"Échec du chargement du modèle {version} : {e}")
+                _optimizer = None
+            _optimizer_version = version
+            _optimizer_loaded = True
+        return _optimizer
+
+def deployment_model_version():
+    """Version du registre servie par deployment_optimizer (None sans modèle)"""
+    return _optimizer_version
+
+def create_deployment_skeletons():
+    """Squelettes des figures du plan de déploiement : mise en page et traces vides"""
     from plotly.subplots import make_subplots
     import plotly.graph_objects as go
     
@@ -91,45 +293,24 @@ def create_deployment_visualization(resources_df, DISTRICT_COORDINATES):
                        subplot_titles=("Répartition des Officiers par District",
                                      "Besoins en Véhicules",
                                      "Niveaux de Priorité",
-                                     ""))
+                                     "Répartition prévue par le modèle"))
     
     # Graphique des officiers par district
-    fig1.add_trace(
-        go.Bar(x=resources_df['STOP_DISTRICT'],
-               y=resources_df['officers_needed'],
-               name="Officiers nécessaires"),
-        row=1, col=1
-    )
+    fig1.add_trace(go.Bar(name="Officiers nécessaires"), row=1, col=1)
     
     # Graphique des véhicules
-    fig1.add_trace(
-        go.Bar(x=resources_df['STOP_DISTRICT'],
-               y=resources_df['patrol_cars'],
-               name="Véhicules de patrouille"),
-        row=1, col=2
-    )
+    fig1.add_trace(go.Bar(name="Véhicules de patrouille"), row=1, col=2)
     
     # Niveaux de priorité
-    fig1.add_trace(
-        go.Heatmap(
-            z=resources_df['priority_level'].values.reshape(1, -1),
-            x=resources_df['STOP_DISTRICT'],
-            y=['Priorité'],
-            colorscale='RdYlGn_r'),
-        row=2, col=1
-    )
+    fig1.add_trace(go.Heatmap(y=['Priorité'], colorscale='RdYlGn_r'), row=2, col=1)
+    
+    # Officiers répartis selon la demande prédite (modèle du registre)
+    fig1.add_trace(go.Bar(name="Officiers prévus"), row=2, col=2)
     
     # Figure 2: La carte
     fig2 = go.Figure(go.Scattermapbox(
-        lat=[DISTRICT_COORDINATES[d]['lat'] for d in resources_df['STOP_DISTRICT']],
-        lon=[DISTRICT_COORDINATES[d]['lon'] for d in resources_df['STOP_DISTRICT']],
         mode='markers+text',
-        marker=dict(
-            size=resources_df['officers_needed'] * 2,
-            color=resources_df['priority_level'],
-            colorscale='RdYlGn_r'
-        ),
-        text=resources_df['officers_needed'].round().astype(int).astype(str) + ' officiers',
+        marker=dict(colorscale='RdYlGn_r'),
         name="Déploiement"
     ))
     
@@ -150,8 +331,46 @@ def create_deployment_visualization(resources_df, DISTRICT_COORDINATES):
         title_text="Analyse du Plan de Déploiement"
     )
     
-    # Retourner les deux figures dans un dictionnaire
     return {
         'analytics': fig1,
         'map': fig2
-    } 
\ No newline at end of file
+    }
+
+def forecast_trace(forecast):
+    """Trace de la répartition prévue (predict_today), vide si aucun modèle n'est entraîné"""
+    if forecast is None:
+        return dict(x=[], y=[], name="Officiers prévus (aucun modèle entraîné)")
+    return dict(x=list(forecast['STOP_DISTRICT']), y=forecast['officers_assigned'].to_numpy(),
+                name=f"Officiers prévus le {forecast['date'].iloc[0]:%d/%m/%Y}")
+
+def deployment_traces(resources_df, DISTRICT_COORDINATES, forecast=None):
+    """Données des traces du plan de déploiement, dans l'ordre des squelettes"""
+    districts = list(resources_df['STOP_DISTRICT'])
+    return {
+        'analytics': [
+            dict(x=districts, y=resources_df['officers_needed'].to_numpy()),
+            dict(x=districts, y=resources_df['patrol_cars'].to_numpy()),
+            dict(x=districts, z=resources_df['priority_level'].to_numpy().reshape(1, -1)),
+            forecast_trace(forecast),
+        ],
+        'map': [dict(
+            lat=[DISTRICT_COORDINATES[d]['lat'] for d in districts],
+            lon=[DISTRICT_COORDINATES[d]['lon'] for d in districts],
+            marker=dict(
+                size=(resources_df['officers_needed'] * 2).to_numpy(),
+                color=resources_df['priority_level'].to_numpy()
+            ),
+            text=list(resources_df['officers_needed'].round().astype(int).astype(str) + ' officiers')
+        )],
+    }
+
+def create_deployment_visualization(resources_df, DISTRICT_COORDINATES, forecast=None):
+    """Création de la visualisation du plan de déploiement"""
+    figures = create_deployment_skeletons()
+    traces = deployment_traces(resources_df, DISTRICT_COORDINATES, forecast)
+    for name, fig in figures.items():
+        for trace, values in zip(fig.data, traces[name]):
+            trace.update(values)
+    
+    # Retourner les deux figures dans un dictionnaire
+    return figures
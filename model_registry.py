@@ -0,0 +1,124 @@
+# model_registry.py
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou, l'écriture reste atomique
+    fcntl = None
+
+# Modèles entraînés hors ligne (train_model.py), une version par répertoire
+MODEL_REGISTRY_DIR = os.environ.get('DASHBOARD_MODEL_REGISTRY', 'model_registry')
+MODEL_NAME = 'model.joblib'
+META_NAME = 'metadata.json'
+LOCK_NAME = '.lock'
+VERSION_PATTERN = re.compile(r'^model-(\d+)$')
+
+
+class ModelRegistry:
+    """
+    Registre versionné des modèles : chaque version est un répertoire
+    model-NNNN contenant le modèle sérialisé par joblib et ses métadonnées
+    JSON (version des données d'entraînement, features, métriques), lisibles
+    sans charger le modèle.
+
+    Comme le ColumnStore, une version est écrite dans un répertoire
+    temporaire puis renommée : un lecteur ne voit jamais un modèle incomplet.
+    Les tableaux du modèle sont ouverts en projection mémoire et en lecture
+    seule : les processus qui chargent la même version en partagent une
+    seule copie physique.
+
+    Args:
+        root: répertoire du registre
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def versions(self):
+        """Versions complètes du registre, de la plus ancienne à la plus récente"""
+        if not os.path.isdir(self.root):
+            return []
+        numbered = []
+        for name in os.listdir(self.root):
+            match = VERSION_PATTERN.match(name)
+            if match and os.path.exists(os.path.join(self.root, name, META_NAME)):
+                numbered.append((int(match.group(1)), name))
+        return [name for _, name in sorted(numbered)]
+
+    def latest(self):
+        """Version la plus récente, None si le registre est vide"""
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def save(self, model, metadata):
+        """
+        Enregistre un modèle sous une nouvelle version.
+
+        Args:
+            model: objet sérialisable par joblib
+            metadata: dictionnaire JSON (la version et la date d'écriture y sont ajoutées)
+        Returns:
+            str: version écrite
+        """
+        import joblib
+
+        with self._locked():
+            versions = self.versions()
+            number = int(VERSION_PATTERN.match(versions[-1]).group(1)) + 1 if versions else 1
+            version = f"model-{number:04d}"
+            tmp_dir = os.path.join(self.root, f".{version}.{os.getpid()}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            # Sans compression : joblib ne projette en mémoire que les tableaux non compressés
+            joblib.dump(model, os.path.join(tmp_dir, MODEL_NAME))
+            metadata = dict(metadata, version=version, created_at=datetime.now(timezone.utc).isoformat())
+            with open(os.path.join(tmp_dir, META_NAME), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_dir, self.path(version))
+        return version
+
+    def metadata(self, version=None):
+        """Métadonnées d'une version (la plus récente par défaut), None si elle n'existe pas"""
+        version = version or self.latest()
+        if version is None:
+            return None
+        try:
+            with open(os.path.join(self.path(version), META_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, version=None):
+        """
+        Charge une version (la plus récente par défaut), tableaux projetés en mémoire.
+
+        Returns:
+            (modèle, métadonnées), ou (None, None) si le registre est vide
+        """
+        import joblib
+
+        version = version or self.latest()
+        if version is None:
+            return None, None
+        metadata = self.metadata(version)
+        return joblib.load(os.path.join(self.path(version), MODEL_NAME), mmap_mode='r'), metadata
@@ -0,0 +1,519 @@
+# query_backend.py
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from cube import period_days
+from filter_index import FilterIndex
+from fork_safety import fork_safe
+from group_metrics import (FLAG_COLUMNS, MEAN_COLUMNS, TYPE_DISTRIBUTION, group_metrics, measure_names,
+                           metric_frame)
+from instrumentation import stage
+from Pipelines.src.schema import DAYS_ORDER, INTERVENTION_TYPES, SEASONS
+from reason_index import STOP_REASON_COLUMNS, reason_totals
+
+# Moteur des requêtes du dashboard : 'pandas' (données en mémoire, cube) ou 'duckdb'
+# (fichiers Parquet interrogés sur disque, pour les volumes qui ne tiennent pas en mémoire)
+BACKEND_ENV = 'DASHBOARD_BACKEND'
+BACKENDS = ('pandas', 'duckdb')
+# Réglages de DuckDB : threads (0 = un par cœur), plafond mémoire (ex. '4GB', défaut de DuckDB
+# sinon) et répertoire où les agrégations qui dépassent ce plafond débordent sur disque
+DUCKDB_THREADS = int(os.environ.get('DASHBOARD_DUCKDB_THREADS', 0))
+DUCKDB_MEMORY_LIMIT = os.environ.get('DASHBOARD_DUCKDB_MEMORY_LIMIT')
+DUCKDB_TEMP_DIR = os.environ.get('DASHBOARD_DUCKDB_TEMP_DIR', 'duckdb_tmp')
+
+# Ordre des valeurs des clés catégorielles (les autres clés sont triées)
+KEY_ORDERS = {
+    'day_of_week': DAYS_ORDER,
+    'intervention_type': INTERVENTION_TYPES,
+    'season': SEASONS,
+}
+# Suffixe des colonnes de demi-largeur d'intervalle de confiance ajoutées par les moteurs
+# approchés (approximate.py) à côté des moyennes et des taux
+CI_SUFFIX = '_ci'
+MONTHLY_COLUMNS = ['month_year', 'STOP_DISTRICT', 'ARREST_CHARGES', 'STOP_DURATION_MINS', 'intervention_score']
+
+
+def selected_backend():
+    """Nom du moteur choisi par DASHBOARD_BACKEND"""
+    name = os.environ.get(BACKEND_ENV, 'pandas')
+    if name not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} doit valoir {' ou '.join(BACKENDS)}, pas {name!r}")
+    return name
+
+
+class QueryBackend(ABC):
+    """
+    Filtrage et agrégation des données du dashboard, indépendamment de leur
+    stockage. Les figures ne reçoivent que des résultats agrégés.
+
+    Un moteur fournit les primitives (select, aggregate, value_counts,
+    histogram, histogram2d) ; les agrégats des figures en sont déduits et
+    peuvent être remplacés par un calcul plus direct (cube).
+    """
+
+    @abstractmethod
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        """Requête correspondant aux filtres du dashboard (liste vide : pas de filtre)"""
+
+    @abstractmethod
+    def aggregate(self, query, keys, metrics):
+        """Indicateurs par groupe, au format de group_metrics.group_metrics"""
+
+    @abstractmethod
+    def value_counts(self, query, columns, top=None):
+        """Occurrences des valeurs renseignées des colonnes réunies, des plus fréquentes aux moins fréquentes"""
+
+    @abstractmethod
+    def histogram(self, query, column, bins):
+        """(comptages, bornes) comme np.histogram sur les valeurs renseignées, None si aucune"""
+
+    @abstractmethod
+    def histogram2d(self, query, x, y, bins, y_quantile=None):
+        """
+        (comptages, bornes x, bornes y) comme np.histogram2d sur les lignes où
+        x et y sont renseignés, None si aucune ; y est plafonné à son centile
+        y_quantile
+        """
+
+    def reason_counts(self, query, combinations=False, top=None):
+        """
+        Raisons d'arrêt les plus fréquentes, toutes colonnes de raisons confondues :
+        chaque raison d'une valeur à raisons multiples est comptée, ou chaque
+        combinaison complète si combinations (voir reason_index.py)
+        """
+        return reason_totals(self.value_counts(query, STOP_REASON_COLUMNS), combinations, top)
+
+    def district_counts(self, query):
+        """Nombre d'arrêts par district, comme value_counts()"""
+        counts = self.aggregate(query, ['STOP_DISTRICT'], ['count'])['count']
+        counts.index = counts.index.astype('float64').rename(None)
+        return counts.sort_values(ascending=False)
+
+    def global_stats(self, query):
+        """Nombre d'arrêts, durée moyenne, taux d'arrestation et de verbalisation"""
+        totals = self.aggregate(query, [], ['count', 'duration_mean', 'arrest_rate', 'ticket_rate'])
+        if totals.empty:
+            return {'total_stops': 0, 'avg_duration': np.nan, 'arrest_rate': np.nan, 'ticket_rate': np.nan}
+        total = totals.iloc[0]
+        stats = {'total_stops': int(total['count'])}
+        for name, metric in (('avg_duration', 'duration_mean'), ('arrest_rate', 'arrest_rate'),
+                             ('ticket_rate', 'ticket_rate')):
+            stats[name] = total[metric]
+            if metric + CI_SUFFIX in total:
+                stats[name + CI_SUFFIX] = total[metric + CI_SUFFIX]
+        return stats
+
+    def hourly_stats(self, query):
+        """Statistiques par heure, au format de utils.get_hourly_stats plus le nombre d'arrêts"""
+        stats = self.aggregate(query, ['hour'], ['count', 'duration_mean', 'score_mean', 'arrest_rate',
+                                                 'ticket_rate'])
+        stats.index = stats.index.astype('int64')
+        names = {
+            'count': "Nombre d'interventions",
+            'duration_mean': 'Durée moyenne (min)',
+            'score_mean': 'Score intervention',
+            'arrest_rate': 'Taux arrestation (%)',
+            'ticket_rate': 'Taux verbalisation (%)',
+        }
+        names.update({metric + CI_SUFFIX: f"IC {name}" for metric, name in names.items()})
+        return stats.rename(columns=names).round(2)
+
+    def type_counts(self, query):
+        """Nombre d'arrêts par type d'intervention, comme value_counts()"""
+        counts = self.aggregate(query, ['intervention_type'], ['count'])['count']
+        return counts.rename_axis(None).sort_values(ascending=False)
+
+    def hour_weekday_counts(self, query):
+        """Tableau croisé heure x jour de la semaine"""
+        counts = self.aggregate(query, ['hour', 'day_of_week'], ['count'])['count']
+        table = pd.DataFrame(0, index=pd.Index(np.arange(24), name='hour'), columns=DAYS_ORDER)
+        for (hour, day), count in counts.items():
+            table.at[int(hour), day] = count
+        return table[table.sum(axis=1) > 0]
+
+    def weekday_type_counts(self, query):
+        """Tableau croisé jour de la semaine x type d'intervention"""
+        counts = self.aggregate(query, ['day_of_week'], [TYPE_DISTRIBUTION])
+        table = counts.reindex(DAYS_ORDER, fill_value=0)[INTERVENTION_TYPES]
+        table.index.name = 'day_of_week'
+        table.columns = pd.Index(INTERVENTION_TYPES, name='intervention_type')
+        return table.loc[:, table.sum() > 0]
+
+    def ethnicity_stats(self, query):
+        """Par ethnicité : nombre d'arrêts, durée moyenne, taux d'arrestation et répartition des types (%)"""
+        groups = self.aggregate(query, ['ETHNICITY'], ['count', 'duration_mean', 'arrest_rate', TYPE_DISTRIBUTION])
+        groups.index = pd.Index(groups.index.astype(object), name='ETHNICITY')
+        by_type = groups[INTERVENTION_TYPES]
+        shares = by_type.div(groups['count'], axis=0) * 100
+        shares.columns = pd.Index(INTERVENTION_TYPES, name='intervention_type')
+        columns = [column for column in groups.columns if column.split(CI_SUFFIX)[0] in
+                   ('count', 'duration_mean', 'arrest_rate')]
+        return groups[columns], shares.loc[:, by_type.sum() > 0]
+
+    def monthly_stats(self, query):
+        """Par mois : nombre d'arrêts, taux d'arrestation, durée et score moyens"""
+        monthly = self.aggregate(query, ['year', 'month'], ['count', 'arrest_rate', 'duration_mean', 'score_mean'])
+        if monthly.empty:
+            return pd.DataFrame(columns=MONTHLY_COLUMNS)
+        return pd.DataFrame({
+            'month_year': [f"{int(year):04d}-{int(month):02d}" for year, month in monthly.index],
+            'STOP_DISTRICT': monthly['count'].to_numpy(),
+            'ARREST_CHARGES': monthly['arrest_rate'].to_numpy(),
+            'STOP_DURATION_MINS': monthly['duration_mean'].to_numpy(),
+            'intervention_score': monthly['score_mean'].to_numpy(),
+        })
+
+
+def measure_columns(metrics):
+    """Colonnes lues pour calculer les indicateurs"""
+    columns = {'intervention_type'} if TYPE_DISTRIBUTION in metrics else set()
+    for name in measure_names(metrics):
+        if name in FLAG_COLUMNS:
+            columns.add(FLAG_COLUMNS[name])
+        elif name != 'count':
+            columns.add(MEAN_COLUMNS[name.rsplit('_', 1)[0]])
+    return sorted(columns)
+
+
+class PandasQuery:
+    """Filtres traduits en requête du cube ; lignes sélectionnées par l'index, à la première demande"""
+
+    def __init__(self, filters, cube_query):
+        self.filters = filters
+        self.cube_query = cube_query
+        self.selection = None
+
+
+class PandasBackend(QueryBackend):
+    """
+    Données en mémoire : agrégats des figures lus dans le cube, raisons
+    d'arrêt comptées par l'index des raisons, autres requêtes calculées sur
+    les lignes sélectionnées par l'index de filtrage.
+
+    Args:
+        df: lignes triées par date
+        index: FilterIndex de df
+        cube: StopCube de df
+        reasons: ReasonIndex de df (raisons découpées à chaque requête si None)
+    """
+
+    def __init__(self, df, index, cube, reasons=None):
+        self.df = df
+        self.index = index
+        self.cube = cube
+        self.reasons = reasons
+
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        filters = (start_date, end_date, selected_districts, selected_types)
+        return PandasQuery(filters, self.cube.select(*filters))
+
+    def selection(self, query):
+        """Lignes sélectionnées par l'index (tranche ou numéros de lignes)"""
+        # Sélection partagée par les figures de la requête (calculée au pire une fois par thread)
+        if query.selection is None:
+            query.selection = self.index.select(*query.filters)
+        return query.selection
+
+    def rows(self, query, columns=None):
+        """Lignes filtrées : tranche de dates (vue sans copie) ou copie des colonnes demandées"""
+        with stage('filter_rows') as current:
+            selection = self.selection(query)
+            if isinstance(selection, slice):
+                columns = None
+            rows = FilterIndex.rows(self.df, selection, columns)
+            current.rows = len(rows)
+        return rows
+
+    def aggregate(self, query, keys, metrics):
+        columns = list(keys) + [column for column in measure_columns(metrics) if column not in keys]
+        return group_metrics(self.rows(query, columns), keys, metrics)
+
+    def value_counts(self, query, columns, top=None):
+        rows = self.rows(query, columns)
+        counts = pd.concat([rows[column].dropna() for column in columns]).value_counts()
+        # À égalité, par ordre alphabétique comme DuckDB : mêmes valeurs retenues par top
+        counts = counts.sort_index(kind='stable').sort_values(ascending=False, kind='stable')
+        return counts if top is None else counts.head(top)
+
+    def reason_counts(self, query, combinations=False, top=None):
+        if self.reasons is None:
+            return super().reason_counts(query, combinations, top)
+        with stage('reason_counts') as current:
+            selection = self.selection(query)
+            current.rows = selection.stop - selection.start if isinstance(selection, slice) else len(selection)
+            return self.reasons.counts(selection, combinations, top)
+
+    def histogram(self, query, column, bins):
+        values = pd.to_numeric(self.rows(query, [column])[column], errors='coerce').dropna().to_numpy()
+        if len(values) == 0:
+            return None
+        return np.histogram(values, bins=bins)
+
+    def histogram2d(self, query, x, y, bins, y_quantile=None):
+        rows = self.rows(query, [x, y])
+        x_values = pd.to_numeric(rows[x], errors='coerce')
+        y_values = pd.to_numeric(rows[y], errors='coerce')
+        both = (x_values.notna() & y_values.notna()).to_numpy()
+        if not both.any():
+            return None
+        x_values, y_values = x_values.to_numpy()[both], y_values.to_numpy()[both]
+        if y_quantile is not None:
+            y_values = np.minimum(y_values, float(np.quantile(y_values, y_quantile)))
+        return np.histogram2d(x_values, y_values, bins=bins)
+
+    # Agrégats des figures : sommes cumulées du cube, sans parcourir les lignes
+    def district_counts(self, query):
+        return self.cube.district_counts(query.cube_query)
+
+    def global_stats(self, query):
+        return self.cube.global_stats(query.cube_query)
+
+    def hourly_stats(self, query):
+        return self.cube.hourly_stats(query.cube_query)
+
+    def type_counts(self, query):
+        return self.cube.type_counts(query.cube_query)
+
+    def hour_weekday_counts(self, query):
+        return self.cube.hour_weekday_counts(query.cube_query)
+
+    def weekday_type_counts(self, query):
+        return self.cube.weekday_type_counts(query.cube_query)
+
+    def ethnicity_stats(self, query):
+        return self.cube.ethnicity_stats(query.cube_query)
+
+    def monthly_stats(self, query):
+        return self.cube.monthly_stats(query.cube_query)
+
+
+def _identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Mesure de group_metrics -> expression SQL (sommes des valeurs renseignées, lignes renseignées)
+MEASURE_SQL = {'count': 'count(*)'}
+for _prefix, _column in MEAN_COLUMNS.items():
+    MEASURE_SQL[f'{_prefix}_sum'] = f'sum(CAST({_identifier(_column)} AS DOUBLE))'
+    MEASURE_SQL[f'{_prefix}_n'] = f'count({_identifier(_column)})'
+for _name, _column in FLAG_COLUMNS.items():
+    MEASURE_SQL[_name] = f'count({_identifier(_column)})'
+
+
+class DuckDBQuery:
+    """Filtres traduits en clause WHERE et ses paramètres"""
+
+    def __init__(self, where, params):
+        self.where = where
+        self.params = params
+
+
+class DuckDBBackend(QueryBackend):
+    """
+    Requêtes exécutées par DuckDB directement sur les fichiers Parquet
+    (partitions du store ou cache prétraité) : filtres et regroupements
+    sont poussés au moteur, qui ne lit que les colonnes et groupes de lignes
+    utiles, calcule sur plusieurs threads et déborde sur disque au-delà de
+    son plafond mémoire. Aucune donnée n'est chargée dans le processus.
+
+    Args:
+        paths: fichiers Parquet au schéma du dataset prétraité
+        threads: threads de DuckDB (0 : un par cœur)
+        memory_limit: plafond mémoire de DuckDB (ex. '4GB'), défaut de DuckDB si None
+        temp_directory: répertoire de débordement sur disque
+    """
+
+    def __init__(self, paths, threads=DUCKDB_THREADS, memory_limit=DUCKDB_MEMORY_LIMIT,
+                 temp_directory=DUCKDB_TEMP_DIR):
+        # DuckDB n'est requis que par ce moteur
+        import duckdb
+        import pyarrow.parquet as pq
+
+        self._duckdb = duckdb
+        self.paths = [os.path.abspath(path) for path in paths]
+        if not self.paths:
+            raise FileNotFoundError("Aucun fichier Parquet à interroger")
+        self.config = {'temp_directory': temp_directory}
+        if threads:
+            self.config['threads'] = threads
+        if memory_limit:
+            self.config['memory_limit'] = memory_limit
+        # Fuseau des dates : les bornes des filtres sont interprétées comme dans FilterIndex
+        datetime_type = pq.read_schema(self.paths[0]).field('DATETIME').type
+        self.tz = getattr(datetime_type, 'tz', None)
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _files_sql(self):
+        return '[' + ', '.join(_literal(path) for path in self.paths) + ']'
+
+    def _connect(self):
+        # Une base par processus : un job forké n'hérite pas des threads internes de DuckDB
+        with self._lock:
+            if self._pid != os.getpid():
+                connection = self._duckdb.connect(config=self.config)
+                if self.tz is not None:
+                    connection.execute("SET TimeZone = 'UTC'")
+                connection.execute(f"CREATE VIEW stops AS SELECT * FROM read_parquet({self._files_sql()}, "
+                                   f"union_by_name = true)")
+                self._connection, self._pid = connection, os.getpid()
+            return self._connection
+
+    def query(self, sql, params=()):
+        """Résultat d'une requête SQL sur la vue `stops`, en DataFrame"""
+        # Exclue des forks comme SQLite ; un curseur par requête, les figures étant calculées en parallèle
+        with fork_safe(), stage('duckdb_query') as current:
+            cursor = self._connect().cursor()
+            try:
+                result = cursor.execute(sql, list(params)).df()
+            finally:
+                cursor.close()
+            current.rows = len(result)
+        return result
+
+    def _bound(self, value):
+        bound = pd.Timestamp(value)
+        if self.tz is not None:
+            if bound.tz is None:
+                bound = bound.tz_localize(self.tz)
+            bound = bound.tz_convert('UTC').tz_localize(None)
+        return bound.to_pydatetime()
+
+    def select(self, start_date, end_date, selected_districts, selected_types):
+        conditions, params = ['TRUE'], []
+        if start_date and end_date:
+            # Journée de fin comprise, comme FilterIndex.date_slice et StopCube.select
+            start, end = period_days(start_date, end_date, self.tz)
+            conditions.append('"DATETIME" >= ? AND "DATETIME" < ?')
+            params += [self._bound(start), self._bound(end)]
+        for column, values in (('STOP_DISTRICT', selected_districts), ('intervention_type', selected_types)):
+            if values:
+                conditions.append(f"{_identifier(column)} IN ({', '.join('?' * len(values))})")
+                params += list(values)
+        return DuckDBQuery(' AND '.join(conditions), params)
+
+    def aggregate(self, query, keys, metrics):
+        names = measure_names(metrics)
+        columns = [_identifier(key) for key in keys]
+        expressions = [f'{MEASURE_SQL[name]} AS {_identifier(name)}' for name in names]
+        if TYPE_DISTRIBUTION in metrics:
+            expressions += [f'count(*) FILTER (WHERE "intervention_type" = {_literal(value)}) AS {_identifier(value)}'
+                            for value in INTERVENTION_TYPES]
+        # Clé manquante : ligne exclue, comme dans group_metrics
+        where = ' AND '.join([query.where] + [f'{column} IS NOT NULL' for column in columns])
+        sql = f"SELECT {', '.join(columns + expressions)} FROM stops WHERE {where}"
+        if keys:
+            sql += f" GROUP BY {', '.join(columns)}"
+        groups = self.query(sql, query.params)
+        groups = groups[groups['count'] > 0]
+
+        if keys:
+            # Groupes ordonnés comme groupby : ordre du schéma pour les catégories, tri sinon
+            order = [pd.Categorical(groups[key], categories=KEY_ORDERS[key], ordered=True)
+                     if key in KEY_ORDERS else groups[key] for key in keys]
+            groups = groups.iloc[np.lexsort([np.asarray(level) if not isinstance(level, pd.Categorical)
+                                             else level.codes for level in reversed(order)])]
+        if not keys:
+            index = pd.RangeIndex(len(groups))
+        elif len(keys) == 1:
+            index = pd.Index(groups[keys[0]].to_numpy(), name=keys[0])
+        else:
+            index = pd.MultiIndex.from_arrays([groups[key].to_numpy() for key in keys], names=keys)
+        sums = {name: groups[name].to_numpy() for name in names}
+        by_type = groups[INTERVENTION_TYPES].to_numpy() if TYPE_DISTRIBUTION in metrics else None
+        return metric_frame(sums, metrics, index, by_type)
+
+    def value_counts(self, query, columns, top=None):
+        union = ' UNION ALL '.join(f'SELECT {_identifier(column)} AS value FROM stops WHERE {query.where}'
+                                   for column in columns)
+        sql = f"SELECT value, count(*) AS count FROM ({union}) WHERE value IS NOT NULL " \
+              f"GROUP BY value ORDER BY count DESC, value"
+        if top is not None:
+            sql += f" LIMIT {int(top)}"
+        counts = self.query(sql, query.params * len(columns))
+        return pd.Series(counts['count'].to_numpy(), index=pd.Index(counts['value'].astype(object)), name='count')
+
+    def _frequencies(self, query, columns):
+        """Valeurs distinctes des colonnes (toutes renseignées) et leur nombre de lignes"""
+        selected = ', '.join(_identifier(column) for column in columns)
+        where = ' AND '.join([query.where] + [f'{_identifier(column)} IS NOT NULL' for column in columns])
+        return self.query(f"SELECT {selected}, count(*) AS weight FROM stops WHERE {where} GROUP BY {selected}",
+                          query.params)
+
+    def histogram(self, query, column, bins):
+        # Le moteur ne renvoie qu'une table de fréquences : les classes sont celles de np.histogram
+        frequencies = self._frequencies(query, [column])
+        if frequencies.empty:
+            return None
+        counts, edges = np.histogram(frequencies[column].to_numpy(), bins=bins, weights=frequencies['weight'])
+        return counts.astype(np.int64), edges
+
+    def histogram2d(self, query, x, y, bins, y_quantile=None):
+        frequencies = self._frequencies(query, [x, y])
+        if frequencies.empty:
+            return None
+        x_values, y_values = frequencies[x].to_numpy(), frequencies[y].to_numpy()
+        weights = frequencies['weight'].to_numpy()
+        if y_quantile is not None:
+            y_values = np.minimum(y_values, weighted_quantile(y_values, weights, y_quantile))
+        counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=bins, weights=weights)
+        return counts.astype(np.int64), x_edges, y_edges
+
+    def stratified_sample(self, strata, fraction):
+        """
+        Échantillon stratifié tiré par DuckDB : ceil(fraction x effectif) lignes
+        de chaque strate, choisies par un hachage de leur position dans les
+        fichiers (même échantillon dans tous les processus). La colonne
+        stratum_rows donne l'effectif de la strate de chaque ligne.
+        """
+        keys = ', '.join(_identifier(column) for column in strata)
+        return self.query(
+            f"SELECT * EXCLUDE (filename, file_row_number, sample_rank) FROM ("
+            f"SELECT *, row_number() OVER (PARTITION BY {keys} ORDER BY hash(filename, file_row_number)) "
+            f"AS sample_rank, count(*) OVER (PARTITION BY {keys}) AS stratum_rows "
+            f"FROM read_parquet({self._files_sql()}, union_by_name = true, filename = true, "
+            f"file_row_number = true)) WHERE sample_rank <= ceil(? * stratum_rows)",
+            [fraction])
+
+    def summary(self):
+        """Bornes des dates et options des filtres, au format de utils.dataset_summary"""
+        bounds = self.query('SELECT min("DATETIME") AS start_date, max("DATETIME") AS end_date FROM stops')
+        districts = self.query('SELECT DISTINCT "STOP_DISTRICT" AS district FROM stops '
+                               'WHERE "STOP_DISTRICT" IS NOT NULL ORDER BY 1')
+        start, end = (pd.Timestamp(bounds.at[0, column]) for column in ('start_date', 'end_date'))
+        if self.tz is not None:
+            start, end = (bound.tz_convert(self.tz) if bound.tz else bound.tz_localize('UTC').tz_convert(self.tz)
+                          for bound in (start, end))
+        return {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'districts': [float(district) for district in districts['district']],
+            'intervention_types': list(INTERVENTION_TYPES),
+        }
+
+
+def weighted_quantile(values, weights, q):
+    """
+    Centile q de valeurs répétées chacune weights fois, avec l'interpolation
+    linéaire de np.quantile sur les valeurs répétées
+    """
+    order = np.argsort(values, kind='stable')
+    values, cumulative = values[order], np.cumsum(weights[order])
+    position = q * (cumulative[-1] - 1)
+    below = np.floor(position)
+    lower = values[np.searchsorted(cumulative, below, side='right')]
+    upper = values[np.searchsorted(cumulative, min(below + 1, cumulative[-1] - 1), side='right')]
+    fraction = position - below
+    # Même formule que np.quantile (numpy._lerp), pour un résultat identique au bit près
+    if fraction >= 0.5:
+        return float(upper - (upper - lower) * (1 - fraction))
+    return float(lower + (upper - lower) * fraction)
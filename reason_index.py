@@ -0,0 +1,170 @@
+# reason_index.py
+import os
+
+import numpy as np
+import pandas as pd
+
+# Colonnes des raisons d'arrêt ; une valeur peut citer plusieurs raisons séparées par REASON_DELIMITER
+STOP_REASON_COLUMNS = ['STOP_REASON_TICKET', 'STOP_REASON_NONTICKET', 'STOP_REASON_HARBOR']
+REASON_DELIMITER = os.environ.get('DASHBOARD_REASON_DELIMITER', ';')
+# Séparateur des raisons dans le libellé d'une combinaison
+COMBINATION_SEPARATOR = f'{REASON_DELIMITER.strip() or REASON_DELIMITER} '
+
+
+def split_reasons(value, delimiter=REASON_DELIMITER):
+    """Raisons distinctes citées par une valeur, dans leur ordre d'apparition"""
+    parts = (part.strip() for part in str(value).split(delimiter))
+    return list(dict.fromkeys(part for part in parts if part))
+
+
+class ReasonDictionary:
+    """
+    Dictionnaire des raisons d'un ensemble de valeurs de raisons : chaque
+    valeur est découpée une seule fois en raisons individuelles (matrice
+    creuse valeur x raison au format CSR, raisons codées en entiers) et en
+    combinaison (ensemble trié de ses raisons, codé en entier). Les
+    comptages par raison se déduisent des comptages par valeur.
+
+    Args:
+        values: valeurs distinctes (catégories des colonnes de raisons)
+        delimiter: séparateur des raisons dans une valeur
+    """
+
+    def __init__(self, values, delimiter=REASON_DELIMITER):
+        parsed = [split_reasons(value, delimiter) for value in values]
+        self.reasons = pd.Index(sorted({reason for reasons in parsed for reason in reasons}), dtype=object)
+        labels = [COMBINATION_SEPARATOR.join(sorted(reasons)) for reasons in parsed]
+        self.combinations = pd.Index(sorted(set(labels) - {''}), dtype=object)
+
+        lengths = np.array([len(reasons) for reasons in parsed], dtype=np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.indices = self.reasons.get_indexer([reason for reasons in parsed for reason in reasons])
+        # Valeur sans aucune raison (texte vide) : hors de toute combinaison
+        self.combination_codes = self.combinations.get_indexer(labels)
+
+    def to_arrays(self):
+        """
+        Dictionnaire sous forme enregistrable (voir ColumnStore.write).
+
+        Returns:
+            (métadonnées JSON, {nom: tableau CSR ou codes des combinaisons})
+        """
+        meta = {'reasons': self.reasons.tolist(), 'combinations': self.combinations.tolist()}
+        return meta, {'indptr': self.indptr, 'indices': self.indices, 'combination_codes': self.combination_codes}
+
+    @classmethod
+    def from_arrays(cls, meta, arrays):
+        """Dictionnaire déjà découpé (par exemple projeté depuis le ColumnStore)"""
+        dictionary = cls.__new__(cls)
+        dictionary.reasons = pd.Index(meta['reasons'], dtype=object)
+        dictionary.combinations = pd.Index(meta['combinations'], dtype=object)
+        dictionary.indptr = arrays['indptr']
+        dictionary.indices = arrays['indices']
+        dictionary.combination_codes = arrays['combination_codes']
+        return dictionary
+
+    def totals(self, value_counts, combinations=False, top=None):
+        """
+        Occurrences des raisons (ou des combinaisons) à partir des occurrences
+        de chaque valeur du dictionnaire : chaque valeur reporte son comptage
+        sur ses raisons (ou sa combinaison) en un np.bincount.
+
+        Returns:
+            pd.Series: comptages non nuls, des plus fréquents aux moins
+            fréquents (à égalité, par ordre alphabétique)
+        """
+        value_counts = np.asarray(value_counts, dtype=np.int64)
+        if combinations:
+            labels, codes, weights = self.combinations, self.combination_codes, value_counts
+            known = codes >= 0
+            codes, weights = codes[known], weights[known]
+        else:
+            labels, codes, weights = self.reasons, self.indices, np.repeat(value_counts, np.diff(self.indptr))
+        counts = np.bincount(codes, weights=weights, minlength=len(labels)).astype(np.int64)
+        present = np.flatnonzero(counts)
+        # Codes dans l'ordre alphabétique des libellés : tri stable par comptage décroissant
+        order = present[np.argsort(-counts[present], kind='stable')]
+        if top is not None:
+            order = order[:top]
+        return pd.Series(counts[order], index=labels[order], name='count')
+
+
+class ReasonIndex:
+    """
+    Index des raisons d'arrêt construit au chargement du dataset.
+
+    Chaque ligne est reliée à ses raisons par deux tables codées en entiers :
+    le code de catégorie de chaque colonne de raisons (déjà stocké par le
+    dataset, partagé en projection mémoire par le ColumnStore) et le
+    dictionnaire catégorie -> raisons (ReasonDictionary). Les raisons d'un
+    ensemble de lignes se comptent par un np.bincount des codes sélectionnés,
+    reporté sur les raisons, sans découper de texte.
+
+    Args:
+        df: lignes du dataset, colonnes de raisons catégorielles
+        columns: colonnes de raisons
+        delimiter: séparateur des raisons dans une valeur
+    """
+
+    def __init__(self, df, columns=STOP_REASON_COLUMNS, delimiter=REASON_DELIMITER):
+        values = self._set_codes(df, columns)
+        # Catégories de toutes les colonnes mises bout à bout : une valeur par catégorie de chaque colonne
+        self.dictionary = ReasonDictionary(values, delimiter)
+
+    def _set_codes(self, df, columns):
+        """Codes de catégorie de chaque colonne ; retourne les catégories mises bout à bout"""
+        self.codes = []
+        self.sizes = []
+        values = []
+        for column in columns:
+            values_column = df[column]
+            if not isinstance(values_column.dtype, pd.CategoricalDtype):
+                values_column = values_column.astype('category')
+            categories = values_column.cat.categories
+            self.codes.append(values_column.cat.codes.to_numpy())
+            self.sizes.append(len(categories))
+            values.extend(categories)
+        return values
+
+    @classmethod
+    def from_dictionary(cls, df, dictionary, columns=STOP_REASON_COLUMNS):
+        """
+        Index sur un dictionnaire déjà construit pour les catégories des
+        colonnes de df (par exemple lu depuis le ColumnStore)
+        """
+        index = cls.__new__(cls)
+        values = index._set_codes(df, columns)
+        if len(dictionary.indptr) != len(values) + 1:
+            raise ValueError("Le dictionnaire des raisons ne correspond pas aux catégories des colonnes")
+        index.dictionary = dictionary
+        return index
+
+    def value_counts(self, selection):
+        """Occurrences de chaque catégorie de chaque colonne parmi les lignes sélectionnées"""
+        parts = []
+        for codes, size in zip(self.codes, self.sizes):
+            # Décalage de 1 : les valeurs manquantes (-1) tombent dans la case 0, ignorée
+            selected = codes[selection].astype(np.intp)
+            selected += 1
+            parts.append(np.bincount(selected, minlength=size + 1)[1:])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def counts(self, selection, combinations=False, top=None):
+        """
+        Raisons (ou combinaisons de raisons) les plus fréquentes des lignes sélectionnées.
+
+        Args:
+            selection: tranche ou tableau de numéros de lignes (voir FilterIndex.select)
+            combinations: compter les combinaisons complètes plutôt que chaque raison
+            top: nombre de raisons conservées (toutes si None)
+        """
+        return self.dictionary.totals(self.value_counts(selection), combinations, top)
+
+
+def reason_totals(value_counts, combinations=False, top=None, delimiter=REASON_DELIMITER):
+    """
+    Raisons (ou combinaisons) les plus fréquentes à partir des occurrences des
+    valeurs brutes des colonnes de raisons (résultat de value_counts)
+    """
+    dictionary = ReasonDictionary(value_counts.index, delimiter)
+    return dictionary.totals(value_counts.to_numpy(), combinations, top)
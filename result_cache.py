@@ -0,0 +1,156 @@
+# result_cache.py
+import json
+import logging
+import pickle
+import sqlite3
+import time
+
+import pandas as pd
+
+from fork_safety import connect
+
+# Cache des résultats des callbacks, partagé par les workers du serveur
+RESULT_CACHE_PATH = 'result_cache.sqlite'
+RESULT_CACHE_MAX_MB = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_filters(start_date, end_date, selected_districts, selected_types):
+    """
+    Forme canonique des filtres : dates ISO, listes triées, liste vide
+    équivalente à « tous ».
+    """
+    def date(value):
+        return pd.Timestamp(value).isoformat() if value else None
+
+    def values(selected):
+        return sorted(selected) if selected else None
+
+    return date(start_date), date(end_date), values(selected_districts), values(selected_types)
+
+
+class ResultCache:
+    """
+    Cache LRU des résultats de callbacks dans une base SQLite locale, partagé
+    par tous les workers d'une même machine.
+
+    La clé combine le groupe de figures, la version du dataset et les filtres
+    normalisés : les résultats d'une ancienne version ne sont jamais servis,
+    et sont supprimés au rechargement (`invalidate`). La taille totale est
+    bornée : les entrées les moins récemment utilisées sont évincées. Une
+    erreur SQLite n'interrompt jamais un callback, elle est traitée comme un
+    défaut de cache.
+
+    Args:
+        path: fichier de la base
+        max_mb: taille maximale des résultats stockés, en MB
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_mb=RESULT_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return connect(self.path)
+
+    @staticmethod
+    def make_key(group, version, start_date, end_date, selected_districts, selected_types):
+        filters = normalize_filters(start_date, end_date, selected_districts, selected_types)
+        return json.dumps([group, version, *filters])
+
+    @staticmethod
+    def _count(conn, name, increment=1):
+        conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                     "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (name, increment))
+
+    def get(self, key):
+        """Résultat en cache pour la clé, ou None"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._count(conn, 'misses')
+                    return None
+                conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._count(conn, 'hits')
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            logging.warning(f"Lecture du cache de résultats impossible : {e}")
+            return None
+
+    def put(self, key, version, value):
+        """Stocke un résultat puis évince les entrées les plus anciennes au-delà de la taille maximale"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute("INSERT OR REPLACE INTO results (key, version, value, size, last_used) "
+                             "VALUES (?, ?, ?, ?, ?)", (key, version, blob, len(blob), time.time()))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                evicted = 0
+                for old_key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    total -= size
+                    evicted += 1
+                if evicted:
+                    self._count(conn, 'evictions', evicted)
+                conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            logging.warning(f"Écriture dans le cache de résultats impossible : {e}")
+
+    def invalidate(self, version):
+        """Supprime les résultats calculés sur une autre version du dataset"""
+        try:
+            with self._connect() as conn:
+                deleted = conn.execute("DELETE FROM results WHERE version != ?", (version,)).rowcount
+                if deleted:
+                    self._count(conn, 'invalidations', deleted)
+            logging.info(f"Cache de résultats : {deleted} entrées d'anciennes versions supprimées")
+        except sqlite3.Error as e:
+            logging.warning(f"Invalidation du cache de résultats impossible : {e}")
+
+    def stats(self):
+        """Compteurs partagés par tous les workers, pour régler la taille du cache"""
+        error = None
+        try:
+            with self._connect() as conn:
+                counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        except sqlite3.Error as e:
+            # Fichier verrouillé ou corrompu : compteurs à zéro plutôt qu'une erreur de la route
+            logging.warning(f"Lecture des compteurs du cache de résultats impossible : {e}")
+            counters, entries, size, error = {}, 0, 0, str(e)
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        stats = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+            'evictions': counters.get('evictions', 0),
+            'invalidations': counters.get('invalidations', 0),
+            'entries': entries,
+            'size_mb': size / 1024 ** 2,
+            'max_mb': self.max_bytes / 1024 ** 2,
+        }
+        if error is not None:
+            stats['error'] = error
+        return stats
@@ -0,0 +1,56 @@
+# tests/conftest.py
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_raw_stops
+from filter_index import sort_by_datetime
+from instrumentation import flush
+from Pipelines.src.preprocessing import preprocess_stops
+
+# Assez de lignes pour couvrir chaque district, type et raison ; assez peu pour rester rapide
+N_ROWS = 20_000
+# (début, fin, districts, types), comme les filtres du dashboard
+FILTERS = [
+    (None, None, None, None),
+    ('2020-01-01', '2021-06-30', None, None),
+    ('2020-01-01', '2021-06-30', [1.0, 5.0], None),
+    ('2019-06-01', '2022-06-30', [2.0], ['Arrestation', 'Contravention']),
+    ('2020-03-01T13:05:00', '2020-03-31T08:00:00+00:00', None, None),
+]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def metrics_path(tmp_path_factory):
+    """Mesures des étapes écrites hors du dépôt, y compris celles écrites à la sortie"""
+    path = str(tmp_path_factory.mktemp('metrics') / 'metrics.sqlite')
+    yield path
+    flush(path)
+
+
+@pytest.fixture(scope='session')
+def raw_stops():
+    """Données brutes synthétiques, identiques d'une exécution à l'autre"""
+    return make_raw_stops(N_ROWS, seed=0)
+
+
+@pytest.fixture(scope='session')
+def stops(raw_stops):
+    """Données prétraitées, triées par date comme dans le dashboard"""
+    return sort_by_datetime(preprocess_stops(raw_stops.copy()))
+
+
+def baseline_filter(df, start_date, end_date, selected_districts, selected_types):
+    """Filtrage d'origine du dashboard par masques booléens, journée de fin comprise"""
+    mask = pd.Series(True, index=df.index)
+    if start_date and end_date:
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        start = start.tz_localize(None) if start.tz is not None else start
+        end = end.tz_localize(None) if end.tz is not None else end
+        timestamps = df['DATETIME'].dt.tz_localize(None) if df['DATETIME'].dt.tz is not None else df['DATETIME']
+        mask &= (timestamps >= start.normalize()) & (timestamps < end.normalize() + pd.Timedelta(days=1))
+    if selected_districts:
+        mask &= df['STOP_DISTRICT'].isin(selected_districts)
+    if selected_types:
+        mask &= df['intervention_type'].isin(selected_types)
+    return df[mask]
@@ -0,0 +1,83 @@
+# tests/test_cube.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_store import ColumnStore
+from cube import StopCube, period_days
+from filter_index import FilterIndex
+from reason_index import ReasonIndex
+from tests.conftest import FILTERS, baseline_filter
+
+
+def baseline_hourly_stats(df):
+    """Statistiques horaires d'origine (utils.get_hourly_stats), plus le nombre d'arrêts"""
+    stats = df.groupby('hour', observed=True).agg(**{
+        "Nombre d'interventions": ('hour', 'size'),
+        'Durée moyenne (min)': ('STOP_DURATION_MINS', 'mean'),
+        'Score intervention': ('intervention_score', 'mean'),
+        'Taux arrestation (%)': ('ARREST_CHARGES', lambda x: x.notna().mean() * 100),
+        'Taux verbalisation (%)': ('TICKETS_ISSUED', lambda x: x.notna().mean() * 100),
+    }).round(2)
+    stats.index = stats.index.astype('int64')
+    return stats
+
+
+def assert_cube_matches(cube, df, filters):
+    query = cube.select(*filters)
+    expected = baseline_filter(df, *filters)
+
+    pd.testing.assert_series_equal(cube.district_counts(query).sort_index(),
+                                   expected['STOP_DISTRICT'].value_counts().sort_index(),
+                                   check_dtype=False, check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(cube.type_counts(query).sort_index(),
+                                   expected['intervention_type'].astype(str).value_counts().sort_index(),
+                                   check_dtype=False, check_names=False, check_index_type=False)
+    # Durées stockées en float32 : la moyenne pandas est calculée à cette précision
+    stats = cube.global_stats(query)
+    assert stats['total_stops'] == len(expected)
+    np.testing.assert_allclose(
+        [stats['avg_duration'], stats['arrest_rate'], stats['ticket_rate']],
+        [expected['STOP_DURATION_MINS'].mean(), expected['ARREST_CHARGES'].notna().mean() * 100,
+         expected['TICKETS_ISSUED'].notna().mean() * 100], rtol=1e-6)
+    # Valeurs arrondies au centième : une moyenne à mi-chemin peut être arrondie de part ou d'autre
+    pd.testing.assert_frame_equal(cube.hourly_stats(query), baseline_hourly_stats(expected),
+                                  check_dtype=False, check_index_type=False, check_exact=False, atol=0.0101)
+    table = cube.hour_weekday_counts(query)
+    table = table.loc[:, table.sum() > 0]
+    crosstab = pd.crosstab(expected['hour'].astype('int64'), expected['day_of_week'].astype(str))[table.columns]
+    pd.testing.assert_frame_equal(table, crosstab, check_dtype=False,
+                                  check_names=False, check_index_type=False, check_column_type=False)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_cube_sums(stops, filters):
+    assert_cube_matches(StopCube(stops), stops, filters)
+
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_cube_from_column_store(stops, tmp_path, filters):
+    # Sommes cumulées écrites avec les colonnes puis projetées en mémoire
+    store = ColumnStore(str(tmp_path))
+    store.write('v1', stops, FilterIndex(stops), StopCube(stops), ReasonIndex(stops))
+    df, _, cube, _ = store.open('v1')
+    assert isinstance(cube.by_hour.phases['count'][0], np.ndarray)
+    assert_cube_matches(cube, df, filters)
+
+
+def test_period_includes_end_day():
+    # Date de fin choisie au calendrier (minuit) ou avec une heure : toute la journée est comprise
+    day, next_day = pd.Timestamp('2020-03-31'), pd.Timestamp('2020-04-01')
+    assert period_days('2020-03-01', '2020-03-31') == (pd.Timestamp('2020-03-01'), next_day)
+    assert period_days('2020-03-01T13:05:00', '2020-03-31T08:00:00')[1] == next_day
+    # Dates avec fuseau lues dans le fuseau des données
+    assert period_days('2020-03-01', '2020-03-31T02:00:00+00:00', 'America/New_York')[1] == day
+
+
+def test_cube_end_day_at_midnight(stops):
+    cube = StopCube(stops)
+    day = stops['DATETIME'].iloc[len(stops) // 2].normalize()
+    query = cube.select(day.date().isoformat(), day.date().isoformat(), None, None)
+    # Une journée choisie comme début et fin : toutes ses lignes, de 00:00 à 23:59
+    assert cube.global_stats(query)['total_stops'] == (stops['DATETIME'].dt.normalize() == day).sum() > 0
@@ -0,0 +1,31 @@
+# tests/test_filter_index.py
+import numpy as np
+import pytest
+
+from filter_index import FilterIndex
+from tests.conftest import FILTERS, baseline_filter
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_select_matches_masks(stops, filters):
+    index = FilterIndex(stops)
+    expected = baseline_filter(stops, *filters)
+    np.testing.assert_array_equal(FilterIndex.rows(stops, index.select(*filters)).index, expected.index)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_date_slice_includes_end_day(stops, filters):
+    index = FilterIndex(stops)
+    start_date, end_date = filters[:2]
+    lo, hi = index.date_slice(start_date, end_date)
+    expected = baseline_filter(stops, start_date, end_date, None, None)
+    assert (lo, hi) == ((expected.index[0], expected.index[-1] + 1) if len(expected) else (lo, lo))
+
+
+def test_date_slice_end_day_at_midnight(stops):
+    index = FilterIndex(stops)
+    day = stops['DATETIME'].iloc[len(stops) // 2].normalize()
+    lo, hi = index.date_slice(day.date().isoformat(), day.date().isoformat())
+    # Une journée choisie comme début et fin : toutes ses lignes, de 00:00 à 23:59
+    assert (stops['DATETIME'].iloc[lo:hi].dt.normalize() == day).all()
+    assert (stops['DATETIME'].dt.normalize() == day).sum() == hi - lo > 0
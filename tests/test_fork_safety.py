@@ -0,0 +1,91 @@
+# tests/test_fork_safety.py
+import os
+import threading
+
+import pytest
+
+from fork_safety import ForkGate, fork_safe
+
+# Délai au-delà duquel un thread bloqué est considéré comme en attente
+WAIT = 0.2
+
+
+def in_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_fork_waits_for_open_sections():
+    gate = ForkGate()
+    entered, release, forked = threading.Event(), threading.Event(), threading.Event()
+
+    def section():
+        with gate.shared():
+            entered.set()
+            release.wait()
+
+    def fork():
+        gate.before_fork()
+        forked.set()
+        gate.after_fork_in_parent()
+
+    in_thread(section)
+    assert entered.wait(WAIT * 10)
+    forker = in_thread(fork)
+    assert not forked.wait(WAIT)
+    release.set()
+    assert forked.wait(WAIT * 10)
+    forker.join()
+
+
+def test_sections_wait_for_fork():
+    gate = ForkGate()
+    entered = threading.Event()
+
+    def section():
+        with gate.shared():
+            entered.set()
+
+    gate.before_fork()
+    in_thread(section)
+    assert not entered.wait(WAIT)
+    gate.after_fork_in_parent()
+    assert entered.wait(WAIT * 10)
+
+
+def test_reentrant_section_and_fork_from_section():
+    gate = ForkGate()
+    with gate.shared():
+        with gate.shared():
+            # Le thread qui forke peut tenir une section : le fork ne l'attend pas
+            gate.before_fork()
+            gate.after_fork_in_child()
+        with gate.shared():
+            pass
+    assert gate._active == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork indisponible")
+def test_fork_during_section_in_other_thread():
+    entered, release = threading.Event(), threading.Event()
+
+    def section():
+        with fork_safe():
+            entered.set()
+            release.wait()
+
+    holder = in_thread(section)
+    assert entered.wait(WAIT * 10)
+    # Le fork attend la fin de la section de l'autre thread
+    threading.Timer(WAIT, release.set).start()
+    pid = os.fork()
+    if pid == 0:
+        # Enfant : le verrou est utilisable, sans le thread qui tenait la section
+        with fork_safe():
+            pass
+        os._exit(0 if release.is_set() else 1)
+    assert release.is_set()
+    _, status = os.waitpid(pid, 0)
+    holder.join()
+    assert os.WEXITSTATUS(status) == 0
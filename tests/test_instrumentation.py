@@ -0,0 +1,37 @@
+# tests/test_instrumentation.py
+import instrumentation
+from instrumentation import flush, render_metrics, stage
+
+
+def recorded(path):
+    """Nombre de mesures de durée écrites dans la base"""
+    for line in render_metrics(path).splitlines():
+        if line.startswith('dashboard_stage_seconds_count{stage="test"}'):
+            return int(line.split()[-1])
+    return 0
+
+
+def test_flush_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / 'metrics.sqlite')
+    flush(path)
+    monkeypatch.setattr(instrumentation, 'FLUSH_EVERY', 3)
+    monkeypatch.setattr(instrumentation, 'FLUSH_SECONDS', 3600)
+    for _ in range(2):
+        with stage('test'):
+            pass
+        flush(path, force=False)
+    # Lot incomplet : rien d'écrit avant la troisième mesure
+    with instrumentation._pending_lock:
+        assert len(instrumentation._pending) == 2
+    with stage('test'):
+        pass
+    flush(path, force=False)
+    assert not instrumentation._pending
+    assert recorded(path) == 3
+
+
+def test_render_metrics_unreadable_database(tmp_path):
+    # Un répertoire à la place de la base : histogrammes déclarés, sans erreur
+    text = render_metrics(str(tmp_path))
+    assert '# TYPE dashboard_stage_seconds histogram' in text
+    assert 'dashboard_stage_seconds_count' not in text
@@ -0,0 +1,48 @@
+# tests/test_preprocessing.py
+import numpy as np
+import pandas as pd
+
+from Pipelines.src.preprocessing import DurationDistribution, clamp_duration, intervention_type
+
+
+def baseline_clamp_duration(durations):
+    """Nettoyage d'origine des durées (utils.load_and_preprocess_data)"""
+    durations = pd.to_numeric(durations, errors='coerce')
+    median_duration = durations.median()
+    return durations.apply(lambda x: median_duration if pd.isna(x) or x < 0 or x > 1440 else x)
+
+
+def baseline_intervention_type(df):
+    """Classification d'origine des interventions, une affectation par type"""
+    types = pd.Series('Contrôle simple', index=df.index)
+    types[df['TICKETS_ISSUED'].notna()] = 'Contravention'
+    types[df['PERSON_SEARCH_PAT_DOWN'].notna()] = 'Fouille personnelle'
+    types[df['PROPERTY_SEARCH_PAT_DOWN'].notna()] = 'Fouille matérielle'
+    types[df['ARREST_CHARGES'].notna()] = 'Arrestation'
+    return types
+
+
+def test_clamp_duration(raw_stops):
+    expected = baseline_clamp_duration(raw_stops['STOP_DURATION_MINS'])
+    np.testing.assert_array_equal(clamp_duration(raw_stops['STOP_DURATION_MINS']), expected.to_numpy())
+
+
+def test_intervention_type(raw_stops):
+    expected = baseline_intervention_type(raw_stops)
+    np.testing.assert_array_equal(np.asarray(intervention_type(raw_stops), dtype=object), expected.to_numpy())
+
+
+def test_duration_median_merged_chunks(raw_stops):
+    durations = pd.to_numeric(raw_stops['STOP_DURATION_MINS'], errors='coerce')
+    # Distributions de blocs de tailles inégales, fusionnées : médiane exacte de l'ensemble
+    bounds = [0, 1_234, 7_000, 15_001, len(durations)]
+    chunks = [durations.iloc[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+    distribution = DurationDistribution()
+    for chunk in chunks:
+        distribution = distribution.merge(DurationDistribution.from_values(chunk))
+    assert distribution.median() == durations.median()
+    # Effectif pair et impair, sérialisation comprise
+    for values in (durations.iloc[:101], durations.iloc[:100]):
+        restored = DurationDistribution.from_dict(DurationDistribution.from_values(values).to_dict())
+        assert restored.median() == values.median()
+    assert np.isnan(DurationDistribution().median())
@@ -0,0 +1,77 @@
+# tests/test_query_backend.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import StopCube
+from filter_index import FilterIndex
+from query_backend import DuckDBBackend, PandasBackend, QueryBackend, weighted_quantile
+from reason_index import STOP_REASON_COLUMNS, ReasonIndex
+from tests.conftest import FILTERS
+
+# Agrégats des figures (cube pour pandas)
+FIGURE_AGGREGATES = ['district_counts', 'global_stats', 'hourly_stats', 'type_counts', 'hour_weekday_counts',
+                     'weekday_type_counts', 'ethnicity_stats', 'monthly_stats']
+
+
+@pytest.mark.parametrize('q', [0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 1.0])
+def test_weighted_quantile(q):
+    rng = np.random.default_rng(0)
+    values = rng.gamma(2.0, 10.0, 500).round()
+    weights = rng.integers(1, 20, 500)
+    # Bit pour bit égal à np.quantile sur les valeurs répétées
+    assert weighted_quantile(values, weights, q) == np.quantile(np.repeat(values, weights), q)
+
+
+def assert_same(expected, actual, label):
+    if isinstance(expected, (tuple, list)):
+        assert len(expected) == len(actual), label
+        for position, (left, right) in enumerate(zip(expected, actual)):
+            assert_same(left, right, f"{label}[{position}]")
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), label
+        for key in expected:
+            assert_same(expected[key], actual[key], f"{label}.{key}")
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                      check_column_type=False, rtol=1e-9, obj=label)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(expected, actual, check_dtype=False, check_index_type=False,
+                                       check_names=False, rtol=1e-9, obj=label)
+    else:
+        np.testing.assert_allclose(expected, actual, rtol=1e-9, err_msg=label)
+
+
+def backend_queries(backend, query, generic=False):
+    """Agrégats des figures et requêtes sur les lignes ; generic : agrégats calculés sur les lignes"""
+    owner = QueryBackend if generic else type(backend)
+    results = {name: getattr(owner, name)(backend, query) for name in FIGURE_AGGREGATES}
+    results.update({
+        'valeurs des raisons': backend.value_counts(query, STOP_REASON_COLUMNS, top=10),
+        'raisons': backend.reason_counts(query, top=10),
+        'combinaisons de raisons': backend.reason_counts(query, combinations=True, top=10),
+        'âge par district': backend.aggregate(query, ['STOP_DISTRICT'], ['age_mean']),
+        'histogramme des âges': backend.histogram(query, 'AGE', 30),
+        'densité âge x durée': backend.histogram2d(query, 'AGE', 'STOP_DURATION_MINS', [30, 30], y_quantile=0.99),
+    })
+    return results
+
+
+@pytest.fixture(scope='module')
+def backends(stops, tmp_path_factory):
+    pytest.importorskip('duckdb')
+    path = tmp_path_factory.mktemp('parquet') / 'stops.parquet'
+    stops.to_parquet(path, index=False)
+    pandas_backend = PandasBackend(stops, FilterIndex(stops), StopCube(stops), ReasonIndex(stops))
+    duckdb_backend = DuckDBBackend([str(path)], temp_directory=str(path.parent / 'duckdb_tmp'))
+    return pandas_backend, duckdb_backend
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_duckdb_matches_pandas(backends, filters):
+    pandas_backend, duckdb_backend = backends
+    pandas_query = pandas_backend.select(*filters)
+    expected = backend_queries(pandas_backend, pandas_query)
+    # Cube, lignes filtrées par l'index et DuckDB : mêmes résultats, même période
+    assert_same(expected, backend_queries(pandas_backend, pandas_query, generic=True), 'lignes')
+    assert_same(expected, backend_queries(duckdb_backend, duckdb_backend.select(*filters)), 'duckdb')
@@ -0,0 +1,48 @@
+# tests/test_reason_index.py
+import pandas as pd
+import pytest
+
+from filter_index import FilterIndex
+from reason_index import COMBINATION_SEPARATOR, STOP_REASON_COLUMNS, ReasonDictionary, ReasonIndex
+from tests.conftest import FILTERS, baseline_filter
+
+
+def baseline_reasons(df):
+    """Raisons distinctes de chaque valeur, découpées ligne par ligne en pandas"""
+    values = pd.concat([df[column].dropna().astype(str) for column in STOP_REASON_COLUMNS], ignore_index=True)
+    return values.str.split(';').map(lambda parts: sorted({part.strip() for part in parts} - {''}))
+
+
+def baseline_counts(df, combinations=False):
+    reasons = baseline_reasons(df)
+    if combinations:
+        counts = reasons.map(COMBINATION_SEPARATOR.join).loc[lambda labels: labels != ''].value_counts()
+    else:
+        counts = reasons.explode().dropna().value_counts()
+    return counts.sort_index()
+
+
+@pytest.mark.parametrize('combinations', [False, True])
+@pytest.mark.parametrize('filters', FILTERS)
+def test_reason_counts(stops, filters, combinations):
+    reasons = ReasonIndex(stops)
+    selection = FilterIndex(stops).select(*filters)
+    counts = reasons.counts(selection, combinations=combinations)
+    expected = baseline_counts(baseline_filter(stops, *filters), combinations)
+    pd.testing.assert_series_equal(counts.sort_index(), expected, check_names=False, check_dtype=False,
+                                   check_index_type=False)
+    # Ordre : comptages décroissants, à égalité par ordre alphabétique
+    assert list(counts.index) == list(counts.reset_index().sort_values(
+        ['count', 'index'], ascending=[False, True])['index'])
+
+
+def test_reason_dictionary_round_trip(stops):
+    reasons = ReasonIndex(stops)
+    meta, arrays = reasons.dictionary.to_arrays()
+    restored = ReasonIndex.from_dictionary(stops, ReasonDictionary.from_arrays(meta, arrays))
+    selection = slice(0, len(stops))
+    pd.testing.assert_series_equal(restored.counts(selection, top=10), reasons.counts(selection, top=10))
+    # Dictionnaire construit pour d'autres catégories
+    truncated = ReasonDictionary.from_arrays(meta, dict(arrays, indptr=arrays['indptr'][:-1]))
+    with pytest.raises(ValueError):
+        ReasonIndex.from_dictionary(stops, truncated)
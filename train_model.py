@@ -0,0 +1,41 @@
+# train_model.py
+"""
+Entraînement hors ligne du modèle du plan de déploiement : le modèle de
+demande (arrêts par district et par heure) est entraîné sur l'historique
+chargé par le dashboard (store partitionné ou CSV), évalué sur les derniers
+jours, puis enregistré dans le registre des modèles avec ses métadonnées.
+Le dashboard charge la version la plus récente à sa prochaine
+vérification du registre, faite avec celle des données.
+
+Usage : python train_model.py [--registry model_registry]
+"""
+import argparse
+import json
+import logging
+
+from ml_optimizer import PoliceResourceOptimizer
+from model_registry import MODEL_REGISTRY_DIR, ModelRegistry
+from utils import dataset_version, load_and_preprocess_data
+
+
+def train(registry):
+    """Entraîne le modèle sur les données actuelles et l'enregistre ; retourne la version écrite"""
+    data_version = dataset_version()
+    df = load_and_preprocess_data()
+    optimizer = PoliceResourceOptimizer()
+    optimizer.fit(df)
+    return optimizer.save(registry, data_version)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Entraînement du modèle du plan de déploiement")
+    parser.add_argument('--registry', default=MODEL_REGISTRY_DIR, help="répertoire du registre des modèles")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    version = train(registry)
+    metadata = registry.metadata(version)
+    print(f"Modèle {version} entraîné sur les données {metadata['data_version']} "
+          f"({metadata['start_date']} -> {metadata['end_date']})")
+    print(json.dumps(metadata['metrics'], indent=2))
@@ -1,58 +1,72 @@
 # utils.py
+import hashlib
+import inspect
+import os
 import pandas as pd
-import numpy as np
+from data_cache import cached_parquet_path, load_cached_frame
+from group_metrics import group_metrics
+from instrumentation import measured, stage
+from Pipelines.src import datetime_parsing, preprocessing, schema
+from Pipelines.src.preprocessing import preprocess_stops
+from Pipelines.src.schema import INTERVENTION_TYPES, read_csv_kwargs
+from Pipelines.src.stop_store import StopStore
+from reason_index import ReasonIndex
+
+# Fichier source du dashboard
+DATA_PATH = 'Stop_Data_2019_to_2022.csv'
+
+# Store partitionné par année/mois (voir Pipelines/src/stop_store.py)
+STORE_DIR = 'stop_store'
+
+# Version du prétraitement (à incrémenter si la sémantique change sans toucher au code)
+PREPROCESSING_VERSION = 1
 
 def convert_duration_to_minutes(seconds):
     """Convertit les durées de secondes en minutes"""
     return seconds / 60
 
-def load_and_preprocess_data():
-    """Charge et prétraite les données pour le dashboard"""
-    # Charger les données avec low_memory=False pour éviter l'avertissement
-    df = pd.read_csv('Stop_Data_2019_to_2022.csv', low_memory=False)
-    
-    # Conversion des dates
-    df['DATETIME'] = pd.to_datetime(df['DATETIME'])
-    
-    # Nettoyage des durées d'intervention
-    df['STOP_DURATION_MINS'] = pd.to_numeric(df['STOP_DURATION_MINS'], errors='coerce')
-    
-    # Supprimer les valeurs aberrantes de durée
-    median_duration = df['STOP_DURATION_MINS'].median()
-    df['STOP_DURATION_MINS'] = df['STOP_DURATION_MINS'].apply(
-        lambda x: median_duration if pd.isna(x) or x < 0 or x > 1440 else x  # 1440 = 24 heures en minutes
-    )
-    
-    # Nettoyage de la colonne STOP_DISTRICT
-    df['STOP_DISTRICT'] = pd.to_numeric(df['STOP_DISTRICT'], errors='coerce')
-    df = df.dropna(subset=['STOP_DISTRICT'])  # Supprimer les lignes où STOP_DISTRICT est NaN
-    
-    # Création d'indicateurs temporels
-    df['hour'] = df['DATETIME'].dt.hour
-    df['day_of_week'] = df['DATETIME'].dt.day_name()
-    df['month'] = df['DATETIME'].dt.month
-    df['year'] = df['DATETIME'].dt.year
-    df['season'] = pd.cut(df['month'], 
-                         bins=[0,3,6,9,12], 
-                         labels=['Hiver', 'Printemps', 'Été', 'Automne'])
-    
-    # Création d'indicateurs d'intervention
-    df['intervention_score'] = (
-        (df['PERSON_SEARCH_PAT_DOWN'].notna().astype(int) * 2) +
-        (df['PROPERTY_SEARCH_PAT_DOWN'].notna().astype(int) * 2) +
-        (df['TICKETS_ISSUED'].notna().astype(int)) +
-        (df['WARNINGS_ISSUED'].notna().astype(int) * 0.5) +
-        (df['ARREST_CHARGES'].notna().astype(int) * 3)
-    )
-    
-    # Classification des interventions
-    df['intervention_type'] = 'Contrôle simple'
-    df.loc[df['TICKETS_ISSUED'].notna(), 'intervention_type'] = 'Contravention'
-    df.loc[df['PERSON_SEARCH_PAT_DOWN'].notna(), 'intervention_type'] = 'Fouille personnelle'
-    df.loc[df['PROPERTY_SEARCH_PAT_DOWN'].notna(), 'intervention_type'] = 'Fouille matérielle'
-    df.loc[df['ARREST_CHARGES'].notna(), 'intervention_type'] = 'Arrestation'
-    
-    return df
+def preprocessing_code_version():
+    """Version du code de prétraitement, utilisée comme clé du cache"""
+    source = ''.join(inspect.getsource(obj) for obj in (read_and_preprocess_data, preprocessing, datetime_parsing, schema))
+    return f"{PREPROCESSING_VERSION}-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]}"
+
+@measured('load')
+def load_and_preprocess_data(path=DATA_PATH, use_cache=True, store_dir=STORE_DIR):
+    """Charge et prétraite les données pour le dashboard (via le cache Parquet)"""
+    # Le store partitionné, alimenté par l'ingestion incrémentale, est prioritaire sur le CSV
+    store = StopStore(store_dir)
+    if store.exists():
+        with stage('load_store') as current:
+            df = store.load()
+            current.rows = len(df)
+        return df
+    if not use_cache:
+        return read_and_preprocess_data(path)
+    return load_cached_frame(path, read_and_preprocess_data, preprocessing_code_version())
+
+def parquet_sources(path=DATA_PATH, store_dir=STORE_DIR):
+    """Fichiers Parquet des données de load_and_preprocess_data (partitions du store ou cache du CSV)"""
+    store = StopStore(store_dir)
+    if store.exists():
+        return store.partition_paths()
+    return [cached_parquet_path(path, read_and_preprocess_data, preprocessing_code_version())]
+
+def dataset_version(path=DATA_PATH, store_dir=STORE_DIR):
+    """Identifiant de la version des données chargées par load_and_preprocess_data"""
+    store = StopStore(store_dir)
+    if store.exists():
+        return store.version
+    stat = os.stat(path)
+    return f"csv-{stat.st_size}-{stat.st_mtime_ns}-{preprocessing_code_version()}"
+
+def read_and_preprocess_data(path=DATA_PATH):
+    """Lit le CSV source et le prétraite"""
+    # Charger uniquement les colonnes du schéma, les colonnes à faible cardinalité en catégories
+    with stage('read_csv') as current:
+        df = pd.read_csv(path, **read_csv_kwargs())
+        current.rows = len(df)
+    with stage('preprocess', rows=len(df)):
+        return preprocess_stops(df)
 
 # Constantes pour la cartographie
 DISTRICT_COORDINATES = {
@@ -65,24 +79,33 @@ DISTRICT_COORDINATES = {
     7.0: {'lat': 38.8675, 'lon': -76.9655, 'name': 'Anacostia/Southeast'}
 }
 
-def analyze_stop_reasons(df):
-    """Analyse les raisons des arrêts"""
-    # Combiner les raisons de différents types d'arrêts
-    reasons = pd.concat([
-        df['STOP_REASON_TICKET'].dropna(),
-        df['STOP_REASON_NONTICKET'].dropna(),
-        df['STOP_REASON_HARBOR'].dropna()
-    ])
-    return reasons.value_counts().head(10)
+def dataset_summary(df):
+    """Bornes des dates et options des filtres du layout, enregistrées avec le dataset"""
+    return {
+        'start_date': df['DATETIME'].min().isoformat(),
+        'end_date': df['DATETIME'].max().isoformat(),
+        'districts': [float(d) for d in sorted(df['STOP_DISTRICT'].unique()) if not pd.isna(d)],
+        'intervention_types': list(df['intervention_type'].cat.categories),
+    }
+
+def default_summary():
+    """Filtres du layout quand aucune métadonnée n'est encore disponible (premier chargement)"""
+    return {
+        'start_date': None,
+        'end_date': None,
+        'districts': sorted(DISTRICT_COORDINATES),
+        'intervention_types': list(INTERVENTION_TYPES),
+    }
+
+def analyze_stop_reasons(df, combinations=False):
+    """Analyse les raisons des arrêts (raisons individuelles, ou combinaisons complètes)"""
+    # Raisons des différents types d'arrêts, découpées une fois par catégorie (voir reason_index.py)
+    return ReasonIndex(df).counts(slice(None), combinations, top=10)
 
 def get_hourly_stats(df):
     """Obtient des statistiques détaillées par heure"""
-    hourly_stats = df.groupby('hour').agg({
-        'STOP_DURATION_MINS': 'mean',
-        'intervention_score': 'mean',
-        'ARREST_CHARGES': lambda x: x.notna().mean() * 100,
-        'TICKETS_ISSUED': lambda x: x.notna().mean() * 100
-    }).round(2)
+    hourly_stats = group_metrics(df, ['hour'], ['duration_mean', 'score_mean',
+                                                'arrest_rate', 'ticket_rate']).round(2)
     
     hourly_stats.columns = ['Durée moyenne (min)', 'Score intervention', 
                            'Taux arrestation (%)', 'Taux verbalisation (%)']
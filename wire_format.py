@@ -0,0 +1,75 @@
+# wire_format.py
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Encodeur JSON de plotly, et donc des réponses Dash : orjson sérialise les
+# tableaux NumPy sans passer par des listes Python
+pio.json.config.default_engine = 'orjson'
+
+# Types des tableaux typés de plotly.js (>= 2.28) ; int64 n'y existe pas
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+
+def _encodable(dtype):
+    return dtype.name in TYPED_ARRAY_DTYPES or dtype.name in ('int64', 'uint64')
+
+
+def typed_array(values):
+    """
+    Tableau numérique au format typé de plotly.js : octets little-endian en
+    base64, au lieu d'une liste de nombres décimaux.
+    """
+    if values.dtype.kind in 'iu' and values.dtype.itemsize == 8:
+        info = np.iinfo(np.int32)
+        fits = values.size == 0 or (values.min() >= info.min and values.max() <= info.max)
+        values = values.astype(np.int32 if fits else np.float64)
+    code = TYPED_ARRAY_DTYPES[values.dtype.name]
+    data = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    encoded = {'dtype': code, 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+    if data.ndim > 1:
+        encoded['shape'] = ','.join(str(size) for size in data.shape)
+    return encoded
+
+
+def encode_arrays(value):
+    """Remplace récursivement les tableaux NumPy numériques par des tableaux typés"""
+    if isinstance(value, np.ndarray):
+        return typed_array(value) if _encodable(value.dtype) else value
+    if isinstance(value, dict):
+        return {key: encode_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_arrays(item) for item in value]
+    return value
+
+
+def compact_figure(fig):
+    """Figure prête à envoyer : dictionnaire dont les données des traces sont des tableaux typés"""
+    figure = fig.to_plotly_json()
+    figure['data'] = encode_arrays(figure['data'])
+    return figure
+
+
+def compact_output(value):
+    """Sortie de callback au format compact ; les autres valeurs sont inchangées"""
+    return compact_figure(value) if isinstance(value, go.Figure) else value
+
+
+def decode_arrays(value):
+    """Inverse de encode_arrays (vérifications, benchmarks)"""
+    if isinstance(value, dict):
+        if set(value) >= {'dtype', 'bdata'}:
+            dtype = np.dtype(value['dtype']).newbyteorder('<')
+            values = np.frombuffer(base64.b64decode(value['bdata']), dtype=dtype)
+            if 'shape' in value:
+                values = values.reshape([int(size) for size in value['shape'].split(',')])
+            return values
+        return {key: decode_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_arrays(item) for item in value]
+    return value